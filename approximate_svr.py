@@ -0,0 +1,81 @@
+import numpy as np
+from sklearn.base import BaseEstimator, RegressorMixin
+from sklearn.kernel_approximation import Nystroem, RBFSampler
+from sklearn.svm import SVR, LinearSVR
+
+# Scalable stand-ins for SVR(kernel='rbf') in the regression ensemble.
+# Exact SVR trains in O(n^2)-O(n^3); these keep the RBF model but bound the cost:
+#   'nystroem'  - Nystroem feature map (n_components landmarks) + linear epsilon-insensitive SVR
+#   'rff'       - random Fourier features (RBFSampler) + linear epsilon-insensitive SVR
+#   'subsample' - exact RBF SVR on at most max_rows training rows
+# All of them accept sample_weight, so they also work in collapsed training mode.
+
+SVR_METHODS = ['exact', 'nystroem', 'rff', 'subsample']
+
+
+class ApproximateSVR(RegressorMixin, BaseEstimator):
+    """ RBF support vector regression with bounded training cost. """
+
+    def __init__(self, method='nystroem', C=1.0, epsilon=0.1, gamma='scale',
+                 n_components=300, max_rows=5000, max_iter=20000, random_state=42):
+        self.method = method
+        self.C = C
+        self.epsilon = epsilon
+        self.gamma = gamma
+        self.n_components = n_components
+        self.max_rows = max_rows
+        self.max_iter = max_iter
+        self.random_state = random_state
+
+    def _gamma(self, X):
+        # Same default as SVR(gamma='scale')
+        if self.gamma == 'scale':
+            var = X.var()
+            return 1.0 / (X.shape[1] * var) if var > 0 else 1.0
+        return self.gamma
+
+    def fit(self, X, y, sample_weight=None):
+        X = np.asarray(X, dtype=float)
+        y = np.asarray(y, dtype=float)
+        gamma = self._gamma(X)
+
+        if self.method == 'subsample':
+            if len(y) > self.max_rows:
+                rng = np.random.default_rng(self.random_state)
+                p = None if sample_weight is None else np.asarray(sample_weight, dtype=float) / np.sum(sample_weight)
+                rows = rng.choice(len(y), size=self.max_rows, replace=False, p=p)
+                # Rows were drawn proportionally to their weight, so fit them unweighted
+                X, y, sample_weight = X[rows], y[rows], None
+            self.feature_map_ = None
+            self.regressor_ = SVR(kernel='rbf', C=self.C, epsilon=self.epsilon, gamma=gamma)
+        elif self.method in ('nystroem', 'rff'):
+            n_components = min(self.n_components, len(y)) if self.method == 'nystroem' else self.n_components
+            if self.method == 'nystroem':
+                self.feature_map_ = Nystroem(kernel='rbf', gamma=gamma, n_components=n_components,
+                                             random_state=self.random_state)
+            else:
+                self.feature_map_ = RBFSampler(gamma=gamma, n_components=n_components,
+                                               random_state=self.random_state)
+            X = self.feature_map_.fit_transform(X)
+            self.regressor_ = LinearSVR(C=self.C, epsilon=self.epsilon, loss='epsilon_insensitive',
+                                        dual=True, max_iter=self.max_iter, random_state=self.random_state)
+        else:
+            raise ValueError(f"Unknown SVR method {self.method!r}; expected one of {SVR_METHODS[1:]}")
+
+        # LinearSVR regularizes its intercept, so fit it on centred targets
+        self.offset_ = 0.0 if self.feature_map_ is None else float(np.average(y, weights=sample_weight))
+        self.regressor_.fit(X, y - self.offset_, sample_weight=sample_weight)
+        return self
+
+    def predict(self, X):
+        X = np.asarray(X, dtype=float)
+        if self.feature_map_ is not None:
+            X = self.feature_map_.transform(X)
+        return self.regressor_.predict(X) + self.offset_
+
+
+def make_svr(method='exact', **kwargs):
+    """ Ensemble SVR member for a --svr choice. """
+    if method == 'exact':
+        return SVR(kernel='rbf', C=1.0, epsilon=0.1)
+    return ApproximateSVR(method=method, **kwargs)
@@ -0,0 +1,90 @@
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
+
+# pyarrow implementation of convert_parquet_to_csv.py (--backend arrow): the derived columns
+# are computed a column at a time with pyarrow.compute instead of a Python call per row, and
+# the summary statistics come from one group-by over the small derived columns. The results
+# (and the CSV written from them) are the same as the pandas code's:
+#   review_length - number of whitespace-separated words of str(text) (missing text counts as
+#                   one word, like str(nan)); pyarrow and Python agree on what is whitespace
+#   review_type   - short (< 10 words), medium (< 50) or long
+#   rating_sentiment / label_sentiment - the same rules as map_rating_to_sentiment /
+#                   map_label_to_sentiment, including that missing values end up 'positive'
+
+DERIVED_COLUMNS = ['review_length', 'review_type', 'rating_sentiment', 'label_sentiment']
+SENTIMENTS = ['negative', 'neutral', 'positive']
+
+
+def load(paths, columns=None):
+    """ The parquet files concatenated in order (only columns, if given). """
+    return pa.concat_tables([pq.read_table(path, columns=columns) for path in paths], promote_options='default')
+
+
+def _sentiment(condition_negative, condition_neutral):
+    negative = pc.fill_null(condition_negative, False)
+    neutral = pc.fill_null(condition_neutral, False)
+    return pc.if_else(negative, 'negative', pc.if_else(neutral, 'neutral', 'positive'))
+
+
+def add_derived_columns(table):
+    """ table with DERIVED_COLUMNS appended. """
+    words = pc.list_value_length(pc.utf8_split_whitespace(pc.cast(table.column('text'), pa.string())))
+    length = pc.cast(pc.fill_null(words, 1), pa.int64())
+    review_type = pc.if_else(pc.less(length, 10), 'short', pc.if_else(pc.less(length, 50), 'medium', 'long'))
+    rate, labels = table.column('Rate'), table.column('labels')
+    table = table.append_column('review_length', length)
+    table = table.append_column('review_type', review_type)
+    table = table.append_column('rating_sentiment', _sentiment(pc.less_equal(rate, 2), pc.equal(rate, 3)))
+    table = table.append_column('label_sentiment', _sentiment(pc.equal(labels, 0), pc.equal(labels, 1)))
+    return table
+
+
+def _value_counts(counts, column):
+    """ Counts of column sorted like Series.value_counts (descending, ties by first appearance). """
+    totals = counts.group_by(column, use_threads=False).aggregate([('count', 'sum')]).to_pandas()
+    totals = totals.sort_values('count_sum', ascending=False, kind='stable')
+    return pd.Series(totals['count_sum'].to_numpy(), index=pd.Index(totals[column].to_numpy(), name=column),
+                     name='count')
+
+
+def summarize(table):
+    """ The statistics convert_parquet_to_csv.py prints, from one group-by over the derived columns. """
+    keys = ['review_type', 'rating_sentiment', 'label_sentiment']
+    counts = table.select(keys + ['Rate']).group_by(keys, use_threads=False).aggregate([
+        ([], 'count_all'), ('Rate', 'sum'), ('Rate', 'count'),
+    ]).rename_columns(keys + ['count', 'rate_sum', 'rated'])
+    frame = counts.to_pandas()
+    total = int(frame['count'].sum())
+
+    by_sentiment = frame.groupby('rating_sentiment')[['rate_sum', 'rated']].sum()
+    average_rating = {sentiment: (by_sentiment.loc[sentiment, 'rate_sum'] / by_sentiment.loc[sentiment, 'rated']
+                                  if sentiment in by_sentiment.index and by_sentiment.loc[sentiment, 'rated']
+                                  else float('nan'))
+                      for sentiment in SENTIMENTS}
+
+    review_types = table.column('review_type')
+    examples = {}
+    for type_ in ['short', 'medium', 'long']:
+        position = pc.index(review_types, type_).as_py()
+        if position < 0:
+            raise IndexError("single positional indexer is out-of-bounds")
+        examples[type_] = {'review_length': table.column('review_length')[position].as_py(),
+                           'text': table.column('text')[position].as_py()}
+
+    match = frame['rating_sentiment'] == frame['label_sentiment']
+    mismatched = frame[~match]
+    patterns = mismatched.groupby(['rating_sentiment', 'label_sentiment'])['count'].sum()
+    match_counts = frame.assign(sentiment_match=match).groupby('sentiment_match', sort=False)['count'].sum()
+    return {
+        'rows': total,
+        'review_type_counts': _value_counts(counts, 'review_type'),
+        'sentiment_counts': _value_counts(counts, 'rating_sentiment'),
+        'average_rating': average_rating,
+        'examples': examples,
+        'mismatch_rate': 100 * mismatched['count'].sum() / total,
+        'sentiment_match_counts': match_counts.sort_values(ascending=False, kind='stable'),
+        'mismatches': int(mismatched['count'].sum()),
+        'pattern_counts': patterns,
+    }
@@ -0,0 +1,267 @@
+import os
+import numpy as np
+import pandas as pd
+
+# Inverted index over aspect keyword hits.
+# Every time a keyword matches a sentence we store one "posting":
+# (term id, review id, sentence offset, VADER compound score).
+# Postings are kept sorted by term and review id in flat numpy arrays, with a
+# CSR-style pointer array so all postings of one term are a single slice.
+# Reviews are also grouped by product the same way, so product filters are a
+# slice lookup plus a sorted-array intersection instead of a scan over every review.
+# Every review also keeps a 64-bit key (hash of its text and product name), so an incremental
+# run can check that the rows it already indexed are still the first rows of the source.
+
+INDEX_PATH = 'processed_data/aspect_index.npz'
+
+# Same cut-offs extract_aspect_sentiment_vader uses to turn a compound score into -1/0/1
+NEGATIVE_THRESHOLD = -0.1
+POSITIVE_THRESHOLD = 0.1
+
+
+def _csr(keys, n_keys):
+    """ Pointer array so that rows [ptr[k], ptr[k + 1]) belong to key k (keys must be sorted). """
+    counts = np.bincount(keys, minlength=n_keys)
+    ptr = np.zeros(n_keys + 1, dtype=np.int64)
+    np.cumsum(counts, out=ptr[1:])
+    return ptr
+
+
+def review_keys(reviews, product_names):
+    """ 64-bit key of every review (hash of its text and product name), in row order. """
+    rows = pd.DataFrame({'review': pd.Series(reviews).astype(str).to_numpy(),
+                         'product_name': pd.Series(product_names).astype(str).to_numpy()})
+    return pd.util.hash_pandas_object(rows, index=False).to_numpy(dtype=np.uint64)
+
+
+def _encode(values, vocab):
+    """ Map values to integer ids, extending vocab (a list) with unseen values. """
+    lookup = {value: i for i, value in enumerate(vocab)}
+    ids = np.empty(len(values), dtype=np.int32)
+    for i, value in enumerate(values):
+        if value not in lookup:
+            lookup[value] = len(vocab)
+            vocab.append(value)
+        ids[i] = lookup[value]
+    return ids
+
+
+class AspectIndex:
+    """
+    Persistent keyword/aspect -> (review id, sentence offset, compound) index.
+    Review ids are row positions in processed_data/aspect_sentiment_vader.csv.
+    """
+
+    def __init__(self, aspects, terms, term_ids, review_ids, offsets, compounds,
+                 products, review_products, review_labels, keys=None):
+        self.aspects = list(aspects)                     # aspect names, column order of review_labels
+        self.terms = [tuple(t) for t in terms]           # (aspect, keyword) per term id
+        self.products = list(products)                   # product names, indexed by product id
+        self.review_products = np.asarray(review_products, dtype=np.int32)
+        self.review_labels = np.asarray(review_labels, dtype=np.int8).reshape(-1, len(self.aspects))
+        # review_keys() of the indexed reviews (None for an index saved before keys were stored)
+        self.keys = None if keys is None else np.asarray(keys, dtype=np.uint64)
+
+        # Sort postings by (term, review, offset) and build the term pointer array
+        term_ids = np.asarray(term_ids, dtype=np.int32)
+        review_ids = np.asarray(review_ids, dtype=np.int32)
+        offsets = np.asarray(offsets, dtype=np.int32)
+        order = np.lexsort((offsets, review_ids, term_ids))
+        self.post_terms = term_ids[order]
+        self.post_reviews = review_ids[order]
+        self.post_offsets = offsets[order]
+        self.post_compounds = np.asarray(compounds, dtype=np.float32)[order]
+        self.term_ptr = _csr(self.post_terms, len(self.terms))
+
+        # Reviews grouped by product: product_reviews[product_ptr[p]:product_ptr[p + 1]]
+        self.product_reviews = np.argsort(self.review_products, kind='stable').astype(np.int32)
+        self.product_ptr = _csr(self.review_products[self.product_reviews], len(self.products))
+
+        self._term_lookup = {term: i for i, term in enumerate(self.terms)}
+        self._product_lookup = {name: i for i, name in enumerate(self.products)}
+
+    @property
+    def n_reviews(self):
+        return len(self.review_products)
+
+    # ---- building ---------------------------------------------------------
+
+    @classmethod
+    def build(cls, aspects, postings, product_names, review_labels, base=None, keys=None):
+        """
+        Build an index from scored reviews.
+        postings: DataFrame with columns review_id, aspect, keyword, offset, compound.
+        product_names: product_name for each review, in review id order.
+        review_labels: (n_reviews, n_aspects) array of -1/0/1 aspect labels.
+        base: an existing index; the new reviews are appended after its last review id.
+        keys: review_keys() of the reviews (kept only if the base has keys too).
+        """
+        start = 0 if base is None else base.n_reviews
+        terms = [] if base is None else list(base.terms)
+        products = [] if base is None else list(base.products)
+
+        term_ids = _encode(list(zip(postings['aspect'], postings['keyword'])), terms)
+        review_products = _encode(pd.Series(product_names).astype(str).tolist(), products)
+        review_ids = postings['review_id'].to_numpy(dtype=np.int32) + start
+
+        if base is not None:
+            if list(aspects) != base.aspects:
+                raise ValueError(f"Aspect columns {list(aspects)} do not match the index {base.aspects}")
+            term_ids = np.concatenate([base.post_terms, term_ids])
+            review_ids = np.concatenate([base.post_reviews, review_ids])
+            offsets = np.concatenate([base.post_offsets, postings['offset'].to_numpy(dtype=np.int32)])
+            compounds = np.concatenate([base.post_compounds, postings['compound'].to_numpy(dtype=np.float32)])
+            review_products = np.concatenate([base.review_products, review_products])
+            review_labels = np.concatenate([base.review_labels, np.asarray(review_labels, dtype=np.int8)])
+            keys = None if keys is None or base.keys is None else np.concatenate([base.keys, keys])
+        else:
+            offsets = postings['offset'].to_numpy(dtype=np.int32)
+            compounds = postings['compound'].to_numpy(dtype=np.float32)
+
+        return cls(aspects, terms, term_ids, review_ids, offsets, compounds,
+                   products, review_products, review_labels, keys)
+
+    def append(self, postings, product_names, review_labels, keys=None):
+        """ Return a new index with extra reviews appended (ids continue from n_reviews). """
+        return AspectIndex.build(self.aspects, postings, product_names, review_labels, base=self, keys=keys)
+
+    def covers(self, keys):
+        """ True if the indexed reviews are the first reviews of a source with these review_keys(). """
+        keys = np.asarray(keys, dtype=np.uint64)
+        return (self.keys is not None and len(self.keys) == self.n_reviews and len(keys) >= self.n_reviews
+                and np.array_equal(keys[:self.n_reviews], self.keys))
+
+    def replace_aspects(self, aspects, review_ids, postings, review_labels):
+        """
+        Return a new index where the given aspects of the given (already indexed) reviews
+        are re-scored: their old postings are dropped and replaced by postings, and their
+        labels by review_labels ((len(review_ids), len(aspects)) array).
+        postings use absolute review ids.
+        """
+        review_ids = np.asarray(review_ids, dtype=np.int32)
+        terms = list(self.terms)
+        new_terms = _encode(list(zip(postings['aspect'], postings['keyword'])), terms)
+
+        stale_terms = np.array([a in aspects for a, _ in terms], dtype=bool)
+        drop = stale_terms[self.post_terms] & np.isin(self.post_reviews, review_ids)
+        labels = self.review_labels.copy()
+        columns = [self.aspects.index(aspect) for aspect in aspects]
+        labels[np.ix_(review_ids, columns)] = np.asarray(review_labels, dtype=np.int8).reshape(len(review_ids), len(columns))
+
+        return AspectIndex(
+            self.aspects, terms,
+            np.concatenate([self.post_terms[~drop], new_terms]),
+            np.concatenate([self.post_reviews[~drop], postings['review_id'].to_numpy(dtype=np.int32)]),
+            np.concatenate([self.post_offsets[~drop], postings['offset'].to_numpy(dtype=np.int32)]),
+            np.concatenate([self.post_compounds[~drop], postings['compound'].to_numpy(dtype=np.float32)]),
+            self.products, self.review_products, labels, self.keys,
+        )
+
+    # ---- persistence ------------------------------------------------------
+
+    def save(self, path=INDEX_PATH):
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        tmp_path = path + '.tmp.npz'
+        np.savez(
+            tmp_path,
+            aspects=np.array(self.aspects, dtype=str),
+            term_aspects=np.array([a for a, _ in self.terms], dtype=str),
+            term_keywords=np.array([k for _, k in self.terms], dtype=str),
+            post_terms=self.post_terms,
+            post_reviews=self.post_reviews,
+            post_offsets=self.post_offsets,
+            post_compounds=self.post_compounds,
+            products=np.array(self.products, dtype=str),
+            review_products=self.review_products,
+            review_labels=self.review_labels,
+            keys=np.zeros(0, dtype=np.uint64) if self.keys is None else self.keys,
+        )
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path=INDEX_PATH):
+        with np.load(path, allow_pickle=False) as data:
+            return cls(
+                data['aspects'].tolist(),
+                list(zip(data['term_aspects'].tolist(), data['term_keywords'].tolist())),
+                data['post_terms'], data['post_reviews'], data['post_offsets'], data['post_compounds'],
+                data['products'].tolist(), data['review_products'], data['review_labels'],
+                data['keys'] if 'keys' in data.files and len(data['keys']) else None,
+            )
+
+    # ---- queries ----------------------------------------------------------
+
+    def _term_slices(self, aspect=None, keyword=None):
+        """ Posting positions for every term matching the aspect/keyword filter. """
+        if keyword is not None and aspect is not None:
+            term = self._term_lookup.get((aspect, keyword))
+            term_ids = [] if term is None else [term]
+        else:
+            term_ids = [i for i, (a, k) in enumerate(self.terms)
+                        if (aspect is None or a == aspect) and (keyword is None or k == keyword)]
+        if not term_ids:
+            return np.empty(0, dtype=np.int64)
+        return np.concatenate([np.arange(self.term_ptr[t], self.term_ptr[t + 1]) for t in term_ids])
+
+    def product_review_ids(self, product):
+        """ Sorted review ids of one product (empty if the product is unknown). """
+        pid = self._product_lookup.get(product)
+        if pid is None:
+            return np.empty(0, dtype=np.int32)
+        return np.sort(self.product_reviews[self.product_ptr[pid]:self.product_ptr[pid + 1]])
+
+    def keyword_review_ids(self, aspect, keywords):
+        """ Sorted ids of reviews with at least one hit for any of the aspect's keywords. """
+        if not keywords:
+            return np.empty(0, dtype=np.int32)
+        return np.unique(np.concatenate([self.post_reviews[self._term_slices(aspect, kw)] for kw in keywords]))
+
+    def sentences(self, aspect=None, keyword=None, product=None, sentiment=None):
+        """
+        Matched sentences as a DataFrame (review_id, aspect, keyword, offset, compound).
+        sentiment filters on the sentence's own compound score: -1, 0 or 1.
+        """
+        positions = self._term_slices(aspect, keyword)
+        if product is not None:
+            keep = np.isin(self.post_reviews[positions], self.product_review_ids(product), assume_unique=False)
+            positions = positions[keep]
+        compounds = self.post_compounds[positions]
+        if sentiment is not None:
+            if sentiment > 0:
+                keep = compounds > POSITIVE_THRESHOLD
+            elif sentiment < 0:
+                keep = compounds < NEGATIVE_THRESHOLD
+            else:
+                keep = (compounds >= NEGATIVE_THRESHOLD) & (compounds <= POSITIVE_THRESHOLD)
+            positions, compounds = positions[keep], compounds[keep]
+
+        terms = self.post_terms[positions]
+        result = pd.DataFrame({
+            'review_id': self.post_reviews[positions],
+            'aspect': [self.terms[t][0] for t in terms],
+            'keyword': [self.terms[t][1] for t in terms],
+            'offset': self.post_offsets[positions],
+            'compound': compounds,
+        })
+        return result.sort_values(['review_id', 'offset'], kind='stable').reset_index(drop=True)
+
+    def query(self, aspect=None, keyword=None, product=None, sentiment=None):
+        """
+        Sorted ids of reviews that mention the aspect (or keyword) and match the filters.
+        sentiment filters on the review-level aspect label (-1, 0 or 1) written to the CSV,
+        e.g. query('delivery', product='X', sentiment=-1) -> delivery complaints for product X.
+        """
+        if aspect is None and keyword is None:
+            if product is None:
+                raise ValueError("query needs at least an aspect, keyword or product")
+            review_ids = self.product_review_ids(product)
+        else:
+            review_ids = np.unique(self.post_reviews[self._term_slices(aspect, keyword)])
+            if product is not None:
+                review_ids = np.intersect1d(review_ids, self.product_review_ids(product), assume_unique=True)
+        if sentiment is not None:
+            if aspect is None:
+                raise ValueError("sentiment filter needs an aspect")
+            column = self.aspects.index(aspect)
+            review_ids = review_ids[self.review_labels[review_ids, column] == sentiment]
+        return review_ids
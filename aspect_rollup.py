@@ -0,0 +1,116 @@
+import os
+import numpy as np
+import pandas as pd
+
+# Materialized per-product, per-aspect rollup of the aspect sentiment output.
+# Every column is an additive count or sum, so rollups of separate partitions can be built
+# independently and combined with merge_rollups(); derived ratios (mean compound, label
+# shares, average Rate) are computed from the sums at read time (see aspect_health()).
+
+ROLLUP_PATH = 'processed_data/aspect_rollup.csv'
+KEYS = ['product_name', 'aspect']
+RATES = [1, 2, 3, 4, 5]
+COUNT_COLUMNS = (['reviews', 'negative', 'neutral', 'positive', 'compound_sum', 'sentence_count']
+                 + [f'rate_{r}' for r in RATES])
+
+
+def build_rollup(df_final, postings, aspects):
+    """
+    Rollup for one partition.
+    df_final: per-review rows with Rate, product_name and one -1/0/1 column per aspect.
+    postings: keyword hits (review_id, aspect, compound) where review_id is the row position in df_final.
+    """
+    if len(df_final) == 0:
+        return pd.DataFrame(columns=KEYS + COUNT_COLUMNS)
+    products = df_final['product_name'].astype(str).to_numpy()
+    labels = df_final[aspects].to_numpy()
+    n = len(df_final)
+
+    # Label counts: one row per (review, aspect)
+    long = pd.DataFrame({
+        'product_name': np.repeat(products, len(aspects)),
+        'aspect': np.tile(np.asarray(aspects, dtype=object), n),
+        'label': labels.reshape(-1),
+    })
+    label_counts = (long.groupby(KEYS + ['label']).size()
+                    .unstack('label', fill_value=0)
+                    .reindex(columns=[-1, 0, 1], fill_value=0))
+    label_counts.columns = ['negative', 'neutral', 'positive']
+    label_counts['reviews'] = label_counts.sum(axis=1)
+
+    # Compound sums and matched-sentence counts from the keyword hits
+    hits = pd.DataFrame({
+        'product_name': products[postings['review_id'].to_numpy(dtype=np.int64)],
+        'aspect': postings['aspect'].to_numpy(),
+        'compound': postings['compound'].to_numpy(dtype=float),
+    })
+    sentence_stats = hits.groupby(KEYS)['compound'].agg(compound_sum='sum', sentence_count='size')
+
+    # Rate distribution per product, repeated for each aspect
+    rate = pd.to_numeric(df_final['Rate'], errors='coerce')
+    rate_counts = (pd.DataFrame({'product_name': products, 'Rate': rate})
+                   .dropna().astype({'Rate': int})
+                   .groupby(['product_name', 'Rate']).size()
+                   .unstack('Rate', fill_value=0)
+                   .reindex(columns=RATES, fill_value=0))
+    rate_counts.columns = [f'rate_{r}' for r in RATES]
+
+    rollup = label_counts.join(sentence_stats).reset_index()
+    rollup = rollup.merge(rate_counts, left_on='product_name', right_index=True, how='left')
+    return _normalize(rollup)
+
+
+def _normalize(rollup):
+    rollup[COUNT_COLUMNS] = rollup[COUNT_COLUMNS].fillna(0)
+    int_columns = [c for c in COUNT_COLUMNS if c != 'compound_sum']
+    rollup[int_columns] = rollup[int_columns].astype(np.int64)
+    return rollup[KEYS + COUNT_COLUMNS].sort_values(KEYS).reset_index(drop=True)
+
+
+def merge_rollups(*rollups):
+    """ Combine rollups of disjoint partitions into one. """
+    combined = pd.concat([r for r in rollups if r is not None and len(r)], ignore_index=True)
+    if combined.empty:
+        return pd.DataFrame(columns=KEYS + COUNT_COLUMNS)
+    return _normalize(combined.groupby(KEYS, as_index=False)[COUNT_COLUMNS].sum())
+
+
+def update_rollup(rollup, df_new, postings_new, aspects):
+    """ Fold newly scored reviews into an existing rollup. """
+    return merge_rollups(rollup, build_rollup(df_new, postings_new, aspects))
+
+
+def rollup_from_index(df_final, index):
+    """ Rebuild the full rollup from the aspect CSV and the keyword index, without re-scoring. """
+    postings = pd.DataFrame({
+        'review_id': index.post_reviews,
+        'aspect': np.asarray([a for a, _ in index.terms], dtype=object)[index.post_terms],
+        'compound': index.post_compounds,
+    })
+    return build_rollup(df_final, postings, index.aspects)
+
+
+def load_rollup(path=ROLLUP_PATH):
+    # Only empty fields are missing: product names such as "NA" or "None" must stay strings
+    return pd.read_csv(path, keep_default_na=False, na_values=[''], dtype={key: object for key in KEYS})
+
+
+def save_rollup(rollup, path=ROLLUP_PATH):
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    tmp_path = path + '.tmp'
+    rollup.to_csv(tmp_path, index=False)
+    os.replace(tmp_path, path)
+
+
+def aspect_health(rollup):
+    """ Per product/aspect ratios derived from a rollup (mean compound, label shares, mean Rate). """
+    health = rollup[KEYS].copy()
+    health['reviews'] = rollup['reviews']
+    health['sentence_count'] = rollup['sentence_count']
+    health['mean_compound'] = rollup['compound_sum'] / rollup['sentence_count'].where(rollup['sentence_count'] > 0)
+    health['negative_share'] = rollup['negative'] / rollup['reviews'].where(rollup['reviews'] > 0)
+    health['positive_share'] = rollup['positive'] / rollup['reviews'].where(rollup['reviews'] > 0)
+    rate_counts = rollup[[f'rate_{r}' for r in RATES]].to_numpy()
+    rated = rate_counts.sum(axis=1)
+    health['mean_rate'] = np.where(rated > 0, rate_counts @ np.array(RATES) / np.maximum(rated, 1), np.nan)
+    return health
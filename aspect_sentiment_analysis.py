@@ -1,52 +1,58 @@
 import pandas as pd
 import numpy as np
 import re
+import os
+import json
+import argparse
 from vaderSentiment.vaderSentiment import SentimentIntensityAnalyzer
 import matplotlib.pyplot as plt
 import seaborn as sns
+from aspect_index import AspectIndex, INDEX_PATH, review_keys
+from aspect_rollup import ROLLUP_PATH, build_rollup, update_rollup, rollup_from_index, load_rollup, save_rollup
+from aspect_taxonomy import TAXONOMY_PATH, AspectMatcher, load_taxonomy, diff_taxonomies
+from instrumentation import step
 
-# Load your data
-df = pd.read_csv('flipkart_reviews_with_sentiment.csv')
-
-# Refined aspect keywords
-aspect_keywords = {
-    "quality": [
-        "quality", "durability", "reliable", "reliability", "build", "sturdy", "material",
-        "solid", "premium", "design", "performance", "defective", "broken", "damaged"
-    ],
-    "cost": [
-        "price", "cheap", "expensive", "affordable", "value", "worth", "cost", "overpriced",
-        "reasonable", "deal", "budget", "money", "money's worth", "rip off", "steal"
-    ],
-    "delivery": [
-        "delivery", "shipping", "courier", "delivered", "arrival", "late", "delay",
-        "on time", "fast", "slow", "packaging", "return window", "damaged during shipping"
-    ],
-    "flexibility": [
-        "return", "replace", "exchange", "adapt", "modify", "customize", "adjust", "change",
-        "cancellation", "refund", "reschedule", "policy"
-    ]
-}
+OUTPUT_PATH = 'processed_data/aspect_sentiment_vader.csv'
+# Taxonomy the current outputs were scored with, used to work out what a taxonomy edit changes
+USED_TAXONOMY_PATH = 'processed_data/aspect_taxonomy_used.json'
+
+# Aspect keywords are loaded from config/aspect_taxonomy.json; edit that file (or pass --taxonomy)
+aspect_keywords = load_taxonomy(TAXONOMY_PATH)
+# AspectMatcher for aspect_keywords; built on first use (and again if aspect_keywords is replaced)
+matcher = None
 
 # Initialize VADER
 analyzer = SentimentIntensityAnalyzer()
 
-# Updated sentiment extraction function
-def extract_aspect_sentiment_vader(review):
-    review = str(review).lower()
-    results = {}
+def get_matcher():
+    """ The AspectMatcher of the current aspect_keywords. """
+    global matcher
+    if matcher is None or matcher.taxonomy != aspect_keywords:
+        matcher = AspectMatcher(aspect_keywords)
+    return matcher
+
+def match_aspect_sentences(review):
+    """ Every (aspect, keyword, sentence offset, sentence) hit in a review, in scan order. """
+    return get_matcher().match(review)
+
+def score_review(review):
+    """
+    Aspect labels for one review plus the keyword hits behind them.
+    Returns ({aspect: -1/0/1}, [(aspect, keyword, offset, compound), ...]).
+    """
+    compound_cache = {}
+    postings = []
+    scores = {aspect: [] for aspect in aspect_keywords}
+    for aspect, kw, offset, sent in match_aspect_sentences(review):
+        if sent not in compound_cache:
+            compound_cache[sent] = analyzer.polarity_scores(sent)["compound"]
+        compound = compound_cache[sent]
+        scores[aspect].append(compound)
+        postings.append((aspect, kw, offset, compound))
 
-    for aspect, keywords in aspect_keywords.items():
-        relevant_sentences = []
-        for kw in keywords:
-            pattern = rf'([^.]*\b{re.escape(kw)}\b[^.]*)\.?'
-            relevant_sentences += re.findall(pattern, review)
-
-        if relevant_sentences:
-            compound_scores = [
-                analyzer.polarity_scores(sent)["compound"]
-                for sent in relevant_sentences
-            ]
+    results = {}
+    for aspect, compound_scores in scores.items():
+        if compound_scores:
             avg_score = np.mean(compound_scores)
 
             if avg_score > 0.1:
@@ -58,15 +64,136 @@ def extract_aspect_sentiment_vader(review):
         else:
             results[aspect] = 0
 
-    return results
+    return results, postings
+
+# Updated sentiment extraction function
+def extract_aspect_sentiment_vader(review):
+    return score_review(review)[0]
+
+def score_reviews(reviews):
+    """ Score a Series of reviews; returns (aspect label DataFrame, postings DataFrame). """
+    labels = []
+    postings = []
+    for review_id, review in enumerate(reviews):
+        results, hits = score_review(review)
+        labels.append(results)
+        postings.extend((review_id,) + hit for hit in hits)
+    aspect_df = pd.DataFrame(labels, columns=list(aspect_keywords))
+    postings_df = pd.DataFrame(postings, columns=['review_id', 'aspect', 'keyword', 'offset', 'compound'])
+    return aspect_df, postings_df
+
+def selective_recompute(df, index, changes):
+    """
+    Re-score only the reviews a keyword edit can affect: reviews with an index hit for a removed
+    keyword, plus reviews that contain an added keyword. Only the changed aspects are rewritten.
+    Returns (re-scored review ids, updated index).
+    """
+    reviews = df['Review'].iloc[:index.n_reviews]
+    lowered = None
+    affected = [np.empty(0, dtype=np.int32)]
+    for aspect, (added, removed) in changes.items():
+        affected.append(index.keyword_review_ids(aspect, removed))
+        if added:
+            if lowered is None:
+                lowered = reviews.astype(str).str.lower()
+            pattern = r'\b(?:' + '|'.join(re.escape(kw) for kw in added) + r')\b'
+            affected.append(np.flatnonzero(lowered.str.contains(pattern, regex=True).to_numpy()))
+    review_ids = np.unique(np.concatenate(affected)).astype(np.int32)
+
+    changed = list(changes)
+    aspect_df, postings_df = score_reviews(reviews.iloc[review_ids])
+    postings_df['review_id'] = review_ids[postings_df['review_id'].to_numpy(dtype=np.int64)]
+    postings_df = postings_df[postings_df['aspect'].isin(changed)]
+
+    df_final = pd.read_csv(OUTPUT_PATH)
+    df_final.loc[review_ids, changed] = aspect_df[changed].to_numpy()
+    df_final.to_csv(OUTPUT_PATH, index=False)
+    return review_ids, index.replace_aspects(changed, review_ids, postings_df, aspect_df[changed].to_numpy())
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="VADER aspect sentiment and aspect keyword index")
+    parser.add_argument('--taxonomy', default=TAXONOMY_PATH,
+                        help="JSON file mapping each aspect to its keywords")
+    parser.add_argument('--incremental', action='store_true',
+                        help="only score reviews added since the last run and append them to the index")
+    parser.add_argument('--selective', action='store_true',
+                        help="after a keyword edit, only re-score reviews matching added or removed keywords")
+    args = parser.parse_args()
+
+    aspect_keywords = load_taxonomy(args.taxonomy)
+    matcher = get_matcher()
+
+    # Load your data
+    with step('load') as record:
+        df = pd.read_csv('flipkart_reviews_with_sentiment.csv')
+        record['rows'] = len(df)
+    os.makedirs('processed_data', exist_ok=True)
+
+    have_outputs = all(os.path.exists(p) for p in (INDEX_PATH, OUTPUT_PATH, USED_TAXONOMY_PATH))
+    index = None
+    changes = None
+    rescored = False
+    if (args.incremental or args.selective) and have_outputs:
+        index = AspectIndex.load(INDEX_PATH)
+        with open(USED_TAXONOMY_PATH, encoding='utf-8') as f:
+            changes = diff_taxonomies(json.load(f), aspect_keywords)
+        if changes is None:
+            print("Aspects were added, removed or reordered; running a full rescore")
+            index = None
+        elif not index.covers(review_keys(df['Review'], df['product_name'])):
+            # Ids are row positions: a regenerated or reordered CSV invalidates every hit
+            print("The indexed reviews are no longer the first rows of the data; running a full rescore")
+            index = None
+
+    if args.selective and index is not None:
+        if changes:
+            for aspect, (added, removed) in changes.items():
+                print(f"  - {aspect}: +{added} -{removed}")
+            with step('vader_aspects_selective') as record:
+                review_ids, index = selective_recompute(df, index, changes)
+                record['rows'] = len(review_ids)
+            print(f"Re-scored {len(review_ids):,} of {index.n_reviews:,} reviews for {list(changes)}")
+            changes = {}
+            rescored = True
+        else:
+            print("Taxonomy unchanged; nothing to re-score")
+    if args.incremental and index is not None:
+        if changes:
+            raise SystemExit("Taxonomy changed since the last run; run with --selective first")
+        print(f"Index covers {index.n_reviews:,} reviews; scoring {max(len(df) - index.n_reviews, 0):,} new ones")
+        new_df = df.iloc[index.n_reviews:].reset_index(drop=True)
+        with step('vader_aspects', rows=len(new_df)):
+            aspect_df, postings_df = score_reviews(new_df['Review'])
+        df_final = pd.concat([new_df[['Review', 'Rate', 'product_name']], aspect_df], axis=1)
+        df_final.to_csv(OUTPUT_PATH, mode='a', header=False, index=False)
+        index = index.append(postings_df, new_df['product_name'], aspect_df.to_numpy(),
+                             keys=review_keys(new_df['Review'], new_df['product_name']))
+        if os.path.exists(ROLLUP_PATH) and not rescored:
+            rollup = update_rollup(load_rollup(ROLLUP_PATH), df_final, postings_df, list(aspect_keywords))
+        else:
+            rollup = rollup_from_index(pd.read_csv(OUTPUT_PATH), index)
+    elif index is None:
+        # Apply the function to reviews
+        with step('vader_aspects', rows=len(df)):
+            aspect_df, postings_df = score_reviews(df['Review'])
 
-# Apply the function to reviews
-aspect_scores = df['Review'].apply(extract_aspect_sentiment_vader)
-aspect_df = pd.DataFrame(aspect_scores.tolist())
+        # Merge with original data
+        df_final = pd.concat([df[['Review', 'Rate', 'product_name']], aspect_df], axis=1)
 
-# Merge with original data
-df_final = pd.concat([df[['Review', 'Rate', 'product_name']], aspect_df], axis=1)
+        # Save result
+        df_final.to_csv(OUTPUT_PATH, index=False)
+        with step('index_and_rollup', rows=len(df)):
+            index = AspectIndex.build(list(aspect_keywords), postings_df, df['product_name'], aspect_df.to_numpy(),
+                                      keys=review_keys(df['Review'], df['product_name']))
+            rollup = build_rollup(df_final, postings_df, list(aspect_keywords))
+    else:
+        # Labels of already indexed reviews changed; refresh the rollup from the index
+        rollup = rollup_from_index(pd.read_csv(OUTPUT_PATH), index)
+    print(f"Updated VADER-based aspect sentiment saved to '{OUTPUT_PATH}'")
 
-# Save result
-df_final.to_csv('processed_data/aspect_sentiment_vader.csv', index=False)
-print("Updated VADER-based aspect sentiment saved to 'processed_data/aspect_sentiment_vader.csv'")
+    index.save(INDEX_PATH)
+    with open(USED_TAXONOMY_PATH, 'w', encoding='utf-8') as f:
+        json.dump(aspect_keywords, f, indent=4)
+    save_rollup(rollup, ROLLUP_PATH)
+    print(f"Per-product aspect rollup ({len(rollup):,} product/aspect rows) saved to '{ROLLUP_PATH}'")
+    print(f"Aspect keyword index ({len(index.post_reviews):,} sentence hits, {index.n_reviews:,} reviews) saved to '{INDEX_PATH}'")
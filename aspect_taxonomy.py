@@ -0,0 +1,72 @@
+import os
+import re
+import json
+
+# Aspect taxonomies live in JSON files ({aspect: [keywords, ...]}) instead of being hardcoded.
+# Each taxonomy gets a matcher with one precompiled sentence pattern per keyword plus an index
+# from a keyword's first word to the keywords starting with it. A review is only run through
+# the patterns whose first word actually occurs in it, which gives exactly the hits of the
+# original per-keyword regex scan. Building a matcher only compiles a few dozen patterns, so it
+# is built once per run rather than cached (an unpickled matcher would recompile them anyway).
+
+TAXONOMY_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'config', 'aspect_taxonomy.json')
+
+WORD_PATTERN = re.compile(r'\w+')
+
+
+def load_taxonomy(path=TAXONOMY_PATH):
+    """ Read an {aspect: [keyword, ...]} taxonomy from a JSON file. """
+    with open(path, encoding='utf-8') as f:
+        taxonomy = json.load(f)
+    if not isinstance(taxonomy, dict) or not all(isinstance(v, list) for v in taxonomy.values()):
+        raise ValueError(f"{path} must map each aspect to a list of keywords")
+    return {aspect: [str(kw).lower() for kw in keywords] for aspect, keywords in taxonomy.items()}
+
+
+def keyword_pattern(kw):
+    """ Sentence-level pattern for one keyword, as used by the aspect scorer. """
+    return re.compile(rf'([^.]*\b{re.escape(kw)}\b[^.]*)\.?')
+
+
+class AspectMatcher:
+    """ Precompiled keyword matcher for one taxonomy. """
+
+    def __init__(self, taxonomy):
+        self.taxonomy = {aspect: list(keywords) for aspect, keywords in taxonomy.items()}
+        # (aspect, keyword, first word, compiled pattern) in taxonomy order
+        self.entries = []
+        for aspect, keywords in self.taxonomy.items():
+            for kw in keywords:
+                words = WORD_PATTERN.findall(kw)
+                self.entries.append((aspect, kw, words[0] if words else None, keyword_pattern(kw)))
+        self.first_words = {first for _, _, first, _ in self.entries if first is not None}
+
+    def match(self, review):
+        """ Every (aspect, keyword, sentence offset, sentence) hit in a review, in scan order. """
+        review = str(review).lower()
+        words = self.first_words.intersection(WORD_PATTERN.findall(review))
+        hits = []
+        for aspect, kw, first, pattern in self.entries:
+            if first is not None and first not in words:
+                continue
+            for match in pattern.finditer(review):
+                hits.append((aspect, kw, match.start(), match.group(1)))
+        return hits
+
+
+def diff_taxonomies(old, new):
+    """
+    Keyword changes between two taxonomies with the same aspects.
+    Returns {aspect: (added keywords, removed keywords)} for aspects whose keywords changed,
+    or None if aspects were added, removed or reordered (the output columns change, so a
+    full rerun is needed).
+    """
+    if list(old) != list(new):
+        return None
+    changes = {}
+    for aspect in new:
+        added = [kw for kw in new[aspect] if kw not in old[aspect]]
+        removed = [kw for kw in old[aspect] if kw not in new[aspect]]
+        if added or removed:
+            changes[aspect] = (added, removed)
+    return changes
@@ -0,0 +1,121 @@
+import time
+import numpy as np
+import pandas as pd
+from imblearn.over_sampling import SMOTE
+
+# Class-balancing stage for the rating regressor (Rate is treated as the class label).
+# Every strategy takes a scaled training matrix X with targets y and optional per-row
+# counts (collapsed mode passes unique patterns with their row counts), and returns
+# (X_fit, y_fit, sample_weight). sample_weight is None when rows should be fitted as-is.
+#   'smote'        - imblearn SMOTE on every row (the original behaviour; very slow on duplicates)
+#   'smote_dedup'  - SMOTE on the unique (pattern, Rate) cells; synthetic cells are weighted so
+#                    every Rate reaches the largest Rate's row count
+#   'weights'      - no resampling; per-Rate weights bring every Rate to the largest Rate's total
+#   'random_over'  - random oversampling in count space: extra rows for each minority Rate are
+#                    drawn from its unique cells in proportion to their counts
+#   'random_under' - random undersampling in count space: each Rate is thinned to the smallest
+#                    Rate's total by drawing rows without replacement from its cells
+#   'none'         - no balancing
+
+BALANCE_STRATEGIES = ['smote', 'smote_dedup', 'weights', 'random_over', 'random_under', 'none']
+
+
+def dedupe(X, y, counts=None):
+    """ Unique (row, target) cells of a training set with their summed counts. """
+    X = np.asarray(X, dtype=float)
+    y = np.asarray(y)
+    counts = np.ones(len(y)) if counts is None else np.asarray(counts, dtype=float)
+    keys = np.column_stack([X, y])
+    cells, inverse = np.unique(keys, axis=0, return_inverse=True)
+    cell_counts = np.bincount(inverse.reshape(-1), weights=counts, minlength=len(cells))
+    return cells[:, :-1], cells[:, -1].astype(y.dtype), cell_counts
+
+
+def class_totals(y, counts):
+    return pd.Series(counts).groupby(np.asarray(y)).sum()
+
+
+def weighted_balance(y, counts):
+    """ Per-cell weights scaling each class total up to the largest class total. """
+    totals = class_totals(y, counts)
+    return counts * (totals.max() / totals.reindex(y).to_numpy())
+
+
+def _random_resample(X, y, counts, target, random_state):
+    """ Redraw each class's cell counts so the class total becomes target(class total). """
+    rng = np.random.default_rng(random_state)
+    new_counts = np.zeros(len(counts))
+    for label, total in class_totals(y, counts).items():
+        cells = np.flatnonzero(y == label)
+        cell_counts = counts[cells].astype(np.int64)
+        goal = int(round(target(total)))
+        if goal >= total:
+            # Keep every row, add (goal - total) random duplicates in proportion to the counts
+            extra = rng.multinomial(goal - int(total), cell_counts / cell_counts.sum())
+            new_counts[cells] = cell_counts + extra
+        else:
+            new_counts[cells] = rng.multivariate_hypergeometric(cell_counts, goal)
+    keep = new_counts > 0
+    return X[keep], y[keep], new_counts[keep]
+
+
+def _smote_dedup(X, y, counts, random_state):
+    """ SMOTE over unique cells; synthetic cells share each class's missing row total. """
+    cell_per_class = pd.Series(y).value_counts()
+    k = int(min(5, cell_per_class.min() - 1))
+    if k < 1:
+        # Too few distinct patterns in some class for nearest neighbours
+        return X, y, weighted_balance(y, counts)
+    X_res, y_res = SMOTE(k_neighbors=k, random_state=random_state).fit_resample(X, y)
+    synthetic = np.arange(len(y_res)) >= len(y)
+    totals = class_totals(y, counts)
+    weights = np.concatenate([counts, np.zeros(synthetic.sum())])
+    for label, total in totals.items():
+        members = synthetic & (y_res == label)
+        if members.any():
+            weights[members] = (totals.max() - total) / members.sum()
+    keep = weights > 0
+    return X_res[keep], y_res[keep], weights[keep]
+
+
+def balance(strategy, X, y, counts=None, random_state=42):
+    """ Apply one balancing strategy; returns (X_fit, y_fit, sample_weight or None). """
+    X = np.asarray(X, dtype=float)
+    y = np.asarray(y)
+    if strategy == 'smote':
+        if counts is not None:
+            # Rows are already unique cells; SMOTE them and keep the count weights
+            return _smote_dedup(X, y, np.asarray(counts, dtype=float), random_state)
+        X_res, y_res = SMOTE(random_state=random_state).fit_resample(X, y)
+        return X_res, y_res, None
+    if strategy == 'none':
+        return X, y, None if counts is None else np.asarray(counts, dtype=float)
+
+    if counts is None:
+        X, y, counts = dedupe(X, y)
+    else:
+        counts = np.asarray(counts, dtype=float)
+    if strategy == 'weights':
+        return X, y, weighted_balance(y, counts)
+    if strategy == 'random_over':
+        largest = class_totals(y, counts).max()
+        return _random_resample(X, y, counts, lambda total: largest, random_state)
+    if strategy == 'random_under':
+        smallest = class_totals(y, counts).min()
+        return _random_resample(X, y, counts, lambda total: smallest, random_state)
+    if strategy == 'smote_dedup':
+        return _smote_dedup(X, y, counts, random_state)
+    raise ValueError(f"Unknown balancing strategy {strategy!r}; expected one of {BALANCE_STRATEGIES}")
+
+
+def timed_balance(strategy, X, y, counts=None, random_state=42):
+    """ balance() plus a small report: seconds taken, fitted rows and total sample weight. """
+    start = time.perf_counter()
+    X_fit, y_fit, weights = balance(strategy, X, y, counts, random_state)
+    report = {
+        'strategy': strategy,
+        'balance_s': time.perf_counter() - start,
+        'fit_rows': len(y_fit),
+        'effective_rows': float(len(y_fit) if weights is None else np.sum(weights)),
+    }
+    return X_fit, y_fit, weights, report
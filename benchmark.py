@@ -0,0 +1,191 @@
+import os
+import copy
+import json
+import time
+import shutil
+import argparse
+import subprocess
+import pandas as pd
+from pipeline import STAGES, RUN_REPORT_PATH, run_pipeline
+from synthetic_data import write_dataset
+
+# Scaling benchmark: runs the pipeline stages on synthetic datasets (synthetic_data.py) of
+# increasing size and keeps the per-step wall time, CPU time, throughput and peak memory
+# of every run in HISTORY_PATH, so that slowdowns show up against earlier runs.
+# Each size gets its own work directory under BENCHMARK_DIR holding the generated
+# train/test.parquet (generated once per size and seed). Before a run everything else in it
+# is removed, so no stage profits from caches of the previous run. The stages run through
+# pipeline.py from the work directory; their step reports come from instrumentation.py.
+
+BENCHMARK_DIR = '.cache/benchmarks'
+HISTORY_PATH = 'outputs/benchmarks/history.csv'
+SIZES = [10_000, 100_000, 1_000_000, 10_000_000]
+DATA_FILES = ['train.parquet', 'test.parquet']
+# A step is flagged when it is this much slower (or bigger) than the median of its last runs
+TOLERANCE = 1.25
+BASELINE_RUNS = 5
+# Differences below these are noise
+MIN_SECONDS = 0.05
+MIN_MB = 10
+REPO_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def benchmark_stages():
+    """ The pipeline stages with repository paths made absolute, to run from a work directory. """
+    produced = {output for stage in STAGES for output in stage['outputs']}
+    stages = copy.deepcopy(STAGES)
+    for stage in stages:
+        stage['script'] = os.path.join(REPO_DIR, stage['script'])
+        stage['code'] = [os.path.join(REPO_DIR, pattern) for pattern in stage['code']]
+        stage['inputs'] = [path if path in produced or path in DATA_FILES else os.path.join(REPO_DIR, path)
+                           for path in stage['inputs']]
+        # Every figure has to be rendered, not only the changed ones
+        stage['args'] = [arg for arg in stage['args'] if arg != '--changed']
+    return stages
+
+
+def prepare_workdir(size, seed):
+    """ Work directory with the dataset of this size; returns (path, generation record or None). """
+    workdir = os.path.join(BENCHMARK_DIR, f'{size}-seed{seed}')
+    record = None
+    if not all(os.path.exists(os.path.join(workdir, name)) for name in DATA_FILES):
+        start = time.perf_counter()
+        write_dataset(size, workdir, seed=seed)
+        wall = time.perf_counter() - start
+        record = {'stage': 'generate', 'step': 'generate', 'rows': size, 'wall_s': round(wall, 4),
+                  'rows_per_s': round(size / wall, 1)}
+    for name in os.listdir(workdir):
+        if name not in DATA_FILES:
+            path = os.path.join(workdir, name)
+            shutil.rmtree(path) if os.path.isdir(path) else os.remove(path)
+    return workdir, record
+
+
+def run_size(size, targets=None, seed=0, jobs=1, extra_env=None):
+    """ Run the stages on one dataset size; returns (stage statuses, step records). """
+    workdir, generated = prepare_workdir(size, seed)
+    cwd = os.getcwd()
+    os.chdir(workdir)
+    try:
+        stages = benchmark_stages()
+        status = run_pipeline(targets, force={stage['name'] for stage in stages}, jobs=jobs,
+                              stages=stages, extra_env=extra_env)
+        report = {'stages': {}}
+        if os.path.exists(RUN_REPORT_PATH):
+            with open(RUN_REPORT_PATH) as f:
+                report = json.load(f)
+    finally:
+        os.chdir(cwd)
+    records = [generated] if generated else []
+    for name, stage in report['stages'].items():
+        records.append({'stage': name, 'step': '(stage)', 'wall_s': stage['seconds'],
+                        'peak_rss_mb': stage.get('peak_rss_mb'), 'status': stage['status']})
+        for record in stage.get('steps', []):
+            records.append({'stage': name, **{key: record.get(key) for key in
+                            ['step', 'rows', 'wall_s', 'cpu_s', 'rows_per_s', 'peak_rss_mb']}})
+    for record in records:
+        record['size'] = size
+    return status, records
+
+
+def collapse(records):
+    """ One row per (size, stage, step): repeated steps (e.g. per CV round) are summed. """
+    frame = pd.DataFrame(records)
+    for column in ['rows', 'wall_s', 'cpu_s', 'rows_per_s', 'peak_rss_mb', 'status']:
+        if column not in frame:
+            frame[column] = None
+    frame = frame.groupby(['size', 'stage', 'step'], sort=False, dropna=False).agg(
+        rows=('rows', 'sum'), wall_s=('wall_s', 'sum'), cpu_s=('cpu_s', 'sum'),
+        peak_rss_mb=('peak_rss_mb', 'max'), status=('status', 'first')).reset_index()
+    frame['rows_per_s'] = (frame['rows'] / frame['wall_s']).where(frame['rows'] > 0).round(1)
+    return frame
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=REPO_DIR, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return ''
+
+
+def compare(current, history, tolerance=TOLERANCE, runs=BASELINE_RUNS):
+    """ current joined with the median of the previous runs of each step, plus a regression flag. """
+    keys = ['size', 'stage', 'step']
+    if history.empty:
+        baseline = pd.DataFrame(columns=keys + ['baseline_wall_s', 'baseline_rss_mb'])
+    else:
+        recent = history.sort_values('run').groupby(keys).tail(runs)
+        baseline = recent.groupby(keys).agg(baseline_wall_s=('wall_s', 'median'),
+                                            baseline_rss_mb=('peak_rss_mb', 'median')).reset_index()
+    table = current.merge(baseline, on=keys, how='left')
+    for column in ['wall_s', 'peak_rss_mb', 'baseline_wall_s', 'baseline_rss_mb']:
+        table[column] = pd.to_numeric(table[column], errors='coerce')
+    slower = (table['wall_s'] > table['baseline_wall_s'] * tolerance) \
+        & (table['wall_s'] - table['baseline_wall_s'] > MIN_SECONDS)
+    bigger = (table['peak_rss_mb'] > table['baseline_rss_mb'] * tolerance) \
+        & (table['peak_rss_mb'] - table['baseline_rss_mb'] > MIN_MB)
+    table['regression'] = slower | bigger
+    return table
+
+
+def append_history(frame, path=HISTORY_PATH):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    if os.path.exists(path):
+        frame = pd.concat([pd.read_csv(path), frame], ignore_index=True)
+    tmp_path = path + '.tmp'
+    frame.to_csv(tmp_path, index=False)
+    os.replace(tmp_path, path)
+
+
+if __name__ == '__main__':
+    names = [stage['name'] for stage in STAGES]
+    parser = argparse.ArgumentParser(description="Benchmark the pipeline stages on synthetic data of growing size")
+    parser.add_argument('--sizes', nargs='+', type=int, default=SIZES, help="dataset sizes (rows)")
+    parser.add_argument('--stages', nargs='+', default=None, metavar='STAGE',
+                        help=f"stages to benchmark, with everything they need (default: all of {names})")
+    parser.add_argument('--seed', type=int, default=0, help="seed of the synthetic data")
+    parser.add_argument('--jobs', type=int, default=1,
+                        help="stages run at the same time (1 keeps the per-stage numbers comparable)")
+    parser.add_argument('--budget', type=float, default=None,
+                        help="stop before the next size once a stage took longer than this many seconds")
+    parser.add_argument('--trace-memory', action='store_true', help="also record tracemalloc peaks (slower)")
+    parser.add_argument('--no-history', action='store_true', help="don't append this run to the history")
+    args = parser.parse_args()
+    unknown = set(args.stages or []) - set(names)
+    if unknown:
+        parser.error(f"unknown stages: {sorted(unknown)} (choose from {names})")
+
+    history = pd.read_csv(HISTORY_PATH) if os.path.exists(HISTORY_PATH) else pd.DataFrame()
+    run_id = time.strftime('%Y-%m-%dT%H:%M:%S')
+    extra_env = {'TRACE_MEMORY': '1'} if args.trace_memory else {}
+    results = []
+    for size in sorted(args.sizes):
+        print(f"\n=== {size:,} rows ===")
+        status, records = run_size(size, args.stages, seed=args.seed, jobs=args.jobs, extra_env=extra_env)
+        if not records:
+            continue
+        current = collapse(records)
+        current.insert(0, 'run', run_id)
+        current.insert(1, 'commit', git_commit())
+        results.append(current)
+        table = compare(current, history)
+        print(f"\n{'stage':<12} {'step':<48} {'wall s':>9} {'rows/s':>12} {'peak MB':>8} {'vs median':>10}")
+        for row in table.itertuples():
+            change = f"{row.wall_s / row.baseline_wall_s:9.2f}x" if row.baseline_wall_s > 0 else ''
+            rate = f"{row.rows_per_s:12,.0f}" if pd.notna(row.rows_per_s) else ''
+            rss = f"{row.peak_rss_mb:8.1f}" if pd.notna(row.peak_rss_mb) else ''
+            flag = '  REGRESSION' if row.regression else ''
+            print(f"{row.stage:<12} {row.step[:48]:<48} {row.wall_s:9.2f} {rate:>12} {rss:>8} {change:>10}{flag}")
+        failed = [name for name, value in status.items() if value in ('failed', 'blocked')]
+        if failed:
+            print(f"Stopping: {failed} did not finish (logs in {BENCHMARK_DIR}/{size}-seed{args.seed}/)")
+            break
+        slow = current[(current['step'] == '(stage)') & (current['wall_s'] > (args.budget or float('inf')))]
+        if len(slow):
+            print(f"Stopping before larger sizes: {', '.join(slow['stage'])} took longer than {args.budget:.0f}s")
+            break
+
+    if results and not args.no_history:
+        append_history(pd.concat(results, ignore_index=True))
+        print(f"\nResults appended to '{HISTORY_PATH}'")
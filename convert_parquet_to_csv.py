@@ -1,11 +1,35 @@
 import pandas as pd
 import os
+import argparse
+import arrow_convert
+from instrumentation import step
+from stratified import ratio_estimates, row_parts, stratified_sample, total_estimates
+
+# --backend arrow computes the derived columns and the summary statistics with pyarrow
+# (see arrow_convert.py); the printed statistics and the CSV are the same as with pandas.
+# --preview FRACTION continues with a stratified sample (Rate x review_type, see stratified.py)
+# once the review types are known, prints estimates for the whole dataset with 95% confidence
+# intervals and saves nothing.
+parser = argparse.ArgumentParser(description="Combine train/test.parquet, add derived columns and save them as CSV")
+parser.add_argument('--backend', choices=['pandas', 'arrow'], default=os.environ.get('REVIEW_BACKEND', 'pandas'))
+parser.add_argument('--preview', type=float, default=None, metavar='FRACTION',
+                    help="summarize a stratified sample of this fraction of the reviews instead of saving the CSV")
+parser.add_argument('--seed', type=int, default=0, help="seed of the --preview sample")
+args = parser.parse_args()
+if args.preview is not None and not 0 < args.preview <= 1:
+    parser.error("--preview takes a fraction in (0, 1]")
+stats = None
+derived = args.backend == 'arrow'
 
 # Load the parquet files
 print("Loading Parquet files...")
 try:
-    df_train = pd.read_parquet("train.parquet")
-    df_test = pd.read_parquet("test.parquet")
+    with step('load'):
+        if args.backend == 'arrow':
+            table = arrow_convert.load(["train.parquet", "test.parquet"])
+        else:
+            df_train = pd.read_parquet("train.parquet")
+            df_test = pd.read_parquet("test.parquet")
 except FileNotFoundError as e:
     print(f"Error: Could not find parquet files: {e}")
     raise
@@ -15,11 +39,21 @@ except Exception as e:
 
 # Combine them into a single dataset
 print("Combining datasets...")
-df_full = pd.concat([df_train, df_test], ignore_index=True)
+if args.backend == 'arrow':
+    # Derived columns and summary statistics in pyarrow; pandas only for writing the CSV
+    original_columns = table.column_names
+    with step('derive', rows=table.num_rows):
+        table = arrow_convert.add_derived_columns(table)
+        # A preview summarizes the sample instead (below)
+        stats = None if args.preview else arrow_convert.summarize(table)
+        df_full = table.to_pandas()
+else:
+    df_full = pd.concat([df_train, df_test], ignore_index=True)
+    original_columns = df_full.columns
 
 # Print original column names
 print("\nOriginal columns in the dataset:")
-for col in df_full.columns:
+for col in original_columns:
     print(f"  - {col}") #The f"..." is a formatted string literal (called an "f-string").It lets you insert variables directly into strings using curly braces {}
 
 # Calculate review length using the correct column name 'text'
@@ -28,7 +62,9 @@ for col in df_full.columns:
 # str(x)	Ensures the input is a string (in case of None/NaN)
 # .split()	Splits the text into words (by spaces)
 # len(...)	Counts how many words are in the list 
-df_full['review_length'] = df_full['text'].apply(lambda x: len(str(x).split()))
+if not derived:
+    with step('review_length', rows=len(df_full)):
+        df_full['review_length'] = df_full['text'].apply(lambda x: len(str(x).split()))
 
 # Review type
 def review_type(length):
@@ -39,7 +75,16 @@ def review_type(length):
     else:
         return 'long'
 
-df_full['review_type'] = df_full['review_length'].apply(review_type)
+if not derived:
+    df_full['review_type'] = df_full['review_length'].apply(review_type)
+
+# Preview: everything below works on a sample that keeps the same fraction of every
+# (Rate, review_type) stratum; the counts printed are the sample's
+if args.preview:
+    with step('preview_sample', rows=len(df_full)):
+        df_full, strata = stratified_sample(df_full, args.preview, seed=args.seed)
+    population = int(strata['population'].sum())
+    print(f"\nPreview: {len(df_full):,} of {population:,} reviews ({args.preview:.1%} of every Rate x review_type stratum)")
 
 # 'rating' is the star rating (1 to 5) given directly by the user.
 # 'labels' are sentiment classes (0 = negative, 1 = neutral, 2 = positive) assigned by humans or a model.
@@ -54,7 +99,8 @@ def map_rating_to_sentiment(rating):
     else:
         return 'positive'
 
-df_full['rating_sentiment'] = df_full['Rate'].apply(map_rating_to_sentiment)
+if not derived:
+    df_full['rating_sentiment'] = df_full['Rate'].apply(map_rating_to_sentiment)
 
 # Map labels to sentiment categories
 def map_label_to_sentiment(label):
@@ -65,11 +111,12 @@ def map_label_to_sentiment(label):
     else:
         return 'positive'
 
-df_full['label_sentiment'] = df_full['labels'].apply(map_label_to_sentiment)
+if not derived:
+    df_full['label_sentiment'] = df_full['labels'].apply(map_label_to_sentiment)
 
 # Print review type statistics
 print("\nReview Type Distribution:")
-review_type_counts = df_full['review_type'].value_counts() # Counts how many times each category appears in the review_type column.
+review_type_counts = stats['review_type_counts'] if stats else df_full['review_type'].value_counts() # Counts how many times each category appears in the review_type column.
 for review_type, count in review_type_counts.items(): # Iterates over each review type and its count (e.g., 'short' with 15,000 reviews)
     percentage = (count / len(df_full)) * 100 # Calculates the percentage share of that type andlen(df_full) = total number of reviews.
     print(f"  - {review_type}: {count:,} reviews ({percentage:.1f}%)")
@@ -77,7 +124,7 @@ for review_type, count in review_type_counts.items(): # Iterates over each revie
 
 # Print rating sentiment statistics
 print("\nRating Sentiment Distribution:")
-sentiment_counts = df_full['rating_sentiment'].value_counts()
+sentiment_counts = stats['sentiment_counts'] if stats else df_full['rating_sentiment'].value_counts()
 for sentiment, count in sentiment_counts.items():
     percentage = (count / len(df_full)) * 100
     print(f"  - {sentiment}: {count:,} reviews ({percentage:.1f}%)")
@@ -85,7 +132,7 @@ for sentiment, count in sentiment_counts.items():
 # Print average rating for each sentiment
 print("\nAverage Rating by Sentiment:")
 for sentiment in ['negative', 'neutral', 'positive']:
-    avg_rating = df_full[df_full['rating_sentiment'] == sentiment]['Rate'].mean()
+    avg_rating = stats['average_rating'][sentiment] if stats else df_full[df_full['rating_sentiment'] == sentiment]['Rate'].mean()
     print(f"  - {sentiment}: {avg_rating:.1f}")
 
 #  This is filtering the DataFrame to only include rows where the rating_sentiment 
@@ -95,7 +142,7 @@ for sentiment in ['negative', 'neutral', 'positive']:
 # Print some example reviews of each type
 print("\nExample reviews of each type:")
 for type_ in ['short', 'medium', 'long']:
-    example = df_full[df_full['review_type'] == type_].iloc[0]
+    example = stats['examples'][type_] if stats else df_full[df_full['review_type'] == type_].iloc[0]
     print(f"\n{type_.upper()} review example:")
     print(f"Length: {example['review_length']} words")
     print(f"Text: {example['text'][:200]}...")
@@ -112,30 +159,56 @@ df_full['sentiment_match'] = df_full['label_sentiment'] == df_full['rating_senti
 #Use ~ (tilde) to invert the Boolean values: True → False, False → True
 # So ~df_full['sentiment_match'] selects the mismatched rows
 # .mean() gives proportion of mismatches, then multiply by 100 for %
-mismatch_rate = 100 * (~df_full['sentiment_match']).mean()
+mismatch_rate = stats['mismatch_rate'] if stats else 100 * (~df_full['sentiment_match']).mean()
 print(f"\nMismatch rate between ratings and labels: {mismatch_rate:.2f}%")
 
 # Print sentiment match statistics
 print("\nSentiment Match Distribution:")
-sentiment_match_counts = df_full['sentiment_match'].value_counts() # Count how many reviews are matching (True) vs mismatching (False)
+sentiment_match_counts = stats['sentiment_match_counts'] if stats else df_full['sentiment_match'].value_counts() # Count how many reviews are matching (True) vs mismatching (False)
 for match, count in sentiment_match_counts.items(): # Loop through each match type (True/False) and count
     percentage = (count / len(df_full)) * 100 # Calculate percentage of total dataset
     print(f"  - {'Matching' if match else 'Mismatching'}: {count:,} reviews ({percentage:.1f}%)") # Print results in clean format
 
 # Print mismatch analysis
 print("\nMismatch Analysis:")
-mismatch_df = df_full[~df_full['sentiment_match']] # Create a new DataFrame that contains only mismatched sentiment rows
-print(f"Total mismatches: {len(mismatch_df):,}") # Print total number of mismatched reviews
+mismatches = stats['mismatches'] if stats else int((~df_full['sentiment_match']).sum()) # Number of mismatched rows (~ selects them)
+print(f"Total mismatches: {mismatches:,}") # Print total number of mismatched reviews
 print("\nMismatch patterns (Rating Sentiment → Label Sentiment):")
-pattern_counts = mismatch_df.groupby(['rating_sentiment', 'label_sentiment']).size() # Group the mismatches by (rating_sentiment, label_sentiment) and count how many in each group
+pattern_counts = stats['pattern_counts'] if stats else df_full[~df_full['sentiment_match']].groupby(['rating_sentiment', 'label_sentiment']).size() # Group the mismatches by (rating_sentiment, label_sentiment) and count how many in each group
 for (rating_sent, label_sent), count in pattern_counts.items(): # Loop through each mismatch pair and print how many cases occurred
-    percentage = (count / len(mismatch_df)) * 100 # Calculate what percentage each pattern makes up of all mismatches
+    percentage = (count / mismatches) * 100 # Calculate what percentage each pattern makes up of all mismatches
     print(f"  - {rating_sent} → {label_sent}: {count:,} cases ({percentage:.1f}%)") # Print in format: positive → negative: 1,200 cases (35.4%)
 
+# Preview estimates for the whole dataset: shares and rates are ratio estimates over the strata,
+# with their 95% confidence intervals (see stratified.py)
+if args.preview:
+    mismatched = ~df_full['sentiment_match']
+    print(f"\nPreview estimates for all {population:,} reviews (± 95% confidence interval):")
+    estimate = ratio_estimates(row_parts(df_full, mismatched), strata).iloc[0]
+    print(f"Mismatch rate: {100 * estimate['estimate']:.2f}% ± {100 * estimate['half_width']:.2f}")
+    estimate = total_estimates(row_parts(df_full, mismatched), strata).iloc[0]
+    print(f"Total mismatches: {estimate['estimate']:,.0f} ± {estimate['half_width']:,.0f}")
+    print("\nMismatch rate by star rating:")
+    by_rating = ratio_estimates(row_parts(df_full, mismatched, by=['Rate']), strata, by=['Rate'])
+    for rate, row in by_rating.iterrows():
+        print(f"  - {rate}★: {100 * row['estimate']:.2f}% ± {100 * row['half_width']:.2f}")
+    print("\nLabel sentiment distribution:")
+    for sentiment in ['negative', 'neutral', 'positive']:
+        estimate = ratio_estimates(row_parts(df_full, df_full['label_sentiment'] == sentiment), strata).iloc[0]
+        print(f"  - {sentiment}: {100 * estimate['estimate']:.1f}% ± {100 * estimate['half_width']:.1f}")
+    print("\nMismatch patterns (share of all mismatches):")
+    for (rating_sent, label_sent) in pattern_counts.index:
+        pattern = (df_full['rating_sentiment'] == rating_sent) & (df_full['label_sentiment'] == label_sent)
+        estimate = ratio_estimates(row_parts(df_full, pattern, domain=mismatched), strata).iloc[0]
+        print(f"  - {rating_sent} → {label_sent}: {100 * estimate['estimate']:.1f}% ± {100 * estimate['half_width']:.1f}")
+    print("\nPreview only: the CSV was not saved (run without --preview to save it)")
+    raise SystemExit(0)
+
 # Save to CSV
 print("\nSaving to CSV...")
 try:
-    df_full.to_csv("flipkart_reviews_full.csv", index=False)
+    with step('save', rows=len(df_full)):
+        df_full.to_csv("flipkart_reviews_full.csv", index=False)
     
     # Print information about the final dataset
     print("\n✅ CSV file saved as 'flipkart_reviews_full.csv'")
@@ -0,0 +1,173 @@
+import os
+import time
+import argparse
+import numpy as np
+import pandas as pd
+import matplotlib.pyplot as plt
+from matplotlib.colors import LogNorm
+
+# Aggregated rendering of the regression diagnostics (prediction_analysis.png and
+# error_distribution.png). Instead of scattering every test point and running a KDE over
+# every residual, predictions are first reduced to fixed-size counts:
+#   - a (Rate x predicted-rating bin) 2D histogram for the prediction heatmap
+#   - a fine residual histogram plus count/sum/sum-of-squares for the error plot
+# The KDE is a Gaussian smoothing of the fine histogram evaluated on a fixed grid, with
+# Scott's bandwidth from the exact residual moments. Counts are additive, so batches can
+# be folded in with update() and the render cost does not depend on the number of rows.
+
+RATES = [1, 2, 3, 4, 5]
+PRED_RANGE = (0.5, 5.5)
+PRED_BINS = 100
+ERROR_RANGE = (-5.0, 5.0)
+ERROR_BINS = 1000      # fine bins the KDE is computed from
+DISPLAY_BINS = 50      # bars drawn in error_distribution.png
+KDE_GRID = 512
+
+
+class DiagnosticCounts:
+    """ Fixed-size, mergeable summary of (actual, predicted) pairs. """
+
+    def __init__(self):
+        self.pred_edges = np.linspace(*PRED_RANGE, PRED_BINS + 1)
+        self.error_edges = np.linspace(*ERROR_RANGE, ERROR_BINS + 1)
+        self.joint = np.zeros((len(RATES), PRED_BINS), dtype=np.int64)
+        self.errors = np.zeros(ERROR_BINS, dtype=np.int64)
+        self.pred_sum = np.zeros(len(RATES))
+        self.n = 0
+        self.error_sum = 0.0
+        self.error_sumsq = 0.0
+
+    def update(self, y_true, y_pred):
+        """ Fold a batch of actual ratings and ensemble predictions into the counts. """
+        y_true = np.asarray(y_true, dtype=float)
+        y_pred = np.asarray(y_pred, dtype=float)
+        rate_idx = np.clip(np.rint(y_true).astype(np.int64) - RATES[0], 0, len(RATES) - 1)
+        pred_idx = self._bin(y_pred, PRED_RANGE, PRED_BINS)
+        self.joint += np.bincount(rate_idx * PRED_BINS + pred_idx,
+                                  minlength=self.joint.size).reshape(self.joint.shape)
+        self.pred_sum += np.bincount(rate_idx, weights=y_pred, minlength=len(RATES))
+
+        # Same sign convention as the 'Error' column of regression_results.csv
+        error = y_true - y_pred
+        self.errors += np.bincount(self._bin(error, ERROR_RANGE, ERROR_BINS), minlength=ERROR_BINS)
+        self.n += len(error)
+        self.error_sum += float(error.sum())
+        self.error_sumsq += float(np.dot(error, error))
+        return self
+
+    @staticmethod
+    def _bin(values, value_range, bins):
+        # Values outside the range land in the edge bins
+        lo, hi = value_range
+        idx = np.floor((values - lo) / (hi - lo) * bins).astype(np.int64)
+        return np.clip(idx, 0, bins - 1)
+
+    def merge(self, other):
+        self.joint += other.joint
+        self.errors += other.errors
+        self.pred_sum += other.pred_sum
+        self.n += other.n
+        self.error_sum += other.error_sum
+        self.error_sumsq += other.error_sumsq
+        return self
+
+    def error_kde(self):
+        """ Gaussian KDE of the residuals on a fixed grid, scaled to counts per display bin. """
+        grid = np.linspace(*ERROR_RANGE, KDE_GRID)
+        if self.n < 2:
+            return grid, np.zeros_like(grid)
+        mean = self.error_sum / self.n
+        std = np.sqrt(max(self.error_sumsq / self.n - mean ** 2, 0.0))
+        bandwidth = max(std * self.n ** (-1 / 5), self.error_edges[1] - self.error_edges[0])
+        centers = (self.error_edges[:-1] + self.error_edges[1:]) / 2
+        occupied = self.errors > 0
+        z = (grid[:, None] - centers[occupied][None, :]) / bandwidth
+        density = np.exp(-0.5 * z ** 2) @ self.errors[occupied] / (self.n * bandwidth * np.sqrt(2 * np.pi))
+        display_width = (ERROR_RANGE[1] - ERROR_RANGE[0]) / DISPLAY_BINS
+        return grid, density * self.n * display_width
+
+
+def plot_prediction_heatmap(counts, path='outputs/prediction_analysis.png'):
+    """ Counts of predicted-rating bins per actual Rate, with per-Rate mean prediction. """
+    fig, ax = plt.subplots(figsize=(10, 6))
+    rate_edges = np.arange(RATES[0] - 0.5, RATES[-1] + 1)
+    joint = np.where(counts.joint > 0, counts.joint, np.nan)
+    mesh = ax.pcolormesh(rate_edges, counts.pred_edges, joint.T, cmap='viridis',
+                         norm=LogNorm(vmin=1, vmax=max(counts.joint.max(), 1)))
+    fig.colorbar(mesh, ax=ax, label='Reviews')
+    rated = counts.joint.sum(axis=1)
+    has_rows = rated > 0
+    ax.plot(np.array(RATES)[has_rows], counts.pred_sum[has_rows] / rated[has_rows],
+            'wo-', lw=2, label='Mean prediction')
+    ax.plot(PRED_RANGE, PRED_RANGE, 'r--', lw=2, label='Perfect prediction')
+    ax.set_xticks(RATES)
+    ax.set_xlabel("Actual Rating")
+    ax.set_ylabel("Predicted Rating")
+    ax.set_title("Aspect Sentiment vs Rating: Prediction Analysis")
+    ax.legend(loc='upper left')
+    fig.tight_layout()
+    fig.savefig(path, dpi=300, bbox_inches='tight')
+    plt.close(fig)
+
+
+def plot_error_distribution(counts, path='outputs/error_distribution.png'):
+    """ Residual histogram (re-binned from the fine counts) with the gridded KDE on top. """
+    fig, ax = plt.subplots(figsize=(10, 6))
+    bars = counts.errors.reshape(DISPLAY_BINS, -1).sum(axis=1)
+    edges = np.linspace(*ERROR_RANGE, DISPLAY_BINS + 1)
+    ax.bar(edges[:-1], bars, width=np.diff(edges), align='edge', alpha=0.6, edgecolor='white')
+    grid, kde = counts.error_kde()
+    ax.plot(grid, kde, lw=2)
+    # Trim the empty tails of the fixed range
+    occupied = np.flatnonzero(bars)
+    if len(occupied):
+        ax.set_xlim(edges[max(occupied[0] - 1, 0)], edges[min(occupied[-1] + 2, DISPLAY_BINS)])
+    ax.set_title('Prediction Error Distribution')
+    ax.set_xlabel('Error (Predicted - Actual Rating)')
+    ax.set_ylabel('Count')
+    ax.grid(True)
+    fig.tight_layout()
+    fig.savefig(path, dpi=300, bbox_inches='tight')
+    plt.close(fig)
+
+
+def render_diagnostics(y_true, y_pred, output_dir='outputs', batch_size=1_000_000):
+    """ Aggregate predictions in batches and write both diagnostic plots; returns timings. """
+    y_true = np.asarray(y_true, dtype=float)
+    y_pred = np.asarray(y_pred, dtype=float)
+    start = time.perf_counter()
+    counts = DiagnosticCounts()
+    for batch in range(0, len(y_true), batch_size):
+        counts.update(y_true[batch:batch + batch_size], y_pred[batch:batch + batch_size])
+    aggregate_s = time.perf_counter() - start
+
+    start = time.perf_counter()
+    plot_prediction_heatmap(counts, os.path.join(output_dir, 'prediction_analysis.png'))
+    plot_error_distribution(counts, os.path.join(output_dir, 'error_distribution.png'))
+    return {'rows': counts.n, 'aggregate_s': aggregate_s, 'render_s': time.perf_counter() - start}
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Render the regression diagnostics from aggregated counts")
+    parser.add_argument('--results', default='outputs/regression_results.csv',
+                        help="CSV with Actual and Predicted columns")
+    parser.add_argument('--output-dir', default='outputs')
+    parser.add_argument('--benchmark', type=int, nargs='+', metavar='ROWS',
+                        help="time aggregation and rendering on synthetic predictions of these sizes")
+    args = parser.parse_args()
+
+    os.makedirs(args.output_dir, exist_ok=True)
+    if args.benchmark:
+        rng = np.random.default_rng(42)
+        for n_rows in args.benchmark:
+            y_true = rng.integers(1, 6, n_rows).astype(float)
+            y_pred = np.clip(y_true + rng.normal(0, 0.8, n_rows), 1, 5)
+            timings = render_diagnostics(y_true, y_pred, args.output_dir)
+            print(f"  {n_rows:>11,} rows  aggregate {timings['aggregate_s']:6.2f}s  "
+                  f"render {timings['render_s']:6.2f}s")
+    else:
+        results = pd.read_csv(args.results, usecols=['Actual', 'Predicted'])
+        timings = render_diagnostics(results['Actual'].to_numpy(), results['Predicted'].to_numpy(),
+                                     args.output_dir)
+        print(f"Rendered diagnostics for {timings['rows']:,} rows "
+              f"(aggregate {timings['aggregate_s']:.2f}s, render {timings['render_s']:.2f}s)")
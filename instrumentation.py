@@ -0,0 +1,133 @@
+import os
+import sys
+import json
+import time
+import atexit
+import cProfile
+import resource
+import tracemalloc
+import contextlib
+
+# Lightweight per-step instrumentation for the pipeline scripts.
+#
+#     with step('textblob', rows=len(df)):
+#         df['textblob_sentiment'] = ...
+#
+# records wall time, CPU time (this process plus any child processes it waited for), the
+# process' peak RSS at the end of the step and how much the step raised it, and rows/second.
+# When the process exits, the steps are written as a JSON report to
+# <RUN_REPORT_DIR>/<script name>.json (default outputs/run_reports/).
+# Environment switches (pipeline.py sets them from --trace-memory / --profile-step):
+#   TRACE_MEMORY=1     also record the tracemalloc peak of each step (slower)
+#   PROFILE_STEP=name  run that step under cProfile and dump <script>-<name>.prof next to the report
+# Steps run in worker processes are returned to the parent (see add_steps) so they end up in
+# the parent's report.
+
+REPORT_DIR = 'outputs/run_reports'
+REPORT_VERSION = 1
+
+_STEPS = []
+_STARTED = time.strftime('%Y-%m-%dT%H:%M:%S')
+_registered = False
+
+
+def report_dir():
+    return os.environ.get('RUN_REPORT_DIR', REPORT_DIR)
+
+
+def script_name():
+    return os.path.splitext(os.path.basename(sys.argv[0] or 'python'))[0] or 'python'
+
+
+def _peak_rss_mb():
+    # ru_maxrss is in KiB on Linux (bytes on macOS)
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / 2 ** 20 if sys.platform == 'darwin' else peak / 2 ** 10
+
+
+def _cpu_s():
+    own = resource.getrusage(resource.RUSAGE_SELF)
+    children = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return own.ru_utime + own.ru_stime + children.ru_utime + children.ru_stime
+
+
+def _register():
+    global _registered
+    if not _registered:
+        atexit.register(write_report)
+        _registered = True
+
+
+@contextlib.contextmanager
+def step(name, rows=None):
+    """ Time one named step; yields its record (set record['rows'] if rows is only known later). """
+    _register()
+    record = {'step': name, 'rows': rows}
+    trace = os.environ.get('TRACE_MEMORY') == '1'
+    started_tracing = trace and not tracemalloc.is_tracing()
+    if started_tracing:
+        tracemalloc.start()
+    if trace:
+        tracemalloc.reset_peak()
+    profiler = cProfile.Profile() if os.environ.get('PROFILE_STEP') == name else None
+    rss_before = _peak_rss_mb()
+    cpu_start = _cpu_s()
+    start = time.perf_counter()
+    if profiler:
+        profiler.enable()
+    try:
+        yield record
+    finally:
+        if profiler:
+            profiler.disable()
+        record['wall_s'] = round(time.perf_counter() - start, 4)
+        record['cpu_s'] = round(_cpu_s() - cpu_start, 4)
+        peak = _peak_rss_mb()
+        record['peak_rss_mb'] = round(peak, 1)
+        record['rss_growth_mb'] = round(peak - rss_before, 1)
+        if trace:
+            record['tracemalloc_peak_mb'] = round(tracemalloc.get_traced_memory()[1] / 2 ** 20, 1)
+            if started_tracing:
+                tracemalloc.stop()
+        if record['rows'] is not None and record['wall_s'] > 0:
+            record['rows_per_s'] = round(record['rows'] / record['wall_s'], 1)
+        record['pid'] = os.getpid()
+        if profiler:
+            os.makedirs(report_dir(), exist_ok=True)
+            record['profile'] = os.path.join(report_dir(), f"{script_name()}-{name.replace(':', '_')}.prof")
+            profiler.dump_stats(record['profile'])
+        _STEPS.append(record)
+
+
+def add_steps(records):
+    """ Add step records measured elsewhere (e.g. returned by worker processes). """
+    _register()
+    # Records measured in this process (a pool of one run inline) are already in the list
+    _STEPS.extend(record for record in records if record.get('pid') != os.getpid())
+
+
+def steps():
+    return list(_STEPS)
+
+
+def write_report(path=None):
+    """ Write the recorded steps as JSON; returns the path (None if nothing was recorded). """
+    if not _STEPS:
+        return None
+    path = path or os.path.join(report_dir(), f"{script_name()}.json")
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    report = {
+        'version': REPORT_VERSION,
+        'script': script_name(),
+        'argv': sys.argv[1:],
+        'started': _STARTED,
+        'finished': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'python': sys.version.split()[0],
+        'peak_rss_mb': round(_peak_rss_mb(), 1),
+        'steps': _STEPS,
+    }
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump(report, f, indent=2)
+    os.replace(tmp_path, path)
+    return path
@@ -0,0 +1,264 @@
+import os
+import hashlib
+import argparse
+import numpy as np
+import pandas as pd
+
+# Incrementally maintained rating-text mismatch counters.
+# For every product, category (first word of the product name, as in visuals/review_data.py)
+# and Rate the store keeps the count of each rating -> text sentiment transition
+#   rating sentiment (Rate <= 2 negative, 3 neutral, >= 4 positive) -> text sentiment code
+# (9 patterns) and the sum of the ratings. The review total and the matched count (the three
+# diagonal patterns) follow from the pattern counts. Every counter is additive, so a batch of
+# newly scored reviews is folded in with one factorize + bincount per dimension: O(batch), plus
+# O(new keys) to extend the key tables; the review table is never rescanned.
+#
+# Counters live in flat numpy arrays indexed by key id, with capacity doubling as keys are
+# added. save() writes an atomic snapshot (temporary file + os.replace), so a reader or a
+# restarted writer only ever sees a complete snapshot. The snapshot also records the sha256 of
+# every CSV added with add_csv(), and adding the same file twice is a no-op.
+# A store counts one definition of the text sentiment code, recorded as its code_source: the
+# random forest's sentiment_code of a scored CSV, or the TextBlob code ('textblob') that
+# stream_detector.py computes (a CSV's textblob_sentiment column is the same code). Updates
+# with another code source raise a ValueError instead of mixing them.
+# Sources: python mismatch_store.py --add <scored CSV> and stream_detector.py --store.
+
+STORE_PATH = 'processed_data/mismatch_store.npz'
+DIMENSIONS = ['product', 'category', 'Rate']
+NAMES = ['negative', 'neutral', 'positive']
+PATTERNS = [f"{rating} -> {text}" for rating in NAMES for text in NAMES]
+MATCHED = [0, 4, 8]
+CHUNK_SIZE = 200_000
+# Code source of a CSV's text code column, where it differs from the column name
+CODE_SOURCES = {'textblob_sentiment': 'textblob'}
+
+
+def _encode(values, vocab, lookup):
+    """ Ids of values in vocab (a list, with lookup its value -> id dict), extending both with unseen values. """
+    ids = np.empty(len(values), dtype=np.int64)
+    for i, value in enumerate(values):
+        if value not in lookup:
+            lookup[value] = len(vocab)
+            vocab.append(value)
+        ids[i] = lookup[value]
+    return ids
+
+
+def _rate_key(rate):
+    return f"{float(rate):g}"
+
+
+def _file_hash(path, chunk_size=1 << 20):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(chunk_size), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class MismatchStore:
+    """ Per product / category / Rate transition counts and rating sums, updated batch by batch. """
+
+    def __init__(self):
+        self.keys = {dimension: [] for dimension in DIMENSIONS}
+        self._lookup = {dimension: {} for dimension in DIMENSIONS}
+        self.patterns = {dimension: np.zeros((0, len(PATTERNS)), dtype=np.int64) for dimension in DIMENSIONS}
+        self.rate_sums = {dimension: np.zeros(0) for dimension in DIMENSIONS}
+        self.reviews = 0
+        self.skipped = 0
+        self.sources = []
+        self.code_source = None
+
+    # ---- updates ----------------------------------------------------------
+
+    def use_codes(self, code_source):
+        """ Tie the store to one text code definition (the first one used); raises ValueError for any other. """
+        if self.code_source is None:
+            self.code_source = code_source
+        elif code_source != self.code_source:
+            raise ValueError(f"The store counts {self.code_source!r} text sentiment codes; "
+                             f"refusing to add {code_source!r} codes (use another --store)")
+
+    def _grow(self, dimension):
+        n, capacity = len(self.keys[dimension]), len(self.rate_sums[dimension])
+        if n <= capacity:
+            return
+        capacity = max(n, 2 * capacity, 16)
+        patterns = np.zeros((capacity, len(PATTERNS)), dtype=np.int64)
+        patterns[:len(self.patterns[dimension])] = self.patterns[dimension]
+        rate_sums = np.zeros(capacity)
+        rate_sums[:len(self.rate_sums[dimension])] = self.rate_sums[dimension]
+        self.patterns[dimension], self.rate_sums[dimension] = patterns, rate_sums
+
+    def _add(self, dimension, values, pattern, rates):
+        """ Fold the rows with a key (values not None) into the counters of dimension. """
+        local, uniques = pd.factorize(pd.Series(values, dtype=object), use_na_sentinel=True)
+        keep = local >= 0
+        if not len(uniques):
+            return
+        local, pattern, rates = local[keep], pattern[keep], rates[keep]
+        ids = _encode(uniques.tolist(), self.keys[dimension], self._lookup[dimension])
+        self._grow(dimension)
+        counts = np.bincount(local * len(PATTERNS) + pattern, minlength=len(uniques) * len(PATTERNS))
+        self.patterns[dimension][ids] += counts.reshape(len(uniques), len(PATTERNS))
+        self.rate_sums[dimension][ids] += np.bincount(local, weights=rates, minlength=len(uniques))
+
+    def update(self, products, rates, text_codes, code_source):
+        """
+        Add a batch of scored reviews: product names (None if unknown), ratings and text sentiment
+        codes (0/1/2) of code_source. Reviews without a rating or a valid code are only counted as skipped.
+        """
+        self.use_codes(code_source)
+        rates = pd.to_numeric(pd.Series(rates), errors='coerce').to_numpy(dtype=float)
+        codes = pd.to_numeric(pd.Series(text_codes), errors='coerce').to_numpy(dtype=float)
+        valid = np.isfinite(rates) & np.isin(codes, [0, 1, 2])
+        self.skipped += int((~valid).sum())
+        rates, codes = rates[valid], codes[valid].astype(np.int64)
+        rating = np.where(rates <= 2, 0, np.where(rates == 3, 1, 2))
+        pattern = rating * len(NAMES) + codes
+        # Keys are stored as strings (so they read back the same from a snapshot)
+        products = pd.Series(products, dtype=object)[valid].map(str, na_action='ignore')
+        categories = products.str.split(n=1).str[0]
+        self._add('product', products.to_numpy(), pattern, rates)
+        self._add('category', categories.to_numpy(), pattern, rates)
+        self._add('Rate', [_rate_key(rate) for rate in rates], pattern, rates)
+        self.reviews += len(rates)
+
+    def add_csv(self, path, text_column='sentiment_code', chunk_size=CHUNK_SIZE):
+        """ Add the reviews of a scored review CSV (skipped if this file was added before). Returns the rows added. """
+        code_source = CODE_SOURCES.get(text_column, text_column)
+        self.use_codes(code_source)
+        digest = _file_hash(path)
+        if digest in self.sources:
+            return 0
+        rows = 0
+        # Only empty fields are missing: products named e.g. 'NA', 'null' or 'None' are kept
+        for chunk in pd.read_csv(path, usecols=['product_name', 'Rate', text_column], chunksize=chunk_size,
+                                 keep_default_na=False, na_values=['']):
+            self.update(chunk['product_name'], chunk['Rate'], chunk[text_column], code_source)
+            rows += len(chunk)
+        self.sources.append(digest)
+        return rows
+
+    # ---- persistence ------------------------------------------------------
+
+    def save(self, path=STORE_PATH):
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        arrays = {'totals': np.array([self.reviews, self.skipped], dtype=np.int64),
+                  'sources': np.array(self.sources, dtype=str),
+                  'code_source': np.array(self.code_source or '')}
+        for dimension in DIMENSIONS:
+            n = len(self.keys[dimension])
+            arrays[f'{dimension}_keys'] = np.array(self.keys[dimension], dtype=str)
+            arrays[f'{dimension}_patterns'] = self.patterns[dimension][:n]
+            arrays[f'{dimension}_rate_sums'] = self.rate_sums[dimension][:n]
+        tmp_path = path + '.tmp.npz'
+        np.savez(tmp_path, **arrays)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path=STORE_PATH):
+        """ The snapshot at path, or an empty store if there is none. """
+        store = cls()
+        if not os.path.exists(path):
+            return store
+        with np.load(path, allow_pickle=False) as data:
+            store.reviews, store.skipped = (int(n) for n in data['totals'])
+            store.sources = data['sources'].tolist()
+            store.code_source = str(data['code_source']) or None
+            for dimension in DIMENSIONS:
+                store.keys[dimension] = data[f'{dimension}_keys'].tolist()
+                store._lookup[dimension] = {key: i for i, key in enumerate(store.keys[dimension])}
+                store.patterns[dimension] = data[f'{dimension}_patterns'].astype(np.int64)
+                store.rate_sums[dimension] = data[f'{dimension}_rate_sums'].astype(float)
+        return store
+
+    # ---- queries ----------------------------------------------------------
+
+    def _check(self, dimension):
+        if dimension not in DIMENSIONS:
+            raise ValueError(f"Unknown dimension {dimension!r}, expected one of {DIMENSIONS}")
+
+    def stats(self, dimension, key):
+        """ Counters of one product / category / Rate (None if it has no reviews yet). """
+        self._check(dimension)
+        i = self._lookup[dimension].get(_rate_key(key) if dimension == 'Rate' else key)
+        if i is None:
+            return None
+        patterns = self.patterns[dimension][i]
+        total, matched = int(patterns.sum()), int(patterns[MATCHED].sum())
+        return {
+            'reviews': total,
+            'matched': matched,
+            'mismatches': total - matched,
+            'mismatch_rate': (total - matched) / total if total else None,
+            'mean_rating': self.rate_sums[dimension][i] / total if total else None,
+            'rating_sum': float(self.rate_sums[dimension][i]),
+            'patterns': dict(zip(PATTERNS, patterns.tolist())),
+        }
+
+    def mismatch_rate(self, dimension, key):
+        """ Current mismatch rate (0-1) of one product / category / Rate, None if unknown. """
+        stats = self.stats(dimension, key)
+        return stats['mismatch_rate'] if stats else None
+
+    def table(self, dimension):
+        """ One row per key: reviews, matched, mismatch_rate, mean_rating and the pattern counts. """
+        self._check(dimension)
+        n = len(self.keys[dimension])
+        patterns = self.patterns[dimension][:n]
+        total = patterns.sum(axis=1)
+        matched = patterns[:, MATCHED].sum(axis=1)
+        table = pd.DataFrame({dimension: pd.Series(self.keys[dimension], dtype=object), 'reviews': total,
+                              'matched': matched})
+        with np.errstate(invalid='ignore', divide='ignore'):
+            table['mismatch_rate'] = (total - matched) / total
+            table['mean_rating'] = self.rate_sums[dimension][:n] / total
+        return pd.concat([table, pd.DataFrame(patterns, columns=PATTERNS)], axis=1)
+
+    def top(self, dimension, k=10, min_reviews=1):
+        """ The k keys with the highest mismatch rate among those with at least min_reviews reviews. """
+        table = self.table(dimension)
+        table = table[table['reviews'] >= min_reviews]
+        return table.sort_values(['mismatch_rate', 'reviews'], ascending=False, kind='stable').head(k)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Incremental per product / category / Rate mismatch counters")
+    parser.add_argument('--store', default=STORE_PATH, help="snapshot to update and query")
+    parser.add_argument('--add', nargs='*', default=[], help="scored review CSVs to add (already added files are skipped)")
+    parser.add_argument('--text-column', default='sentiment_code', help="text sentiment code column of the CSVs")
+    parser.add_argument('--product', default=None, help="print the counters of this product")
+    parser.add_argument('--top', choices=DIMENSIONS, default=None, help="print the keys with the highest mismatch rate")
+    parser.add_argument('-k', type=int, default=10)
+    parser.add_argument('--min-reviews', type=int, default=20)
+    args = parser.parse_args()
+
+    store = MismatchStore.load(args.store)
+    for path in args.add:
+        try:
+            rows = store.add_csv(path, args.text_column)
+        except ValueError as e:
+            parser.error(str(e))
+        print(f"Added {rows:,} reviews from '{path}'" if rows else f"'{path}' was already added; skipped")
+    if args.add:
+        store.save(args.store)
+    print(f"Store: {store.reviews:,} reviews ({store.skipped:,} skipped), "
+          f"{len(store.keys['product']):,} products, {len(store.keys['category']):,} categories, "
+          f"{store.code_source or 'no'} text codes")
+
+    if args.product:
+        stats = store.stats('product', args.product)
+        if stats is None:
+            print(f"No reviews of '{args.product}'")
+        else:
+            print(f"{args.product}: {stats['mismatches']:,} of {stats['reviews']:,} reviews mismatch "
+                  f"({100 * stats['mismatch_rate']:.1f}%), mean rating {stats['mean_rating']:.2f}")
+            for pattern, count in stats['patterns'].items():
+                if count and pattern.split(' -> ')[0] != pattern.split(' -> ')[1]:
+                    print(f"  - {pattern}: {count:,}")
+    if args.top:
+        top = store.top(args.top, args.k, args.min_reviews)
+        print(f"\nTop {args.top} by mismatch rate (at least {args.min_reviews} reviews):")
+        for _, row in top.iterrows():
+            print(f"  - {row[args.top]}: {100 * row['mismatch_rate']:.1f}% of {row['reviews']:,} reviews")
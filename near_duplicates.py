@@ -0,0 +1,341 @@
+import os
+import re
+import json
+import hashlib
+import argparse
+import multiprocessing
+import numpy as np
+import pandas as pd
+from scipy.sparse import coo_matrix
+from scipy.sparse.csgraph import connected_components
+from textblob import TextBlob
+from vaderSentiment.vaderSentiment import SentimentIntensityAnalyzer
+from instrumentation import step
+
+# Near-duplicate review clusters with MinHash and LSH banding.
+# Many reviews are small variations of the same template ("Very good product 👍", "very good
+# product!!"). Texts are normalized like sentiment_analysis.preprocess_text (lowercase, letters
+# and whitespace only), which already makes such variants identical; normalized texts are
+# factorized so every distinct text is signed once. The MinHash signature of a distinct text is
+# taken over its word unigrams and bigrams (NUM_PERM hash functions, computed with numpy over
+# chunks of texts in a fork-based process pool). LSH splits each signature into BANDS bands;
+# texts sharing a band value become candidates and are linked when their estimated Jaccard
+# similarity reaches THRESHOLD. Linked texts form a cluster whose representative is its most
+# frequent text; members that are not THRESHOLD-similar to the representative itself (chained
+# links) get clusters of their own, so every member is close to its representative.
+#
+# Output: one row per review (same order as the input) with cluster_id, representative (row
+# number of the representative review) and similarity (estimated Jaccard to it), plus a JSON
+# sidecar recording the source's sha256, the column, the threshold and the MinHash settings.
+# Scoring stages can score the representatives only and copy their scores (sentiment_analysis.py
+# --near-duplicates); load_clusters() only returns clusters built from the same data and settings.
+# The report holds cluster statistics and, on a sample of members, how often TextBlob / VADER
+# label a member like its representative.
+
+SOURCE_PATH = 'flipkart_reviews_full.csv'
+OUTPUT_PATH = 'processed_data/near_duplicates.csv'
+REPORT_PATH = 'outputs/near_duplicate_report.json'
+NUM_PERM = 64
+BANDS = 16
+THRESHOLD = 0.8
+CHUNK_SIZE = 50_000
+SAMPLE_SIZE = 2_000
+SEED = 0
+CLUSTERS_VERSION = 1
+_NON_LETTERS = re.compile(r'[^a-zA-Z\s]')
+_MASK32 = np.uint64(0xFFFFFFFF)
+_rng = np.random.default_rng(SEED)
+# Odd multipliers and offsets of the NUM_PERM hash functions h(x) = (a * x + b) >> 32 (mod 2^64)
+_A = _rng.integers(1, 2 ** 63, NUM_PERM, dtype=np.uint64) | np.uint64(1)
+_B = _rng.integers(0, 2 ** 63, NUM_PERM, dtype=np.uint64)
+_BIGRAM = np.uint64(0x9E3779B97F4A7C15)
+
+# Distinct texts being signed; set in the parent before the pool forks
+_TEXTS = None
+
+
+def normalize(texts):
+    """ Texts as sentiment_analysis.preprocess_text leaves them (vectorized). """
+    cleaned = texts.astype(str).str.lower().str.replace(_NON_LETTERS, '', regex=True)
+    return cleaned.str.split().str.join(' ')
+
+
+def signatures(texts):
+    """ MinHash signatures (len(texts) x NUM_PERM, uint32) of the word uni- and bigrams of texts. """
+    words = pd.Series(texts).str.split().explode()
+    docs = words.index.to_numpy()
+    present = words.notna().to_numpy()
+    docs, words = docs[present], words[present]
+    hashes = pd.util.hash_array(words.to_numpy(dtype=object))
+    # Bigrams of consecutive words of the same text
+    same = docs[1:] == docs[:-1]
+    bigrams = hashes[:-1][same] * _BIGRAM ^ hashes[1:][same]
+    shingles = np.concatenate([hashes, bigrams])
+    owners = np.concatenate([docs, docs[:-1][same]])
+    order = np.argsort(owners, kind='stable')
+    shingles, owners = shingles[order], owners[order]
+
+    signature = np.full((len(texts), NUM_PERM), np.iinfo(np.uint32).max, dtype=np.uint32)
+    if len(shingles):
+        starts = np.flatnonzero(np.r_[True, owners[1:] != owners[:-1]])
+        rows = owners[starts]
+        for i in range(NUM_PERM):
+            values = ((shingles * _A[i] + _B[i]) >> np.uint64(32)) & _MASK32
+            signature[rows, i] = np.minimum.reduceat(values, starts)
+    return signature
+
+
+def _sign_range(bounds):
+    start, stop = bounds
+    return start, signatures(_TEXTS[start:stop])
+
+
+def sign_all(texts, chunk_size=CHUNK_SIZE, jobs=None):
+    """ Signatures of every text, chunk by chunk in worker processes when possible. """
+    global _TEXTS
+    bounds = [(start, min(start + chunk_size, len(texts))) for start in range(0, len(texts), chunk_size)]
+    jobs = min(jobs or os.cpu_count() or 1, max(len(bounds), 1))
+    signature = np.empty((len(texts), NUM_PERM), dtype=np.uint32)
+    if jobs > 1 and not multiprocessing.current_process().daemon \
+            and 'fork' in multiprocessing.get_all_start_methods():
+        _TEXTS = texts
+        try:
+            with multiprocessing.get_context('fork').Pool(jobs) as pool:
+                for start, partial in pool.imap_unordered(_sign_range, bounds):
+                    signature[start:start + len(partial)] = partial
+        finally:
+            _TEXTS = None
+    else:
+        for start, stop in bounds:
+            signature[start:stop] = signatures(texts[start:stop])
+    return signature
+
+
+def similarity(signature, left, right):
+    """ Estimated Jaccard similarity of the text pairs (left[i], right[i]). """
+    return (signature[left] == signature[right]).mean(axis=1)
+
+
+def candidate_links(signature, bands=BANDS, threshold=THRESHOLD):
+    """
+    (left, right) pairs of texts sharing a band and at least threshold similar. Within a bucket
+    every text is compared with the bucket's first text only.
+    """
+    rows = signature.shape[1] // bands
+    left, right = [], []
+    for band in range(bands):
+        keys = np.zeros(len(signature), dtype=np.uint64)
+        for column in range(band * rows, (band + 1) * rows):
+            keys = keys * _BIGRAM + signature[:, column]
+        order = np.argsort(keys, kind='stable')
+        sorted_keys = keys[order]
+        starts = np.r_[True, sorted_keys[1:] != sorted_keys[:-1]]
+        first = order[np.flatnonzero(starts)][np.cumsum(starts) - 1]
+        linked = first != order
+        left.append(first[linked])
+        right.append(order[linked])
+    pairs = np.sort(np.concatenate(left).astype(np.int64) * len(signature) + np.concatenate(right))
+    pairs = pairs[np.r_[True, pairs[1:] != pairs[:-1]]] if len(pairs) else pairs
+    left, right = pairs // len(signature), pairs % len(signature)
+    similar = similarity(signature, left, right) >= threshold
+    return left[similar], right[similar]
+
+
+def cluster(texts, jobs=None, threshold=THRESHOLD):
+    """
+    Near-duplicate clusters of a Series of texts: a DataFrame (one row per text, same order)
+    with cluster_id, representative and similarity.
+    """
+    with step('normalize', rows=len(texts)):
+        codes, distinct = pd.factorize(normalize(texts).fillna(''))
+        distinct = np.asarray(distinct, dtype=object)
+    with step('minhash', rows=len(distinct)):
+        signature = sign_all(distinct, jobs=jobs)
+    with step('lsh', rows=len(distinct)):
+        left, right = candidate_links(signature, threshold=threshold)
+        graph = coo_matrix((np.ones(len(left), dtype=np.int8), (left, right)), shape=(len(distinct),) * 2)
+        components, component = connected_components(graph, directed=False)
+
+        # Representative of a component: its most frequent text (first seen on ties)
+        frequency = np.bincount(codes, minlength=len(distinct))
+        order = np.lexsort((np.arange(len(distinct)), -frequency, component))
+        head = np.r_[True, component[order][1:] != component[order][:-1]]
+        heads = np.empty(components, dtype=np.int64)
+        heads[component[order][head]] = order[head]
+        representative = heads[component]
+        score = similarity(signature, np.arange(len(distinct)), representative)
+        # Chained members that are not close to the representative stand for themselves
+        loose = score < threshold
+        representative[loose] = np.flatnonzero(loose)
+        score[loose] = 1.0
+
+        _, first_row = np.unique(codes, return_index=True)
+        clusters = pd.DataFrame({
+            'cluster_id': pd.factorize(representative[codes])[0],
+            'representative': first_row[representative[codes]],
+            'similarity': score[codes].round(4),
+        })
+    return clusters
+
+
+def cluster_stats(clusters, texts, top=10):
+    """ Cluster size statistics and the largest clusters with their representative text. """
+    sizes = clusters['cluster_id'].value_counts()
+    multi = sizes[sizes > 1]
+    largest = clusters.drop_duplicates('cluster_id').set_index('cluster_id').loc[multi.index[:top], 'representative']
+    return {
+        'reviews': len(clusters),
+        'clusters': len(sizes),
+        'singletons': int((sizes == 1).sum()),
+        'multi_member_clusters': len(multi),
+        'reviews_in_multi_member_clusters': int(multi.sum()),
+        'scoring_saved': round(1 - len(sizes) / max(len(clusters), 1), 4),
+        'size_percentiles': {f'p{q}': float(np.percentile(sizes, q)) for q in (50, 90, 99)} if len(sizes) else {},
+        'max_size': int(sizes.max()) if len(sizes) else 0,
+        'largest': [{'size': int(multi[cluster_id]), 'representative': str(texts.iloc[row])[:100]}
+                    for cluster_id, row in largest.items()],
+    }
+
+
+def _textblob_label(text):
+    # Same thresholds as get_textblob_sentiment in sentiment_analysis.py
+    polarity = TextBlob(str(text)).sentiment.polarity
+    return 0 if polarity < -0.1 else (2 if polarity > 0.1 else 1)
+
+
+def _vader_label(analyzer, text):
+    # Same thresholds as the aspect labels of aspect_sentiment_analysis.py
+    compound = analyzer.polarity_scores(str(text))['compound']
+    return -1 if compound < -0.1 else (1 if compound > 0.1 else 0)
+
+
+def agreement(clusters, texts, sample_size=SAMPLE_SIZE, seed=SEED):
+    """
+    On a sample of members that are not their own representative: share whose TextBlob and VADER
+    labels equal their representative's, overall and by similarity band.
+    """
+    members = np.flatnonzero(clusters['representative'].to_numpy() != np.arange(len(clusters)))
+    if not len(members):
+        return {'sampled_members': 0}
+    rng = np.random.default_rng(seed)
+    sample = np.sort(rng.choice(members, min(sample_size, len(members)), replace=False))
+    representatives = clusters['representative'].to_numpy()[sample]
+    normalized = normalize(texts.iloc[np.r_[sample, representatives]]).to_numpy()
+    member_text, representative_text = normalized[:len(sample)], normalized[len(sample):]
+    analyzer = SentimentIntensityAnalyzer()
+    table = pd.DataFrame({
+        'similarity': clusters['similarity'].to_numpy()[sample],
+        'textblob': [_textblob_label(a) == _textblob_label(b) for a, b in zip(member_text, representative_text)],
+        'vader': [_vader_label(analyzer, a) == _vader_label(analyzer, b)
+                  for a, b in zip(member_text, representative_text)],
+    })
+    bands = pd.cut(table['similarity'], [0, 0.9, 0.9999, 1], labels=['< 0.9', '0.9 - 1', 'identical'])
+    by_band = table.groupby(bands, observed=True)[['textblob', 'vader']].mean().round(4)
+    return {
+        'sampled_members': len(sample),
+        'textblob_agreement': round(float(table['textblob'].mean()), 4),
+        'vader_agreement': round(float(table['vader'].mean()), 4),
+        'by_similarity': {str(band): {'members': int((bands == band).sum()), **row.to_dict()}
+                          for band, row in by_band.iterrows()},
+    }
+
+
+def apply_representatives(series, function, clusters=None):
+    """
+    series.apply(function), but with clusters only evaluated for the cluster representatives;
+    every other review gets its representative's result.
+    """
+    if clusters is None:
+        return series.apply(function)
+    representative = clusters['representative'].to_numpy()
+    scored = np.unique(representative)
+    results = series.iloc[scored].apply(function).to_numpy()
+    return pd.Series(results[np.searchsorted(scored, representative)], index=series.index, name=series.name)
+
+
+def _file_hash(path, chunk_size=1 << 20):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def meta_path(path=OUTPUT_PATH):
+    """ The JSON sidecar of a cluster table. """
+    return os.path.splitext(path)[0] + '.json'
+
+
+def cluster_meta(source, column, threshold, rows):
+    return {'version': CLUSTERS_VERSION, 'source_sha256': _file_hash(source), 'column': column,
+            'threshold': threshold, 'num_perm': NUM_PERM, 'bands': BANDS, 'rows': rows}
+
+
+def save_clusters(clusters, meta, path=OUTPUT_PATH):
+    """ Write the cluster table, then its sidecar (so a table never pairs with an older sidecar). """
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    if os.path.exists(meta_path(path)):
+        os.remove(meta_path(path))
+    tmp_path = path + '.tmp'
+    clusters.to_csv(tmp_path, index=False)
+    os.replace(tmp_path, path)
+    tmp_path = meta_path(path) + '.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump(meta, f, indent=2)
+    os.replace(tmp_path, meta_path(path))
+
+
+def load_clusters(source=SOURCE_PATH, column='text', threshold=THRESHOLD, path=OUTPUT_PATH):
+    """
+    The cluster table of column in the source CSV, or None if it is missing or was built from
+    another file, column, threshold or MinHash setting.
+    """
+    if not (os.path.exists(path) and os.path.exists(meta_path(path))):
+        return None
+    with open(meta_path(path)) as f:
+        meta = json.load(f)
+    expected = cluster_meta(source, column, threshold, meta.get('rows'))
+    if any(meta.get(key) != value for key, value in expected.items()):
+        return None
+    clusters = pd.read_csv(path)
+    return clusters if len(clusters) == meta['rows'] else None
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Cluster near-duplicate reviews with MinHash LSH")
+    parser.add_argument('--source', default=SOURCE_PATH, help="review CSV")
+    parser.add_argument('--column', default='text', help="text column to cluster")
+    parser.add_argument('--output', default=OUTPUT_PATH, help="cluster table (one row per review)")
+    parser.add_argument('--threshold', type=float, default=THRESHOLD,
+                        help="estimated Jaccard similarity that links two texts")
+    parser.add_argument('--jobs', type=int, default=None, help="worker processes (default: all CPUs)")
+    parser.add_argument('--sample', type=int, default=SAMPLE_SIZE,
+                        help="members scored for the representative agreement check (0 to skip)")
+    args = parser.parse_args()
+
+    with step('load') as record:
+        texts = pd.read_csv(args.source, usecols=[args.column])[args.column]
+        record['rows'] = len(texts)
+    clusters = cluster(texts, jobs=args.jobs, threshold=args.threshold)
+    save_clusters(clusters, cluster_meta(args.source, args.column, args.threshold, len(clusters)), args.output)
+
+    report = {'source': args.source, 'column': args.column, 'num_perm': NUM_PERM, 'bands': BANDS,
+              'threshold': args.threshold, **cluster_stats(clusters, texts)}
+    if args.sample:
+        with step('agreement', rows=args.sample):
+            report['agreement'] = agreement(clusters, texts, args.sample)
+    os.makedirs(os.path.dirname(REPORT_PATH), exist_ok=True)
+    with open(REPORT_PATH, 'w') as f:
+        json.dump(report, f, indent=2)
+
+    print(f"{report['reviews']:,} reviews in {report['clusters']:,} clusters "
+          f"({report['multi_member_clusters']:,} with several members covering "
+          f"{report['reviews_in_multi_member_clusters']:,} reviews, largest {report['max_size']:,})")
+    print(f"Scoring one representative per cluster skips {report['scoring_saved']:.1%} of the reviews")
+    for entry in report['largest'][:5]:
+        print(f"  - {entry['size']:>8,}  {entry['representative']!r}")
+    if 'agreement' in report and report['agreement']['sampled_members']:
+        agree = report['agreement']
+        print(f"Representative/member label agreement on {agree['sampled_members']:,} members: "
+              f"TextBlob {agree['textblob_agreement']:.1%}, VADER {agree['vader_agreement']:.1%}")
+    print(f"Clusters saved to '{args.output}', report to '{REPORT_PATH}'")
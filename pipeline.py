@@ -0,0 +1,350 @@
+import os
+import sys
+import glob
+import json
+import time
+import shlex
+import hashlib
+import argparse
+import subprocess
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from instrumentation import REPORT_DIR
+
+# Single entry point for the whole study.
+# Each stage declares the files it reads, the files it writes, the code it runs and its
+# command-line parameters (flag_inputs: files it also reads when a flag is among its args); a
+# stage depends on every stage that writes one of its inputs, which gives the DAG
+#
+#   convert -> sentiment -> aspects -> regression
+#          |             \-> visuals
+#          \-> near_duplicates (-> sentiment, when run with --near-duplicates)
+#
+# A stage's fingerprint is a hash over the contents of its inputs, its code files (the script
+# and every repository module it imports, instrumentation.py included) and its parameters.
+# A stage whose fingerprint matches the last successful run and whose outputs all exist is
+# skipped; since fingerprints hash contents, a re-run upstream stage that writes identical
+# outputs does not invalidate anything downstream. Ready stages run as subprocesses in
+# parallel (aspects and visuals only share the sentiment output), each logging to its own
+# file under LOG_DIR. File hashes are cached by size and mtime.
+# Every stage script records its steps (instrumentation.py) in REPORT_DIR; after a run their
+# reports and the stage times are combined into RUN_REPORT_PATH.
+
+STATE_PATH = '.cache/pipeline/state.json'
+LOG_DIR = '.cache/pipeline/logs'
+STATE_VERSION = 1
+RUN_REPORT_PATH = 'outputs/run_report.json'
+
+STAGES = [
+    {
+        'name': 'convert',
+        'script': 'convert_parquet_to_csv.py',
+        'inputs': ['train.parquet', 'test.parquet'],
+        'outputs': ['flipkart_reviews_full.csv'],
+        'code': ['convert_parquet_to_csv.py', 'arrow_convert.py', 'stratified.py', 'instrumentation.py'],
+        'args': [],
+    },
+    {
+        'name': 'near_duplicates',
+        'script': 'near_duplicates.py',
+        'inputs': ['flipkart_reviews_full.csv'],
+        'outputs': ['processed_data/near_duplicates.csv', 'processed_data/near_duplicates.json',
+                    'outputs/near_duplicate_report.json'],
+        'code': ['near_duplicates.py', 'instrumentation.py'],
+        'args': [],
+    },
+    {
+        'name': 'sentiment',
+        'script': 'sentiment_analysis.py',
+        'inputs': ['flipkart_reviews_full.csv'],
+        'flag_inputs': {'--near-duplicates': ['processed_data/near_duplicates.csv',
+                                              'processed_data/near_duplicates.json']},
+        'outputs': ['flipkart_reviews_with_sentiment.csv'],
+        'code': ['sentiment_analysis.py', 'near_duplicates.py', 'instrumentation.py'],
+        'args': [],
+    },
+    {
+        'name': 'aspects',
+        'script': 'aspect_sentiment_analysis.py',
+        'inputs': ['flipkart_reviews_with_sentiment.csv', 'config/aspect_taxonomy.json'],
+        'outputs': ['processed_data/aspect_sentiment_vader.csv', 'processed_data/aspect_index.npz',
+                    'processed_data/aspect_rollup.csv'],
+        'code': ['aspect_sentiment_analysis.py', 'aspect_index.py', 'aspect_taxonomy.py', 'aspect_rollup.py',
+                 'instrumentation.py'],
+        'args': [],
+    },
+    {
+        'name': 'regression',
+        'script': 'regression_analysis_predict_rating_from_aspect_sentiments.py',
+        'inputs': ['processed_data/aspect_sentiment_vader.csv'],
+        'outputs': ['outputs/regression_results.csv', 'outputs/model_summary.txt',
+                    'outputs/rating_ensemble.joblib'],
+        'code': ['regression_analysis_predict_rating_from_aspect_sentiments.py', 'approximate_svr.py',
+                 'balancing.py', 'diagnostic_plots.py', 'rating_predictor.py', 'instrumentation.py'],
+        'args': [],
+    },
+    {
+        'name': 'visuals',
+        'script': 'visuals/render_all.py',
+        'inputs': ['flipkart_reviews_with_sentiment.csv'],
+        'outputs': ['visual_images/manifest.json'],
+        'code': ['visuals/*.py', 'stratified.py', 'instrumentation.py'],
+        # render_all keeps its own per-figure manifest; only re-render figures that changed
+        'args': ['--changed'],
+    },
+]
+
+
+def stage_inputs(stage):
+    """ The stage's inputs, plus the flag_inputs of the flags among its args. """
+    extra = [path for flag, paths in stage.get('flag_inputs', {}).items() if flag in stage['args'] for path in paths]
+    return stage['inputs'] + extra
+
+
+def dependencies(stages=STAGES):
+    """ {stage name: set of stage names it needs}, from the declared inputs and outputs. """
+    writers = {output: stage['name'] for stage in stages for output in stage['outputs']}
+    return {stage['name']: {writers[path] for path in stage_inputs(stage) if path in writers} for stage in stages}
+
+
+def upstream(targets, deps):
+    """ targets plus everything they (transitively) depend on. """
+    selected, todo = set(), list(targets)
+    while todo:
+        name = todo.pop()
+        if name not in selected:
+            selected.add(name)
+            todo.extend(deps[name])
+    return selected
+
+
+class FileHashes:
+    """ sha256 of files, remembered by (size, mtime_ns) between runs. """
+
+    def __init__(self, known=None):
+        self.known = dict(known or {})
+
+    def __call__(self, path):
+        stat = os.stat(path)
+        entry = self.known.get(path)
+        if entry and entry['size'] == stat.st_size and entry['mtime_ns'] == stat.st_mtime_ns:
+            return entry['sha256']
+        digest = hashlib.sha256()
+        with open(path, 'rb') as f:
+            for chunk in iter(lambda: f.read(1 << 20), b''):
+                digest.update(chunk)
+        self.known[path] = {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns, 'sha256': digest.hexdigest()}
+        return digest.hexdigest()
+
+
+def code_files(stage):
+    return sorted({path for pattern in stage['code'] for path in glob.glob(pattern)})
+
+
+def fingerprint(stage, file_hash):
+    """ Hash of the stage's input contents, code and parameters (None if an input is missing). """
+    digest = hashlib.sha256()
+    for path in stage_inputs(stage):
+        if not os.path.exists(path):
+            return None
+        digest.update(f"input {path} {file_hash(path)}\n".encode())
+    for path in code_files(stage):
+        digest.update(f"code {path} {file_hash(path)}\n".encode())
+    digest.update(f"args {json.dumps(stage['args'])} python {sys.version_info[:2]}\n".encode())
+    return digest.hexdigest()[:16]
+
+
+def load_state(path=STATE_PATH):
+    if not os.path.exists(path):
+        return {'version': STATE_VERSION, 'stages': {}, 'files': {}}
+    with open(path) as f:
+        state = json.load(f)
+    if state.get('version') != STATE_VERSION:
+        return {'version': STATE_VERSION, 'stages': {}, 'files': {}}
+    return state
+
+
+def save_state(state, path=STATE_PATH):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump(state, f, indent=2)
+    os.replace(tmp_path, path)
+
+
+def is_up_to_date(stage, current, state):
+    recorded = state['stages'].get(stage['name'], {})
+    return (current is not None and recorded.get('fingerprint') == current
+            and all(os.path.exists(path) for path in stage['outputs']))
+
+
+def stage_report_path(stage):
+    """ Where the stage script's own step report ends up (see instrumentation.py). """
+    return os.path.join(REPORT_DIR, os.path.splitext(os.path.basename(stage['script']))[0] + '.json')
+
+
+def run_stage(stage, extra_env=None):
+    """ Run one stage as a subprocess; returns (returncode, seconds, log path). """
+    os.makedirs(LOG_DIR, exist_ok=True)
+    log_path = os.path.join(LOG_DIR, f"{stage['name']}.log")
+    # A stage that fails early must not leave the report of its previous run behind
+    if os.path.exists(stage_report_path(stage)):
+        os.remove(stage_report_path(stage))
+    start = time.perf_counter()
+    with open(log_path, 'w') as log:
+        env = dict(os.environ, MPLBACKEND='Agg', PYTHONUNBUFFERED='1', RUN_REPORT_DIR=REPORT_DIR, **(extra_env or {}))
+        returncode = subprocess.call([sys.executable, stage['script']] + stage['args'],
+                                     stdout=log, stderr=subprocess.STDOUT, env=env)
+    return returncode, time.perf_counter() - start, log_path
+
+
+def write_run_report(status, seconds, path=RUN_REPORT_PATH, stages=STAGES):
+    """ Combine the stage statuses and times with the step reports of the stages that ran. """
+    report = {'finished': time.strftime('%Y-%m-%dT%H:%M:%S'), 'stages': {}}
+    for stage in stages:
+        name = stage['name']
+        if name not in status:
+            continue
+        entry = {'status': status[name], 'seconds': seconds.get(name)}
+        stage_report = stage_report_path(stage)
+        if name in seconds and os.path.exists(stage_report):
+            with open(stage_report) as f:
+                stage_steps = json.load(f)
+            entry['peak_rss_mb'] = stage_steps['peak_rss_mb']
+            entry['steps'] = stage_steps['steps']
+        report['stages'][name] = entry
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump(report, f, indent=2)
+    os.replace(tmp_path, path)
+    return report
+
+
+def run_pipeline(targets=None, force=(), jobs=2, dry_run=False, stages=STAGES, extra_env=None):
+    """
+    Run the stages needed for targets (all by default); returns {stage: status}.
+    extra_env is added to the environment of every stage (e.g. PROFILE_STEP).
+    """
+    deps = dependencies(stages)
+    by_name = {stage['name']: stage for stage in stages}
+    selected = upstream(targets or list(by_name), deps)
+    order = [stage['name'] for stage in stages if stage['name'] in selected]
+    state = load_state()
+    file_hash = FileHashes(state['files'])
+    status = {}
+    seconds = {}
+    running = {}
+    launched = {}
+
+    def ready(name):
+        return all(status.get(dep) in ('skipped', 'done') for dep in deps[name] if dep in selected)
+
+    def blocked(name):
+        return any(status.get(dep) in ('failed', 'blocked') for dep in deps[name] if dep in selected)
+
+    with ThreadPoolExecutor(max_workers=max(jobs, 1)) as pool:
+        while len(status) < len(order):
+            for name in order:
+                if name in status or name in running.values():
+                    continue
+                if blocked(name):
+                    status[name] = 'blocked'
+                    print(f"  - {name:<12} blocked (an upstream stage failed)")
+                    continue
+                if not ready(name):
+                    continue
+                stage = by_name[name]
+                current = fingerprint(stage, file_hash)
+                if name not in force and is_up_to_date(stage, current, state):
+                    status[name] = 'skipped'
+                    print(f"  - {name:<12} up to date ({current})")
+                elif current is None and stage['outputs'] and all(os.path.exists(p) for p in stage['outputs']):
+                    # e.g. no parquet files, but the CSV they were converted to is there
+                    status[name] = 'skipped'
+                    print(f"  - {name:<12} inputs missing, keeping the existing outputs")
+                elif current is None:
+                    missing = [path for path in stage_inputs(stage) if not os.path.exists(path)]
+                    status[name] = 'failed'
+                    print(f"  - {name:<12} FAILED: missing inputs {missing}")
+                elif dry_run:
+                    # Pretend it ran so that the rest of the plan can be shown
+                    status[name] = 'done'
+                    print(f"  - {name:<12} would run ({current})")
+                else:
+                    print(f"  - {name:<12} running ...")
+                    running[pool.submit(run_stage, stage, extra_env)] = name
+                    launched[name] = current
+            if not running:
+                continue
+            finished, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in finished:
+                name = running.pop(future)
+                returncode, elapsed, log_path = future.result()
+                seconds[name] = round(elapsed, 3)
+                if returncode == 0:
+                    status[name] = 'done'
+                    # The outputs were built from the inputs as they were at launch; if those changed
+                    # while the stage ran, leave it out of date so the next run builds it again
+                    if fingerprint(by_name[name], file_hash) == launched[name]:
+                        state['stages'][name] = {'fingerprint': launched[name],
+                                                 'seconds': round(elapsed, 3),
+                                                 'finished': time.strftime('%Y-%m-%dT%H:%M:%S')}
+                        print(f"  - {name:<12} done in {elapsed:.1f}s (log: {log_path})")
+                    else:
+                        state['stages'].pop(name, None)
+                        print(f"  - {name:<12} done in {elapsed:.1f}s, but its inputs or code changed while it "
+                              f"ran; it will run again next time (log: {log_path})")
+                else:
+                    status[name] = 'failed'
+                    print(f"  - {name:<12} FAILED with exit code {returncode} after {elapsed:.1f}s (log: {log_path})")
+            state['files'] = file_hash.known
+            if not dry_run:
+                save_state(state)
+    if seconds:
+        write_run_report(status, seconds, stages=stages)
+    return status
+
+
+if __name__ == '__main__':
+    names = [stage['name'] for stage in STAGES]
+    parser = argparse.ArgumentParser(description="Run the review study pipeline, skipping up-to-date stages")
+    parser.add_argument('targets', nargs='*', metavar='STAGE',
+                        help=f"stages to bring up to date, with everything they need (default: all of {names})")
+    parser.add_argument('--force', nargs='+', default=[], choices=names, metavar='STAGE',
+                        help="re-run these stages even if they are up to date")
+    parser.add_argument('--args', action='append', default=[], metavar='STAGE=ARGS',
+                        help="extra command-line arguments for a stage, e.g. regression='--mode collapsed'")
+    parser.add_argument('--jobs', type=int, default=2, help="stages run at the same time")
+    parser.add_argument('--dry-run', action='store_true', help="only show which stages would run")
+    parser.add_argument('--profile-step', metavar='STEP',
+                        help="run this step (e.g. textblob, fit:SVR, figure:insight_8_...) under cProfile; "
+                             f"the dump is written next to the step reports in {REPORT_DIR}")
+    parser.add_argument('--trace-memory', action='store_true',
+                        help="also record the tracemalloc peak of every step (slower)")
+    args = parser.parse_args()
+    unknown = set(args.targets) - set(names)
+    if unknown:
+        parser.error(f"unknown stages: {sorted(unknown)} (choose from {names})")
+
+    for item in args.args:
+        name, _, extra = item.partition('=')
+        if name not in names:
+            parser.error(f"unknown stage in --args: {name!r}")
+        stage = next(stage for stage in STAGES if stage['name'] == name)
+        stage['args'] = stage['args'] + shlex.split(extra)
+
+    start = time.perf_counter()
+    extra_env = {}
+    if args.profile_step:
+        extra_env['PROFILE_STEP'] = args.profile_step
+    if args.trace_memory:
+        extra_env['TRACE_MEMORY'] = '1'
+    status = run_pipeline(args.targets, force=set(args.force), jobs=args.jobs, dry_run=args.dry_run,
+                          extra_env=extra_env)
+    counts = {s: list(status.values()).count(s) for s in ['done', 'skipped', 'failed', 'blocked']}
+    print(f"\nPipeline finished in {time.perf_counter() - start:.1f}s: "
+          + ', '.join(f"{count} {s}" for s, count in counts.items() if count))
+    if not args.dry_run and (counts['done'] or counts['failed']):
+        print(f"Run report saved to '{RUN_REPORT_PATH}'")
+    if counts['failed'] or counts['blocked']:
+        raise SystemExit(1)
@@ -0,0 +1,166 @@
+import os
+import time
+import argparse
+import itertools
+import warnings
+import joblib
+import numpy as np
+import pandas as pd
+import sklearn
+
+# Persisted form of the weighted rating ensemble from
+# regression_analysis_predict_rating_from_aspect_sentiments.py, plus a batch predictor.
+# The artifact is a single joblib file holding the fitted PolynomialFeatures, StandardScaler,
+# the four models and their R²-derived weights. On load, the predictor pushes all 3**4
+# possible -1/0/1 aspect vectors through poly -> scaler -> weighted model sum once, so scoring
+# a batch is a single vectorized base-3 encode plus a table lookup. Inputs outside -1/0/1 fall
+# back to the full transform in fixed-size batches.
+
+ARTIFACT_VERSION = 1
+ARTIFACT_PATH = 'outputs/rating_ensemble.joblib'
+# Aspect feature values; the regression script imports these and the encoding below, so the
+# artifact's lookup table and the collapsed training always agree on what a code means
+ASPECT_LEVELS = [-1, 0, 1]
+
+
+def all_patterns(n_features):
+    """ Every -1/0/1 feature row, ordered by pattern code. """
+    return np.array(list(itertools.product(ASPECT_LEVELS, repeat=n_features)), dtype=float)
+
+
+def is_pattern(X):
+    """ Which rows of X have every value in ASPECT_LEVELS. """
+    return np.isin(X, ASPECT_LEVELS).all(axis=1)
+
+
+def pattern_codes(X):
+    """ Base-3 code of each -1/0/1 feature row: its position in all_patterns(). """
+    X = np.asarray(X)
+    if not np.isin(X, ASPECT_LEVELS).all():
+        raise ValueError(f"Pattern codes need every feature in {ASPECT_LEVELS}")
+    return (X + 1).astype(np.int64) @ (3 ** np.arange(X.shape[1] - 1, -1, -1))
+
+
+def save_ensemble(poly, scaler, models, weights, features, path=ARTIFACT_PATH, **metadata):
+    """ Write the fitted ensemble as one versioned artifact. """
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    artifact = {
+        'version': ARTIFACT_VERSION,
+        'sklearn_version': sklearn.__version__,
+        'created': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'features': list(features),
+        'poly': poly,
+        'scaler': scaler,
+        'models': dict(models),
+        'weights': dict(zip(models, np.asarray(weights, dtype=float))),
+        'metadata': metadata,
+    }
+    tmp_path = path + '.tmp'
+    joblib.dump(artifact, tmp_path)
+    os.replace(tmp_path, path)
+    return path
+
+
+class RatingPredictor:
+    """ Loads the ensemble artifact once and scores aspect vectors in batches. """
+
+    def __init__(self, artifact):
+        if artifact.get('version') != ARTIFACT_VERSION:
+            raise ValueError(f"Unsupported ensemble artifact version {artifact.get('version')!r} "
+                             f"(expected {ARTIFACT_VERSION})")
+        if artifact['sklearn_version'] != sklearn.__version__:
+            warnings.warn(f"Ensemble was saved with scikit-learn {artifact['sklearn_version']}, "
+                          f"running {sklearn.__version__}")
+        self.features = artifact['features']
+        self.poly = artifact['poly']
+        self.scaler = artifact['scaler']
+        self.models = artifact['models']
+        self.weights = artifact['weights']
+        self.metadata = artifact.get('metadata', {})
+
+        # Ensemble prediction for every -1/0/1 pattern, indexed by base-3 code
+        self.table = self._predict_transformed(all_patterns(len(self.features)))
+
+    @classmethod
+    def load(cls, path=ARTIFACT_PATH):
+        return cls(joblib.load(path))
+
+    def _predict_transformed(self, X):
+        """ poly -> scaler -> weighted sum of the member models. """
+        X_scaled = self.scaler.transform(self.poly.transform(X))
+        y_pred = np.zeros(len(X_scaled))
+        for name, model in self.models.items():
+            y_pred += self.weights[name] * model.predict(X_scaled)
+        return y_pred
+
+    def predict(self, X, batch_size=100_000):
+        """ Ensemble rating for each row of X (array or DataFrame with the aspect columns). """
+        if isinstance(X, pd.DataFrame):
+            X = X[self.features]
+        X = np.asarray(X, dtype=float)
+        if X.ndim != 2 or X.shape[1] != len(self.features):
+            raise ValueError(f"Expected rows of {len(self.features)} aspect values {self.features}")
+
+        missing = ~np.isfinite(X).all(axis=1)
+        if missing.any():
+            raise ValueError(f"{missing.sum():,} rows have missing or non-finite aspect values "
+                             f"(first at row {np.flatnonzero(missing)[0]}); drop or fill them before scoring")
+
+        # Base-3 codes of the rows with every value in -1/0/1; the others take the transform path
+        discrete = is_pattern(X)
+        y_pred = np.empty(len(X))
+        y_pred[discrete] = self.table[pattern_codes(X[discrete])]
+
+        rest = np.flatnonzero(~discrete)
+        for start in range(0, len(rest), batch_size):
+            rows = rest[start:start + batch_size]
+            y_pred[rows] = self._predict_transformed(X[rows])
+        return y_pred
+
+
+def benchmark(predictor, n_rows, repeats=3, transform_rows=50_000):
+    """
+    Rows/sec of the lookup path and of the full transform path on random aspect vectors.
+    The transform path (the cost of scoring without the table) is timed on at most transform_rows rows.
+    """
+    rng = np.random.default_rng(42)
+    X = rng.choice(ASPECT_LEVELS, size=(n_rows, len(predictor.features))).astype(float)
+    results = {}
+    for label, fn, rows in (('lookup', predictor.predict, n_rows),
+                            ('transform', predictor._predict_transformed, min(n_rows, transform_rows))):
+        best = min(_timed(fn, X[:rows]) for _ in range(repeats))
+        results[label] = rows / best
+        print(f"  - {label}: {rows:,} rows in {best:.3f}s ({rows / best:,.0f} rows/sec)")
+    return results
+
+
+def _timed(fn, X):
+    start = time.perf_counter()
+    fn(X)
+    return time.perf_counter() - start
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Score aspect sentiment vectors with the saved rating ensemble")
+    parser.add_argument('--model', default=ARTIFACT_PATH, help="ensemble artifact written by the regression script")
+    parser.add_argument('--input', help="CSV with quality/cost/delivery/flexibility columns to score")
+    parser.add_argument('--output', help="where to write the scored CSV (default: <input>_predicted.csv)")
+    parser.add_argument('--benchmark', type=int, metavar='ROWS',
+                        help="measure throughput on this many random aspect vectors")
+    args = parser.parse_args()
+
+    predictor = RatingPredictor.load(args.model)
+    print(f"Loaded ensemble ({', '.join(predictor.models)}) from '{args.model}'")
+
+    if args.input:
+        df = pd.read_csv(args.input)
+        start = time.perf_counter()
+        df['predicted_rating'] = predictor.predict(df)
+        elapsed = time.perf_counter() - start
+        output = args.output or os.path.splitext(args.input)[0] + '_predicted.csv'
+        df.to_csv(output, index=False)
+        print(f"Scored {len(df):,} rows in {elapsed:.3f}s; saved to '{output}'")
+
+    if args.benchmark:
+        print(f"\nThroughput benchmark ({args.benchmark:,} rows):")
+        benchmark(predictor, args.benchmark)
@@ -2,165 +2,523 @@ import pandas as pd
 import numpy as np
 import matplotlib.pyplot as plt
 import seaborn as sns
-from sklearn.model_selection import train_test_split, cross_val_score
+import argparse
+import time
+import tracemalloc
+import tempfile
+import warnings
+from concurrent.futures import ProcessPoolExecutor
+from sklearn.model_selection import train_test_split, KFold
+from sklearn.base import clone
 from sklearn.linear_model import LinearRegression, Ridge, Lasso, ElasticNet
 from sklearn.ensemble import RandomForestRegressor, GradientBoostingRegressor, VotingRegressor
 from sklearn.preprocessing import StandardScaler, PolynomialFeatures
 from sklearn.metrics import mean_squared_error, r2_score, mean_absolute_error
 from sklearn.svm import SVR
-from imblearn.over_sampling import SMOTE
+from sklearn.exceptions import ConvergenceWarning
+from approximate_svr import SVR_METHODS, make_svr
+from diagnostic_plots import render_diagnostics
+from balancing import BALANCE_STRATEGIES, timed_balance, weighted_balance
+from rating_predictor import ARTIFACT_PATH, all_patterns, pattern_codes, save_ensemble
+from instrumentation import step, add_steps, _peak_rss_mb
 import os
 
-# Set style for better visualizations
-plt.style.use('seaborn-v0_8')
-sns.set_theme(style="whitegrid")
-
-# Load and prepare data
-df = pd.read_csv("processed_data/aspect_sentiment_vader.csv")
-df = df.dropna(subset=['quality', 'cost', 'delivery', 'flexibility', 'Rate'])
-
-# Create polynomial features and interactions
-poly = PolynomialFeatures(degree=2, include_bias=False)
-features = ['quality', 'cost', 'delivery', 'flexibility']
-X = df[features]
-poly_features = poly.fit_transform(X)
-feature_names = poly.get_feature_names_out(features)
-
-# Prepare target
-y = df['Rate']
-
-# Split data
-X_train, X_test, y_train, y_test = train_test_split(poly_features, y, test_size=0.2, random_state=42)
-
-# Scale features
-scaler = StandardScaler()
-X_train_scaled = scaler.fit_transform(X_train)
-X_test_scaled = scaler.transform(X_test)
-
-# Apply SMOTE for better balance
-smote = SMOTE(random_state=42)
-X_train_balanced, y_train_balanced = smote.fit_resample(X_train_scaled, y_train)
-
-# Initialize models
-models = {
-    'Random Forest': RandomForestRegressor(n_estimators=200, max_depth=10, random_state=42),
-    'Gradient Boosting': GradientBoostingRegressor(n_estimators=200, learning_rate=0.1, random_state=42),
-    'SVR': SVR(kernel='rbf', C=1.0, epsilon=0.1),
-    'ElasticNet': ElasticNet(random_state=42, alpha=0.1, l1_ratio=0.5)
-}
-
-# Train and evaluate models
-print("\nModel Performance:")
-print("-" * 50)
-
-results = {}
-predictions = {}
-
-for name, model in models.items():
-    # Train model
-    model.fit(X_train_balanced, y_train_balanced)
-    
-    # Make predictions
-    y_pred = model.predict(X_test_scaled)
-    predictions[name] = y_pred
-    
-    # Calculate metrics
-    mse = mean_squared_error(y_test, y_pred)
-    rmse = np.sqrt(mse)
-    mae = mean_absolute_error(y_test, y_pred)
-    r2 = r2_score(y_test, y_pred)
-    
-    results[name] = {
-        'RMSE': rmse,
-        'MAE': mae,
-        'R2': r2
+FEATURES = ['quality', 'cost', 'delivery', 'flexibility']
+# Every aspect feature is -1/0/1 (rating_predictor.ASPECT_LEVELS), so there are at most
+# 3**4 = 81 distinct feature rows
+
+def build_models(svr='exact'):
+    """ Fresh, unfitted ensemble members (svr picks the exact or a scalable SVR, see approximate_svr.py). """
+    return {
+        'Random Forest': RandomForestRegressor(n_estimators=200, max_depth=10, random_state=42),
+        'Gradient Boosting': GradientBoostingRegressor(n_estimators=200, learning_rate=0.1, random_state=42),
+        'SVR': make_svr(svr),
+        'ElasticNet': ElasticNet(random_state=42, alpha=0.1, l1_ratio=0.5)
+    }
+
+def evaluate(y_true, y_pred):
+    """ RMSE / MAE / R² for one set of predictions. """
+    mse = mean_squared_error(y_true, y_pred)
+    return {
+        'RMSE': np.sqrt(mse),
+        'MAE': mean_absolute_error(y_true, y_pred),
+        'R2': r2_score(y_true, y_pred)
     }
-    
-    print(f"\n{name}:")
-    print(f"RMSE: {rmse:.4f}")
-    print(f"MAE: {mae:.4f}")
-    print(f"R² Score: {r2:.4f}")
-
-# Create ensemble
-weights = [results[model]['R2'] for model in models.keys()]
-weights = np.array(weights)
-weights = weights / weights.sum()  # Normalize weights
-
-ensemble_pred = np.zeros_like(y_test, dtype=float)
-for (name, pred), weight in zip(predictions.items(), weights):
-    ensemble_pred += weight * pred
-
-ensemble_rmse = np.sqrt(mean_squared_error(y_test, ensemble_pred))
-ensemble_mae = mean_absolute_error(y_test, ensemble_pred)
-ensemble_r2 = r2_score(y_test, ensemble_pred)
-
-print("\nWeighted Ensemble:")
-print(f"RMSE: {ensemble_rmse:.4f}")
-print(f"MAE: {ensemble_mae:.4f}")
-print(f"R² Score: {ensemble_r2:.4f}")
-
-# Create output directory if it doesn't exist
-os.makedirs('outputs', exist_ok=True)
-
-# Save results
-results_df = pd.DataFrame({
-    'Actual': y_test,
-    'Predicted': ensemble_pred,
-    'Error': y_test - ensemble_pred
-})
-results_df.to_csv('outputs/regression_results.csv', index=False)
-
-# Plot actual vs predicted
-plt.figure(figsize=(10, 6))
-plt.scatter(y_test, ensemble_pred, alpha=0.5)
-plt.plot([y_test.min(), y_test.max()], [y_test.min(), y_test.max()], 'r--', lw=2)
-plt.xlabel("Actual Rating")
-plt.ylabel("Predicted Rating")
-plt.title("Aspect Sentiment vs Rating: Prediction Analysis")
-plt.grid(True)
-plt.tight_layout()
-plt.savefig('outputs/prediction_analysis.png', dpi=300, bbox_inches='tight')
-plt.close()
-
-# Plot error distribution
-plt.figure(figsize=(10, 6))
-sns.histplot(results_df['Error'], bins=50, kde=True)
-plt.title('Prediction Error Distribution')
-plt.xlabel('Error (Predicted - Actual Rating)')
-plt.ylabel('Count')
-plt.grid(True)
-plt.tight_layout()
-plt.savefig('outputs/error_distribution.png', dpi=300, bbox_inches='tight')
-plt.close()
-
-# Save summary
-with open('outputs/model_summary.txt', 'w') as f:
-    f.write("Aspect Sentiment vs Rating Analysis Summary\n")
-    f.write("=" * 50 + "\n\n")
-    f.write("Individual Model Performance:\n")
-    for name, metrics in results.items():
-        f.write(f"\n{name}:\n")
-        for metric, value in metrics.items():
-            f.write(f"{metric}: {value:.4f}\n")
-    
-    f.write("\nEnsemble Model Performance:\n")
-    f.write(f"RMSE: {ensemble_rmse:.4f}\n")
-    f.write(f"MAE: {ensemble_mae:.4f}\n")
-    f.write(f"R² Score: {ensemble_r2:.4f}\n")
-
-# Save feature importance analysis
-if hasattr(models['Random Forest'], 'feature_importances_'):
-    importance = models['Random Forest'].feature_importances_
-    importance_df = pd.DataFrame({
-        'Feature': feature_names,
-        'Importance': importance
-    }).sort_values('Importance', ascending=False)
-    
-    plt.figure(figsize=(12, 6))
-    sns.barplot(data=importance_df.head(10), x='Importance', y='Feature')
-    plt.title('Top 10 Most Important Features')
-    plt.xlabel('Importance Score')
+
+# ---- Collapsed design ------------------------------------------------------
+# Instead of fitting on every review, group the training rows into unique
+# (feature pattern, Rate) cells and fit with the cell counts as sample weights.
+# By default class balancing uses per-Rate weights that bring every Rate up to the
+# size of the largest one (the same class totals SMOTE produces) instead of synthetic
+# rows; see balancing.py for the other strategies. Patterns are numbered with
+# rating_predictor.pattern_codes, the encoding the saved ensemble's lookup table uses.
+
+def collapse(X, y):
+    """ Unique (feature row, Rate) cells of a training set with their row counts. """
+    cells = pd.DataFrame(np.asarray(X), columns=FEATURES)
+    cells['Rate'] = np.asarray(y)
+    cells = cells.groupby(FEATURES + ['Rate']).size().reset_index(name='count')
+    return cells[FEATURES].to_numpy(dtype=float), cells['Rate'].to_numpy(), cells['count'].to_numpy(dtype=float)
+
+def prepare_full(X_train, y_train, poly, strategy='smote'):
+    """ Expand, scale and balance every training row (SMOTE by default). """
+    X_train_poly = poly.transform(X_train)
+    scaler = StandardScaler()
+    X_train_scaled = scaler.fit_transform(X_train_poly)
+
+    # Apply SMOTE (or another balancing strategy) for better balance
+    X_fit, y_fit, weights, report = timed_balance(strategy, X_train_scaled, y_train)
+    return scaler, X_fit, y_fit, weights, report
+
+def prepare_collapsed(X_train, y_train, poly, strategy='weights'):
+    """ Unique training patterns, expanded and scaled, with count (and balancing) weights. """
+    X_cells, y_cells, counts = collapse(X_train, y_train)
+    X_cells_poly = poly.transform(X_cells)
+    # Scaling statistics weighted by counts equal those of the full training rows
+    scaler = StandardScaler()
+    scaler.fit(X_cells_poly, sample_weight=counts)
+    X_cells_scaled = scaler.transform(X_cells_poly)
+
+    print(f"Collapsed {len(y_train):,} training rows into {len(y_cells)} (pattern, Rate) cells")
+    X_fit, y_fit, weights, report = timed_balance(strategy, X_cells_scaled, y_cells, counts)
+    return scaler, X_fit, y_fit, weights, report
+
+# Collapsed balancing strategies that have a per-row equivalent (--check-collapsed)
+ROW_WEIGHT_STRATEGIES = ['weights', 'none']
+
+def full_row_weights(strategy, y_train):
+    """
+    Per-row weights giving the full training rows the weighting a collapsed strategy gives its
+    cells (None for unit weights). Resampling strategies have no such equivalent.
+    """
+    if strategy == 'weights':
+        return weighted_balance(np.asarray(y_train), np.ones(len(y_train)))
+    if strategy == 'none':
+        return None
+    raise ValueError(f"Balancing {strategy!r} resamples the cells and has no per-row equivalent; "
+                     f"expected one of {ROW_WEIGHT_STRATEGIES}")
+
+def prepare(mode, X_train, y_train, X_test, poly, strategy=None):
+    """
+    Scaled, balanced training matrix for a mode, plus the rows the models must predict:
+    the test rows in full mode, the 81 patterns in collapsed mode (test rows become lookups).
+    """
+    if mode == 'collapsed':
+        scaler, X_fit, y_fit, weights, report = prepare_collapsed(X_train, y_train, poly, strategy or 'weights')
+        X_predict = scaler.transform(poly.transform(all_patterns(len(FEATURES))))
+    else:
+        scaler, X_fit, y_fit, weights, report = prepare_full(X_train, y_train, poly, strategy or 'smote')
+        X_predict = scaler.transform(poly.transform(X_test))
+    return scaler, X_fit, y_fit, weights, X_predict, report
+
+def test_predictions(mode, model_outputs, X_test):
+    """ Per-model test predictions from what fit_models() predicted. """
+    if mode == 'collapsed':
+        # Inference is a lookup into the 81-entry prediction table
+        test_codes = pattern_codes(X_test)
+        return {name: np.asarray(table)[test_codes] for name, table in model_outputs.items()}
+    return model_outputs
+
+def cv_folds(mode, X_train, y_train, poly, strategy=None, cv=5):
+    """
+    K-fold splits of the original training rows, each prepared like the full training set
+    from its own training rows only, so balancing never puts synthetic or pooled rows in the
+    held-out rows. Yields the fold's fit matrices plus its held-out targets (and, in collapsed
+    mode, the pattern codes that look their predictions up).
+    """
+    if not cv or cv < 2:
+        return
+    X_train, y_train = np.asarray(X_train), np.asarray(y_train)
+    for train_idx, val_idx in KFold(n_splits=cv, shuffle=True, random_state=42).split(X_train):
+        _, X_fit, y_fit, weights, X_predict, _ = prepare(mode, X_train[train_idx], y_train[train_idx],
+                                                         X_train[val_idx], poly, strategy)
+        yield {'X': X_fit, 'y': y_fit, 'weights': weights, 'X_predict': X_predict, 'y_val': y_train[val_idx],
+               'codes': pattern_codes(X_train[val_idx]) if mode == 'collapsed' else None}
+
+def weighted_ensemble(results, predictions):
+    """ R²-weighted average of the model predictions; returns (weights, ensemble prediction). """
+    weights = [results[model]['R2'] for model in predictions.keys()]
+    weights = np.array(weights)
+    weights = weights / weights.sum()  # Normalize weights
+
+    ensemble_pred = np.zeros(len(next(iter(predictions.values()))), dtype=float)
+    for (name, pred), weight in zip(predictions.items(), weights):
+        ensemble_pred += weight * pred
+    return weights, ensemble_pred
+
+def compare_balancing(mode, X_train, y_train, X_test, y_test, poly, svr, strategies, jobs):
+    """ Fit the ensemble once per balancing strategy and tabulate cost, training size and test metrics. """
+    rows = []
+    for strategy in strategies:
+        if mode == 'full' and strategy == 'smote' and len(y_train) > 200_000:
+            print(f"  - skipping full-row SMOTE on {len(y_train):,} rows")
+            continue
+        _, X_fit, y_fit, fit_weights, X_predict, report = prepare(mode, X_train, y_train, X_test, poly, strategy)
+        start = time.perf_counter()
+        _, model_outputs, _, _ = fit_models(build_models(svr), X_fit, y_fit, X_predict,
+                                            sample_weight=fit_weights, jobs=jobs)
+        report['train_s'] = time.perf_counter() - start
+        predictions = test_predictions(mode, model_outputs, X_test)
+        results = {name: evaluate(y_test, y_pred) for name, y_pred in predictions.items()}
+        _, ensemble_pred = weighted_ensemble(results, predictions)
+        report.update({f'ensemble_{metric}': value for metric, value in evaluate(y_test, ensemble_pred).items()})
+        report.update({f'{name}_R2': metrics['R2'] for name, metrics in results.items()})
+        rows.append(report)
+        print(f"  - {strategy:<12} balance {report['balance_s']:7.2f}s  train {report['train_s']:7.2f}s  "
+              f"rows {report['fit_rows']:>9,}  RMSE {report['ensemble_RMSE']:.4f}  "
+              f"MAE {report['ensemble_MAE']:.4f}  R² {report['ensemble_R2']:.4f}")
+    return pd.DataFrame(rows)
+
+# ---- Parallel training -----------------------------------------------------
+# Models are fitted concurrently in a process pool, and every (model, CV fold)
+# pair is its own task. The scaled feature matrices (the training set and each
+# fold) are written once to .npy files that every worker memory-maps, so they
+# are never pickled per task.
+
+def _load_matrices(paths):
+    return {key: np.load(path, mmap_mode='r') for key, path in paths.items()}
+
+def _save_matrices(directory, prefix, arrays):
+    paths = {}
+    for key, array in arrays.items():
+        if array is not None:
+            paths[key] = os.path.join(directory, f'{prefix}{key}.npy')
+            np.save(paths[key], np.asarray(array, dtype=np.int64 if key == 'codes' else float))
+    return paths
+
+def _fit_kwargs(weights):
+    return {} if weights is None else {'sample_weight': weights}
+
+def _fit_task(name, model, paths):
+    """ Fit one model on the cached matrix and predict X_predict; returns timings and tracemalloc peaks. """
+    data = _load_matrices(paths)
+    started_tracing = not tracemalloc.is_tracing()
+    if started_tracing:
+        tracemalloc.start()
+    tracemalloc.reset_peak()
+    start = time.perf_counter()
+    with step(f'fit:{name}', rows=len(data['y'])) as fit_step:
+        model.fit(data['X'], data['y'], **_fit_kwargs(data.get('weights')))
+    fit_s = time.perf_counter() - start
+    fit_peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.reset_peak()
+    start = time.perf_counter()
+    with step(f'predict:{name}', rows=len(data['X_predict'])) as predict_step:
+        y_pred = model.predict(data['X_predict'])
+    predict_s = time.perf_counter() - start
+    predict_peak = tracemalloc.get_traced_memory()[1]
+    if started_tracing:
+        tracemalloc.stop()
+    return name, model, y_pred, {
+        'fit_s': fit_s, 'predict_s': predict_s,
+        'fit_peak_mb': fit_peak / 2**20, 'predict_peak_mb': predict_peak / 2**20,
+        'steps': [fit_step, predict_step]
+    }
+
+def _cv_task(name, model, paths):
+    """ R² of one model on the held-out rows of one cross-validation fold. """
+    data = _load_matrices(paths)
+    model.fit(data['X'], data['y'], **_fit_kwargs(data.get('weights')))
+    y_pred = model.predict(data['X_predict'])
+    if 'codes' in data:
+        # Collapsed mode predicts the 81 patterns; held-out rows look theirs up
+        y_pred = y_pred[data['codes']]
+    return name, r2_score(data['y_val'], y_pred)
+
+def fit_models(models, X_fit, y_fit, X_predict, sample_weight=None, folds=(), jobs=None):
+    """
+    Fit every model and score it on each CV fold (see cv_folds()), all in one process pool.
+    Returns (fitted models, predictions on X_predict, per-model profile, per-model CV R² scores).
+    """
+    with tempfile.TemporaryDirectory(prefix='regression_features_') as tmp:
+        paths = _save_matrices(tmp, '', {'X': X_fit, 'y': y_fit, 'weights': sample_weight, 'X_predict': X_predict})
+        fold_paths = [_save_matrices(tmp, f'fold{i}_', fold) for i, fold in enumerate(folds)]
+
+        if jobs == 1:
+            fit_results = [_fit_task(name, model, paths) for name, model in models.items()]
+            cv_results = [_cv_task(name, clone(model), fold)
+                          for name, model in models.items() for fold in fold_paths]
+        else:
+            with ProcessPoolExecutor(max_workers=jobs) as pool:
+                fit_futures = [pool.submit(_fit_task, name, model, paths) for name, model in models.items()]
+                cv_futures = [pool.submit(_cv_task, name, clone(model), fold)
+                              for name, model in models.items() for fold in fold_paths]
+                fit_results = [f.result() for f in fit_futures]
+                cv_results = [f.result() for f in cv_futures]
+
+    fitted, predictions, profile = {}, {}, {}
+    for name, model, y_pred, stats in fit_results:
+        # Step records of the worker processes go into this process' run report
+        add_steps(stats.pop('steps'))
+        fitted[name], predictions[name], profile[name] = model, y_pred, stats
+    cv_scores = {name: [] for name in models}
+    for name, score in cv_results:
+        cv_scores[name].append(score)
+    return fitted, predictions, profile, cv_scores
+
+def _benchmark_task(method, X, y, X_test):
+    """
+    Fit and predict one SVR in a fresh worker process. The fit's memory is the growth of the
+    worker's peak RSS, so it includes libsvm / liblinear allocations that tracemalloc misses.
+    """
+    baseline = _peak_rss_mb()
+    model = make_svr(method)
+    with warnings.catch_warnings(record=True) as caught:
+        warnings.simplefilter('always', ConvergenceWarning)
+        start = time.perf_counter()
+        model.fit(X, y)
+        fit_s = time.perf_counter() - start
+    peak = _peak_rss_mb() - baseline
+    converged = not any(issubclass(w.category, ConvergenceWarning) for w in caught)
+    start = time.perf_counter()
+    y_pred = model.predict(X_test)
+    return fit_s, time.perf_counter() - start, peak, converged, y_pred
+
+def benchmark_svr(X_train, y_train, X_test, y_test, sizes, methods):
+    """
+    Fit the exact SVR and each scalable variant on training sets of increasing size.
+    Rows are drawn from the (balanced) training set, with replacement once a size exceeds it.
+    Every fit runs in its own worker process; peak memory is how far the fit raised that
+    process' peak RSS, and `converged` is False when the solver hit its iteration limit.
+    """
+    y_train = np.asarray(y_train)
+    rng = np.random.default_rng(42)
+    rows = []
+    for size in sizes:
+        idx = rng.choice(len(y_train), size=size, replace=size > len(y_train))
+        for method in ['exact'] + [m for m in methods if m != 'exact']:
+            with ProcessPoolExecutor(max_workers=1) as pool:
+                fit_time, predict_time, peak, converged, y_pred = pool.submit(
+                    _benchmark_task, method, X_train[idx], y_train[idx], X_test).result()
+            rows.append({'rows': size, 'method': method, 'fit_s': fit_time, 'predict_s': predict_time,
+                         'peak_mb': peak, 'converged': converged, 'R2': r2_score(y_test, y_pred)})
+            print(f"  {size:>9,} rows  {method:<10} fit {fit_time:8.2f}s  predict {predict_time:6.2f}s  "
+                  f"peak {peak:8.1f} MB  R² {rows[-1]['R2']:.4f}" + ("" if converged else "  (not converged)"))
+
+    bench = pd.DataFrame(rows)
+    exact_r2 = bench[bench['method'] == 'exact'].set_index('rows')['R2']
+    bench['R2_diff_vs_exact'] = bench['R2'] - bench['rows'].map(exact_r2)
+    return bench
+
+def plot_raw_diagnostics(results_df, y_test, ensemble_pred):
+    """ Original per-point scatter and full KDE diagnostics (--plots raw). """
+    # Plot actual vs predicted
+    plt.figure(figsize=(10, 6))
+    plt.scatter(y_test, ensemble_pred, alpha=0.5)
+    plt.plot([y_test.min(), y_test.max()], [y_test.min(), y_test.max()], 'r--', lw=2)
+    plt.xlabel("Actual Rating")
+    plt.ylabel("Predicted Rating")
+    plt.title("Aspect Sentiment vs Rating: Prediction Analysis")
     plt.grid(True)
     plt.tight_layout()
-    plt.savefig('outputs/feature_importance.png', dpi=300, bbox_inches='tight')
+    plt.savefig('outputs/prediction_analysis.png', dpi=300, bbox_inches='tight')
     plt.close()
+
+    # Plot error distribution
+    plt.figure(figsize=(10, 6))
+    sns.histplot(results_df['Error'], bins=50, kde=True)
+    plt.title('Prediction Error Distribution')
+    plt.xlabel('Error (Predicted - Actual Rating)')
+    plt.ylabel('Count')
+    plt.grid(True)
+    plt.tight_layout()
+    plt.savefig('outputs/error_distribution.png', dpi=300, bbox_inches='tight')
+    plt.close()
+
+def main():
+    parser = argparse.ArgumentParser(description="Predict star rating from aspect sentiments")
+    parser.add_argument('--mode', choices=['full', 'collapsed'], default='full',
+                        help="full: fit on every (SMOTE-balanced) review; "
+                             "collapsed: fit on the unique feature patterns with count weights")
+    parser.add_argument('--svr', choices=SVR_METHODS, default='exact',
+                        help="SVR ensemble member: exact RBF SVR, Nystroem or random Fourier features "
+                             "with a linear solver, or exact SVR on a bounded subsample")
+    parser.add_argument('--benchmark-svr', action='store_true',
+                        help="time exact vs scalable SVR at increasing training sizes (outputs/svr_benchmark.csv)")
+    parser.add_argument('--benchmark-sizes', type=int, nargs='+', default=[1000, 5000, 20000],
+                        help="training sizes for --benchmark-svr")
+    parser.add_argument('--jobs', type=int, default=None,
+                        help="worker processes for model fitting and CV (default: all CPUs, 1 = no pool)")
+    parser.add_argument('--cv', type=int, default=5,
+                        help="k for k-fold cross-validation of each model (0 to skip)")
+    parser.add_argument('--balance', choices=BALANCE_STRATEGIES, default=None,
+                        help="class-balancing stage (default: smote in full mode, weights in collapsed mode)")
+    parser.add_argument('--compare-balancing', action='store_true',
+                        help="fit the ensemble with every balancing strategy and report time, size and metrics")
+    parser.add_argument('--plots', choices=['aggregated', 'raw'], default='aggregated',
+                        help="aggregated: binned heatmap and gridded KDE (constant cost); raw: scatter every test point")
+    parser.add_argument('--check-collapsed', action='store_true',
+                        help="also fit the full rows with the collapsed weights and report the metric differences")
+    args = parser.parse_args()
+    if args.check_collapsed and args.mode == 'collapsed' and (args.balance or 'weights') not in ROW_WEIGHT_STRATEGIES:
+        parser.error(f"--check-collapsed needs --balance {' or '.join(ROW_WEIGHT_STRATEGIES)} "
+                     f"(the full-row reference has to use the same weights)")
+
+    # Set style for better visualizations
+    plt.style.use('seaborn-v0_8')
+    sns.set_theme(style="whitegrid")
+
+    # Load and prepare data
+    with step('load') as record:
+        df = pd.read_csv("processed_data/aspect_sentiment_vader.csv")
+        df = df.dropna(subset=['quality', 'cost', 'delivery', 'flexibility', 'Rate'])
+        record['rows'] = len(df)
+
+    # Create polynomial features and interactions
+    poly = PolynomialFeatures(degree=2, include_bias=False)
+    features = FEATURES
+    X = df[features].to_numpy(dtype=float)
+    poly.fit(X)
+    feature_names = poly.get_feature_names_out(features)
+
+    # Prepare target
+    y = df['Rate']
+
+    # Split data
+    X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42)
+
+    # Build the scaled, balanced training matrix once; every model reuses it
+    # (in collapsed mode the models only ever need to predict the 81 patterns)
+    start = time.perf_counter()
+    with step('balance', rows=len(y_train)):
+        scaler, X_fit, y_fit, fit_weights, X_predict, balance_report = prepare(
+            args.mode, X_train, y_train, X_test, poly, args.balance)
+    print(f"Balancing ({balance_report['strategy']}) took {balance_report['balance_s']:.2f}s, "
+          f"{balance_report['fit_rows']:,} training rows")
+
+    # Train models (in parallel, with k-fold cross-validation over the original training rows)
+    # (each fold is balanced from its own training rows; see cv_folds())
+    folds = cv_folds(args.mode, X_train, y_train, poly, args.balance, args.cv)
+    models, model_outputs, profile, cv_scores = fit_models(
+        build_models(args.svr), X_fit, y_fit, X_predict, sample_weight=fit_weights, folds=folds, jobs=args.jobs)
+    predictions = test_predictions(args.mode, model_outputs, X_test)
+    print(f"Training ({args.mode}) took {time.perf_counter() - start:.2f}s")
+    for name, stats in profile.items():
+        cv_text = f", CV R² {np.mean(cv_scores[name]):.4f} ± {np.std(cv_scores[name]):.4f}" if cv_scores[name] else ""
+        print(f"  - {name}: fit {stats['fit_s']:.2f}s, predict {stats['predict_s']:.2f}s, "
+              f"peak {stats['fit_peak_mb']:.1f} MB{cv_text}")
+
+    # Evaluate models
+    print("\nModel Performance:")
+    print("-" * 50)
+
+    results = {}
+    for name, y_pred in predictions.items():
+        results[name] = evaluate(y_test, y_pred)
+
+        print(f"\n{name}:")
+        print(f"RMSE: {results[name]['RMSE']:.4f}")
+        print(f"MAE: {results[name]['MAE']:.4f}")
+        print(f"R² Score: {results[name]['R2']:.4f}")
+
+    if args.check_collapsed and args.mode == 'collapsed':
+        # Same weighting on every row: the collapsed fit should reproduce these metrics
+        X_train_scaled = scaler.transform(poly.transform(X_train))
+        row_weights = full_row_weights(balance_report['strategy'], y_train)
+        print(f"\nCollapsed vs full-row fit (same weights, {balance_report['strategy']}), metric differences:")
+        for name, model in build_models(args.svr).items():
+            model.fit(X_train_scaled, y_train, **_fit_kwargs(row_weights))
+            full_metrics = evaluate(y_test, model.predict(scaler.transform(poly.transform(X_test))))
+            diffs = ", ".join(f"{m}: {results[name][m] - full_metrics[m]:+.2e}" for m in full_metrics)
+            print(f"  - {name}: {diffs}")
+
+    if args.benchmark_svr:
+        print("\nSVR scaling benchmark:")
+        bench_scaler, X_bench, y_bench, _, _ = prepare_full(X_train, y_train, poly)
+        bench = benchmark_svr(X_bench, y_bench, bench_scaler.transform(poly.transform(X_test)), y_test,
+                              args.benchmark_sizes, SVR_METHODS)
+        os.makedirs('outputs', exist_ok=True)
+        bench.to_csv('outputs/svr_benchmark.csv', index=False)
+        print(bench.round(4).to_string(index=False))
+
+    if args.compare_balancing:
+        print(f"\nBalancing strategies ({args.mode} mode):")
+        comparison = compare_balancing(args.mode, X_train, y_train, X_test, y_test, poly, args.svr,
+                                       BALANCE_STRATEGIES, args.jobs)
+        os.makedirs('outputs', exist_ok=True)
+        comparison.to_csv('outputs/balancing_comparison.csv', index=False)
+        print("Saved to 'outputs/balancing_comparison.csv'")
+
+    # Create ensemble
+    weights, ensemble_pred = weighted_ensemble(results, predictions)
+
+    ensemble_metrics = evaluate(y_test, ensemble_pred)
+    ensemble_rmse = ensemble_metrics['RMSE']
+    ensemble_mae = ensemble_metrics['MAE']
+    ensemble_r2 = ensemble_metrics['R2']
+
+    print("\nWeighted Ensemble:")
+    print(f"RMSE: {ensemble_rmse:.4f}")
+    print(f"MAE: {ensemble_mae:.4f}")
+    print(f"R² Score: {ensemble_r2:.4f}")
+
+    # Create output directory if it doesn't exist
+    os.makedirs('outputs', exist_ok=True)
+
+    # Persist poly, scaler, fitted models and ensemble weights as one artifact (see rating_predictor.py)
+    save_ensemble(poly, scaler, models, weights, FEATURES, path=ARTIFACT_PATH,
+                  mode=args.mode, svr=args.svr, metrics=ensemble_metrics)
+    print(f"\nEnsemble saved to '{ARTIFACT_PATH}'")
+
+    # Save results
+    results_df = pd.DataFrame({
+        'Actual': y_test,
+        'Predicted': ensemble_pred,
+        'Error': y_test - ensemble_pred
+    })
+    results_df.to_csv('outputs/regression_results.csv', index=False)
+
+    if args.plots == 'aggregated':
+        # Heatmap and gridded KDE from fixed-size counts; render time doesn't grow with the test set
+        with step('diagnostic_plots', rows=len(y_test)):
+            timings = render_diagnostics(y_test, ensemble_pred)
+        print(f"Diagnostic plots rendered in {timings['aggregate_s'] + timings['render_s']:.2f}s")
+    else:
+        with step('diagnostic_plots', rows=len(y_test)):
+            plot_raw_diagnostics(results_df, y_test, ensemble_pred)
+
+    # Save summary
+    with open('outputs/model_summary.txt', 'w') as f:
+        f.write("Aspect Sentiment vs Rating Analysis Summary\n")
+        f.write("=" * 50 + "\n\n")
+        f.write("Individual Model Performance:\n")
+        for name, metrics in results.items():
+            f.write(f"\n{name}:\n")
+            for metric, value in metrics.items():
+                f.write(f"{metric}: {value:.4f}\n")
+
+        f.write("\nEnsemble Model Performance:\n")
+        f.write(f"RMSE: {ensemble_rmse:.4f}\n")
+        f.write(f"MAE: {ensemble_mae:.4f}\n")
+        f.write(f"R² Score: {ensemble_r2:.4f}\n")
+
+        f.write(f"\nTraining Profile ({args.mode} mode, {balance_report['strategy']} balancing, "
+                f"{len(y_fit):,} training rows):\n")
+        for name, stats in profile.items():
+            f.write(f"\n{name}:\n")
+            f.write(f"Fit time: {stats['fit_s']:.2f}s\n")
+            f.write(f"Predict time: {stats['predict_s']:.2f}s\n")
+            f.write(f"Peak memory (fit): {stats['fit_peak_mb']:.1f} MB\n")
+            f.write(f"Peak memory (predict): {stats['predict_peak_mb']:.1f} MB\n")
+            if cv_scores[name]:
+                f.write(f"CV R² ({len(cv_scores[name])}-fold): {np.mean(cv_scores[name]):.4f} ± {np.std(cv_scores[name]):.4f}\n")
+
+    # Save feature importance analysis
+    if hasattr(models['Random Forest'], 'feature_importances_'):
+        importance = models['Random Forest'].feature_importances_
+        importance_df = pd.DataFrame({
+            'Feature': feature_names,
+            'Importance': importance
+        }).sort_values('Importance', ascending=False)
+
+        plt.figure(figsize=(12, 6))
+        sns.barplot(data=importance_df.head(10), x='Importance', y='Feature')
+        plt.title('Top 10 Most Important Features')
+        plt.xlabel('Importance Score')
+        plt.grid(True)
+        plt.tight_layout()
+        plt.savefig('outputs/feature_importance.png', dpi=300, bbox_inches='tight')
+        plt.close()
+
+if __name__ == '__main__':
+    main()
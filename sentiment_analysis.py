@@ -2,9 +2,12 @@ import pandas as pd
 import numpy as np
 from textblob import TextBlob #Library for processing textual data: sentiment analysis, text processing
 import re # re: Python's built-in regular expression library- regular expressions, pattern matching
+import argparse
 from sklearn.model_selection import train_test_split #splitting data into training and testing sets
 from sklearn.ensemble import RandomForestClassifier #ensemble learning method
 from sklearn.metrics import classification_report #evaluation metrics for classification
+from instrumentation import step # per-step timing/memory report (outputs/run_reports/)
+from near_duplicates import THRESHOLD, apply_representatives, load_clusters # near-duplicate review clusters
 
 def preprocess_text(text):
     """ 1. Convert to lowercase: standardize text 2. Remove special characters: clean noise 3. Handle whitespace: standardize spacing
@@ -57,102 +60,136 @@ def create_sentiment_features(text):
         'capital_words': sum(1 for word in str(text).split() if word.isupper()),  # Emphasis through caps
     }
 
-# MAIN PROCESSING
-# Load the data
-print("Loading data...")
-df = pd.read_csv("flipkart_reviews_full.csv")
-
-# Preprocess text
-print("Preprocessing text...")
-df['processed_text'] = df['text'].apply(preprocess_text)
-
-# Get initial sentiment using TextBlob
-print("Calculating TextBlob sentiment...")
-df['textblob_sentiment'] = df['processed_text'].apply(get_textblob_sentiment)
-
-# Create features for ML model
-print("Creating features...")
-features = df['processed_text'].apply(create_sentiment_features).apply(pd.Series)
-# Converts the dictionary output from the previous .apply() into a DataFrame.
-# Each dictionary becomes a row, and the keys become column names.
-
-# MACHINE LEARNING
-# Create target variable based on rating
-# Map ratings to sentiment categories
-df['rating_sentiment'] = df['Rate'].apply(lambda x: 0 if x <= 2 else (1 if x == 3 else 2))
-
-# Prepare data for ML
-# Combine numerical features with categorical features (one-hot encoded)
-X = pd.concat([
-    features,
-    pd.get_dummies(df['review_type'])  # Convert categorical to numerical
-], axis=1)
-
-y = df['rating_sentiment']
-
-# Split data into training and testing sets
-# Key concepts: train-test split, cross-validation
-X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42)
-
-# Train Random Forest model
-print("Training Random Forest model...")
-# Random Forest: ensemble learning method using multiple decision trees
-# Key concepts: ensemble learning, decision trees, random forests
-rf_model = RandomForestClassifier(n_estimators=100, random_state=42)
-rf_model.fit(X_train, y_train)
-
-# Make predictions
-print("Making predictions...")
-y_pred = rf_model.predict(X_test)
-
-# MODEL EVALUATION
-# Print model performance metrics
-print("\nModel Performance:")
-# Classification report shows precision, recall, f1-score
-# Key concepts: precision, recall, F1 score, classification metrics
-print(classification_report(y_test, y_pred, target_names=['Negative', 'Neutral', 'Positive']))
-
-
-# FINAL SENTIMENT GENERATION
-# Generate final sentiment labels
-print("Generating final sentiment labels...")
-df['sentiment_code'] = rf_model.predict(X)
-
-# Combine rating and textblob sentiment for final labels
-# This creates a hybrid approach using both methods
-df['labels'] = df.apply(lambda row: 
-    2 if (row['Rate'] >= 4 or row['textblob_sentiment'] == 2) else
-    (0 if row['Rate'] <= 2 or row['textblob_sentiment'] == 0 else 1), 
-    axis=1
-)
-
-# SAVE AND SUMMARIZE RESULTS
-# Save the updated dataset
-print("Saving updated dataset...")
-output_columns = [
-    'product_name', 'product_price', 'Rate', 'Review', 'text',
-    'review_length', 'review_type', 'rating_sentiment',
-    'sentiment_code', 'labels'
-]
-df[output_columns].to_csv("flipkart_reviews_with_sentiment.csv", index=False)
-
-# Print sentiment distribution statistics
-print("\nSentiment Distribution:")
-sentiment_counts = df['labels'].value_counts()
-for sentiment, count in sentiment_counts.items():
-    sentiment_name = {0: 'Negative', 1: 'Neutral', 2: 'Positive'}[sentiment]
-    percentage = (count / len(df)) * 100
-    print(f"  - {sentiment_name}: {count:,} reviews ({percentage:.1f}%)")
-
-# Print feature importance analysis
-print("\nTop Features for Sentiment Prediction:")
-feature_importance = pd.DataFrame({
-    'feature': X.columns,
-    'importance': rf_model.feature_importances_
-}).sort_values('importance', ascending=False)
-
-print("\nTop 10 most important features:")
-for _, row in feature_importance.head(10).iterrows():
-    print(f"  - {row['feature']}: {row['importance']:.3f}")
-
-print("\nDone! Updated dataset saved as 'flipkart_reviews_with_sentiment.csv'") 
\ No newline at end of file
+def rating_sentiment(rate):
+    """ Rating as a sentiment code: 0 = negative (<= 2 stars), 1 = neutral (3), 2 = positive (>= 4). """
+    return 0 if rate <= 2 else (1 if rate == 3 else 2)
+
+def hybrid_label(rate, textblob_sentiment):
+    """
+    Hybrid label from the rating and the TextBlob sentiment code:
+    positive if either is positive, else negative if either is negative, else neutral.
+    """
+    return 2 if (rate >= 4 or textblob_sentiment == 2) else (0 if rate <= 2 or textblob_sentiment == 0 else 1)
+
+if __name__ == '__main__':
+    # --near-duplicates: run TextBlob once per near-duplicate cluster (see near_duplicates.py) and
+    # give every other review its representative's scores
+    parser = argparse.ArgumentParser(description="TextBlob + random forest sentiment labels for the reviews")
+    parser.add_argument('--near-duplicates', nargs='?', type=float, const=THRESHOLD, default=None, metavar='THRESHOLD',
+                        help="score one representative per near-duplicate cluster (processed_data/near_duplicates.csv, "
+                             f"clustered at THRESHOLD, default {THRESHOLD})")
+    args = parser.parse_args()
+
+    # MAIN PROCESSING
+    # Load the data
+    print("Loading data...")
+    with step('load') as record:
+        df = pd.read_csv("flipkart_reviews_full.csv")
+        record['rows'] = len(df)
+    use_clusters = args.near_duplicates is not None
+    clusters = load_clusters("flipkart_reviews_full.csv", threshold=args.near_duplicates) if use_clusters else None
+    if use_clusters:
+        if clusters is None:
+            print("No near-duplicate clusters for this data and threshold (run near_duplicates.py first); "
+                  "scoring every review")
+        else:
+            print(f"Scoring {clusters['cluster_id'].nunique():,} cluster representatives instead of {len(df):,} reviews")
+
+    # Preprocess text
+    print("Preprocessing text...")
+    with step('preprocess', rows=len(df)):
+        df['processed_text'] = df['text'].apply(preprocess_text)
+
+    # Get initial sentiment using TextBlob
+    print("Calculating TextBlob sentiment...")
+    with step('textblob', rows=len(df)):
+        df['textblob_sentiment'] = apply_representatives(df['processed_text'], get_textblob_sentiment, clusters)
+
+    # Create features for ML model
+    print("Creating features...")
+    with step('features', rows=len(df)):
+        features = apply_representatives(df['processed_text'], create_sentiment_features, clusters).apply(pd.Series)
+    # Converts the dictionary output from the previous .apply() into a DataFrame.
+    # Each dictionary becomes a row, and the keys become column names.
+
+    # MACHINE LEARNING
+    # Create target variable based on rating
+    # Map ratings to sentiment categories
+    df['rating_sentiment'] = df['Rate'].apply(rating_sentiment)
+
+    # Prepare data for ML
+    # Combine numerical features with categorical features (one-hot encoded)
+    X = pd.concat([
+        features,
+        pd.get_dummies(df['review_type'])  # Convert categorical to numerical
+    ], axis=1)
+
+    y = df['rating_sentiment']
+
+    # Split data into training and testing sets
+    # Key concepts: train-test split, cross-validation
+    X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42)
+
+    # Train Random Forest model
+    print("Training Random Forest model...")
+    # Random Forest: ensemble learning method using multiple decision trees
+    # Key concepts: ensemble learning, decision trees, random forests
+    rf_model = RandomForestClassifier(n_estimators=100, random_state=42)
+    with step('rf_fit', rows=len(X_train)):
+        rf_model.fit(X_train, y_train)
+
+    # Make predictions
+    print("Making predictions...")
+    with step('predict', rows=len(X_test)):
+        y_pred = rf_model.predict(X_test)
+
+    # MODEL EVALUATION
+    # Print model performance metrics
+    print("\nModel Performance:")
+    # Classification report shows precision, recall, f1-score
+    # Key concepts: precision, recall, F1 score, classification metrics
+    print(classification_report(y_test, y_pred, target_names=['Negative', 'Neutral', 'Positive']))
+
+
+    # FINAL SENTIMENT GENERATION
+    # Generate final sentiment labels
+    print("Generating final sentiment labels...")
+    with step('label', rows=len(X)):
+        df['sentiment_code'] = rf_model.predict(X)
+
+    # Combine rating and textblob sentiment for final labels
+    # This creates a hybrid approach using both methods
+    with step('hybrid_labels', rows=len(df)):
+        df['labels'] = df.apply(lambda row: hybrid_label(row['Rate'], row['textblob_sentiment']), axis=1)
+
+    # SAVE AND SUMMARIZE RESULTS
+    # Save the updated dataset
+    print("Saving updated dataset...")
+    output_columns = [
+        'product_name', 'product_price', 'Rate', 'Review', 'text',
+        'review_length', 'review_type', 'rating_sentiment',
+        'sentiment_code', 'labels'
+    ]
+    with step('save', rows=len(df)):
+        df[output_columns].to_csv("flipkart_reviews_with_sentiment.csv", index=False)
+
+    # Print sentiment distribution statistics
+    print("\nSentiment Distribution:")
+    sentiment_counts = df['labels'].value_counts()
+    for sentiment, count in sentiment_counts.items():
+        sentiment_name = {0: 'Negative', 1: 'Neutral', 2: 'Positive'}[sentiment]
+        percentage = (count / len(df)) * 100
+        print(f"  - {sentiment_name}: {count:,} reviews ({percentage:.1f}%)")
+
+    # Print feature importance analysis
+    print("\nTop Features for Sentiment Prediction:")
+    feature_importance = pd.DataFrame({
+        'feature': X.columns,
+        'importance': rf_model.feature_importances_
+    }).sort_values('importance', ascending=False)
+
+    print("\nTop 10 most important features:")
+    for _, row in feature_importance.head(10).iterrows():
+        print(f"  - {row['feature']}: {row['importance']:.3f}")
+
+    print("\nDone! Updated dataset saved as 'flipkart_reviews_with_sentiment.csv'") 
\ No newline at end of file
@@ -0,0 +1,97 @@
+import numpy as np
+import pandas as pd
+
+# Stratified sampling for preview runs (convert_parquet_to_csv.py --preview, visuals/render_all.py
+# --preview). Reviews are grouped into strata by Rate x review_type and every stratum keeps the
+# same fraction of its rows (at least one), drawn at random; each sampled review stands for
+# population / sampled reviews of its stratum. Confidence intervals are analytic, from the usual
+# stratified-sampling variance with finite population correction:
+#   totals Y            Var = sum_h N_h^2 (1 - n_h / N_h) s_h^2 / n_h   (s_h^2: sample variance of y)
+#   ratios R = Y / X    the same with the linearized values z = y - R x, divided by X^2
+# A rate within a group (e.g. the mismatch rate of 5-star reviews) is a ratio of two totals, and
+# so are shares and means. Numbers that only depend on the strata (the review type and rating
+# distributions) come out exact, with a zero-width interval.
+
+STRATA = ['Rate', 'review_type']
+# Two-sided 95% normal quantile
+Z = 1.959964
+VALUES = ['count', 'sum', 'sumsq']
+
+
+def stratified_sample(df, fraction, seed=0, strata=STRATA):
+    """
+    Rows of df sampled at fraction within every stratum (at least one row per stratum), in their
+    original order. Returns (sample, strata table with population, sampled and weight per stratum).
+    """
+    if not 0 < fraction <= 1:
+        raise ValueError(f"The sample fraction must be in (0, 1], got {fraction}")
+    grouped = df.groupby(strata, dropna=False, sort=True)
+    ids = grouped.ngroup().to_numpy()
+    table = grouped.size().rename('population').reset_index()
+    population = table['population'].to_numpy()
+    sampled = np.minimum(population, np.maximum(1, np.rint(fraction * population))).astype(np.int64)
+    # Random order within each stratum; keep the first sampled rows of every stratum
+    order = np.lexsort((np.random.default_rng(seed).random(len(df)), ids))
+    rank = np.arange(len(df)) - np.repeat(np.cumsum(population) - population, population)
+    keep = np.sort(order[rank < sampled[ids[order]]])
+    table['sampled'] = sampled
+    table['weight'] = population / sampled
+    return df.iloc[keep].reset_index(drop=True), table
+
+
+def row_parts(sample, values, by=(), domain=None, strata=STRATA):
+    """
+    Sample count, sum and sum of squares of values per stratum and group of by, over the rows of
+    the sample in domain (a boolean mask; all rows if None).
+    """
+    keys = list(dict.fromkeys(list(strata) + list(by)))
+    values = np.asarray(values, dtype=float)
+    frame = sample[keys].assign(count=1.0, sum=values, sumsq=values ** 2)
+    if domain is not None:
+        frame = frame[np.asarray(domain, dtype=bool)]
+    return frame.groupby(keys, dropna=False, sort=False)[VALUES].sum().reset_index()
+
+
+def _by_stratum(parts, table, by, strata):
+    by = list(by)
+    if not by:
+        parts = parts.assign(_all=True)
+        by = ['_all']
+    keys = list(dict.fromkeys(list(strata) + by))
+    parts = parts.dropna(subset=by).groupby(keys, dropna=False, sort=False)[VALUES].sum().reset_index()
+    return parts.merge(table, on=list(strata), how='left'), by
+
+
+def _variance(sums, sumsqs, cells):
+    """ N^2 (1 - n / N) s^2 / n of each stratum's values (none for strata sampled once). """
+    n, population = cells['sampled'], cells['population']
+    s2 = ((sumsqs - sums ** 2 / n) / (n - 1)).where(n > 1, 0).clip(lower=0)
+    return population ** 2 * (1 - n / population) * s2 / n
+
+
+def total_estimates(parts, table, by=(), z=Z, strata=STRATA):
+    """ Estimated total of the values per group of by, with the half-width of its confidence interval. """
+    cells, by = _by_stratum(parts, table, by, strata)
+    cells['estimate'] = cells['weight'] * cells['sum']
+    cells['variance'] = _variance(cells['sum'], cells['sumsq'], cells)
+    grouped = cells.groupby(by, sort=True)[['estimate', 'variance']].sum()
+    return pd.DataFrame({'estimate': grouped['estimate'], 'half_width': z * np.sqrt(grouped['variance'])})
+
+
+def ratio_estimates(parts, table, by=(), z=Z, strata=STRATA):
+    """
+    Estimated sum / count of the values per group of by (a rate or share for 0/1 values, a mean
+    otherwise), with the half-width of its confidence interval and the estimated group size.
+    """
+    cells, by = _by_stratum(parts, table, by, strata)
+    cells['weighted_sum'] = cells['weight'] * cells['sum']
+    cells['weighted_count'] = cells['weight'] * cells['count']
+    totals = cells.groupby(by, sort=True)[['weighted_sum', 'weighted_count']].sum()
+    ratio = totals['weighted_sum'] / totals['weighted_count']
+    r = cells[by].merge(ratio.rename('ratio'), left_on=by, right_index=True, how='left')['ratio'].to_numpy()
+    z_sums = cells['sum'] - r * cells['count']
+    z_sumsqs = cells['sumsq'] - 2 * r * cells['sum'] + r ** 2 * cells['count']
+    cells['variance'] = _variance(z_sums, z_sumsqs, cells)
+    variance = cells.groupby(by, sort=True)['variance'].sum() / totals['weighted_count'] ** 2
+    return pd.DataFrame({'estimate': ratio, 'half_width': z * np.sqrt(variance),
+                         'population': totals['weighted_count']})
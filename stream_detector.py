@@ -0,0 +1,417 @@
+import os
+import json
+import time
+import signal
+import asyncio
+import argparse
+import collections
+import multiprocessing
+import concurrent.futures
+import numpy as np
+import pandas as pd
+from sentiment_analysis import get_textblob_sentiment, hybrid_label, preprocess_text, rating_sentiment
+from mismatch_store import STORE_PATH, MismatchStore
+
+# Streaming rating-text mismatch detector.
+# A long-running asyncio service that takes reviews as they arrive and flags the ones whose text
+# sentiment disagrees with their star rating, with the same rules as the batch run in
+# sentiment_analysis.py: preprocess_text, the TextBlob sentiment code and the hybrid label.
+#
+#   source (socket or file) -> queue (QUEUE_SIZE) -> micro-batches -> scorers -> mismatch events
+#
+# Reviews are JSON objects with at least Rate and text (one per line); id, product_name and
+# review_type are passed through to the events, reviews without an id are numbered as they
+# arrive. The socket source accepts any number of local connections; the file source reads a
+# JSON-lines file or a review CSV (e.g. flipkart_reviews_full.csv) as a stand-in for the live
+# feed, and --send replays such a file into a running service.
+# A micro-batch closes when it holds BATCH_SIZE reviews or MAX_WAIT seconds after its first
+# review arrived. Batches are scored off the event loop (a thread, or a fork-based process pool
+# with --jobs), at most one batch per scorer at a time.
+#
+# Backpressure and memory: the review queue and the batch queue are bounded, so when scoring
+# falls behind the sources stop reading; socket clients then block in the kernel's flow control
+# (--send waits in drain()) and the file source simply reads slower. Events are written as they
+# are produced (appended to OUTPUT_PATH, which survives restarts) and latencies are kept for the
+# last LATENCY_WINDOW reviews only, so memory stays bounded however long the service runs.
+#
+# A mismatch is a review whose rating sentiment (Rate <= 2 negative, 3 neutral, >= 4 positive)
+# differs from its TextBlob sentiment; the event also carries the hybrid label. Counters
+# (received, rejected, scored, mismatches, batches, queue high-water mark, throughput and
+# receive-to-emit latency percentiles) are printed every STATS_INTERVAL seconds and written to
+# STATS_PATH. SIGINT / SIGTERM stop the sources and drain what was already received.
+# With --store every scored batch (matches too) is also folded into the per product / category /
+# Rate counters of mismatch_store.py, snapshotted at every counter line and on exit.
+
+HOST = '127.0.0.1'
+PORT = 8765
+OUTPUT_PATH = 'outputs/mismatch_events.jsonl'
+STATS_PATH = 'outputs/stream_stats.json'
+BATCH_SIZE = 256
+MAX_WAIT = 0.5
+QUEUE_SIZE = 10_000
+LATENCY_WINDOW = 10_000
+STATS_INTERVAL = 10.0
+# Longest accepted line of a socket client (bytes)
+MAX_LINE = 2 ** 16
+CSV_CHUNK_SIZE = 10_000
+NAMES = ['negative', 'neutral', 'positive']
+PASS_THROUGH = ['id', 'product_name', 'review_type']
+
+
+def score_batch(reviews):
+    """
+    Text sentiment codes of a batch of reviews (dicts with Rate and text) and the
+    (position, mismatch event) of its mismatches.
+    """
+    codes, events = [], []
+    for position, review in enumerate(reviews):
+        rate = review['Rate']
+        text_sentiment = get_textblob_sentiment(preprocess_text(review['text']))
+        codes.append(text_sentiment)
+        rating = rating_sentiment(rate)
+        if rating == text_sentiment:
+            continue
+        event = {key: review[key] for key in PASS_THROUGH if review.get(key) is not None}
+        event.update({
+            'Rate': rate,
+            'rating_sentiment': NAMES[rating],
+            'text_sentiment': NAMES[text_sentiment],
+            'hybrid_label': NAMES[hybrid_label(rate, text_sentiment)],
+            'pattern': f"{NAMES[rating]} -> {NAMES[text_sentiment]}",
+        })
+        events.append((position, event))
+    return codes, events
+
+
+def parse_review(review):
+    """ The review with a numeric Rate and a text, or None if it has neither. """
+    if not isinstance(review, dict) or review.get('text') is None:
+        return None
+    try:
+        rate = float(review.get('Rate'))
+    except (TypeError, ValueError):
+        return None
+    if not np.isfinite(rate):
+        return None
+    review['Rate'] = int(rate) if rate.is_integer() else rate
+    return review
+
+
+class Counters:
+    """ Throughput and latency counters of a running detector (latencies of the recent reviews only). """
+
+    def __init__(self, window=LATENCY_WINDOW):
+        self.started = time.perf_counter()
+        # Tags this run's events in the (appended) event file; generated ids restart at 1 every run
+        self.run = time.strftime('%Y-%m-%dT%H:%M:%S')
+        self.received = 0
+        self.rejected = 0
+        self.scored = 0
+        self.mismatches = 0
+        self.batches = 0
+        self.queue_high_water = 0
+        self.patterns = collections.Counter()
+        self.latencies = collections.deque(maxlen=window)
+
+    def snapshot(self):
+        elapsed = time.perf_counter() - self.started
+        latencies = np.asarray(self.latencies) * 1000
+        percentiles = np.percentile(latencies, [50, 95, 99]) if len(latencies) else [None] * 3
+        return {
+            'elapsed_s': round(elapsed, 3),
+            'received': self.received,
+            'rejected': self.rejected,
+            'scored': self.scored,
+            'mismatches': self.mismatches,
+            'mismatch_rate': round(self.mismatches / self.scored, 4) if self.scored else None,
+            'batches': self.batches,
+            'mean_batch': round(self.scored / self.batches, 1) if self.batches else None,
+            'queue_high_water': self.queue_high_water,
+            'reviews_per_s': round(self.scored / elapsed, 1) if elapsed > 0 else None,
+            'latency_ms': dict(zip(['p50', 'p95', 'p99'],
+                                   [None if p is None else round(float(p), 2) for p in percentiles])),
+            'patterns': dict(self.patterns.most_common()),
+        }
+
+    def line(self):
+        stats = self.snapshot()
+        latency = stats['latency_ms']
+        p50 = f"{latency['p50']:.0f}" if latency['p50'] is not None else '-'
+        p99 = f"{latency['p99']:.0f}" if latency['p99'] is not None else '-'
+        return (f"[{stats['elapsed_s']:8.1f}s] received {stats['received']:,}, scored {stats['scored']:,} "
+                f"({stats['reviews_per_s'] or 0:,.0f}/s), mismatches {stats['mismatches']:,}, "
+                f"queue {self.queue_high_water:,} max, latency p50 {p50} ms / p99 {p99} ms")
+
+
+def write_stats(counters, path=STATS_PATH):
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump(counters.snapshot(), f, indent=2)
+    os.replace(tmp_path, path)
+
+
+async def _put(queue, review, counters):
+    """ Queue a received review (waits while the queue is full: the backpressure point). """
+    review = parse_review(review)
+    if review is None:
+        counters.rejected += 1
+        return
+    counters.received += 1
+    review.setdefault('id', counters.received)
+    await queue.put((time.perf_counter(), review))
+    counters.queue_high_water = max(counters.queue_high_water, queue.qsize())
+
+
+def _csv_chunks(path):
+    """ The rows of a review CSV as lists of dicts (missing values as None), CSV_CHUNK_SIZE at a time. """
+    for chunk in pd.read_csv(path, chunksize=CSV_CHUNK_SIZE, dtype={'text': object}):
+        yield chunk.astype(object).where(chunk.notna(), None).to_dict('records')
+
+
+def _lines(path):
+    """ JSON lines of a JSON-lines file, or of the rows of a review CSV. """
+    if path.endswith('.csv'):
+        for chunk in _csv_chunks(path):
+            for review in chunk:
+                yield json.dumps(review)
+        return
+    with open(path) as f:
+        for line in f:
+            if line.strip():
+                yield line.rstrip('\n')
+
+
+def _decode(line):
+    try:
+        return json.loads(line)
+    except ValueError:
+        return None
+
+
+async def file_source(path, queue, counters, stop):
+    """ Reviews of a JSON-lines file or a review CSV, in order (the stand-in for a live feed). """
+    loop = asyncio.get_running_loop()
+    if path.endswith('.csv'):
+        chunks = _csv_chunks(path)
+        while not stop.is_set():
+            # Parse the next chunk in a thread so the event loop keeps serving
+            chunk = await loop.run_in_executor(None, next, chunks, None)
+            if chunk is None:
+                break
+            for review in chunk:
+                if stop.is_set():
+                    break
+                await _put(queue, review, counters)
+        return
+    with open(path) as f:
+        for line in f:
+            if stop.is_set():
+                break
+            if line.strip():
+                await _put(queue, _decode(line), counters)
+
+
+async def socket_source(host, port, queue, counters, stop):
+    """ Reviews sent as JSON lines by local clients, until stop is set. """
+    async def handle(reader, writer):
+        try:
+            while not stop.is_set():
+                try:
+                    line = await reader.readline()
+                except ValueError:
+                    # A line longer than MAX_LINE: drop the client
+                    counters.rejected += 1
+                    break
+                if not line:
+                    break
+                if line.strip():
+                    await _put(queue, _decode(line), counters)
+        finally:
+            writer.close()
+
+    server = await asyncio.start_server(handle, host, port, limit=MAX_LINE)
+    print(f"Listening on {host}:{port}")
+    async with server:
+        await stop.wait()
+
+
+async def micro_batches(queue, batch_size, max_wait):
+    """ Batches of (received, review) items: batch_size items, or those of max_wait seconds after the first. """
+    loop = asyncio.get_running_loop()
+    getter = None
+    timed_out = object()
+
+    async def next_item(timeout):
+        # One get() stays pending across timeouts, so no item is lost to a cancelled get()
+        nonlocal getter
+        if getter is None:
+            if not queue.empty():
+                return queue.get_nowait()
+            getter = asyncio.ensure_future(queue.get())
+        done, _ = await asyncio.wait({getter}, timeout=timeout)
+        if not done:
+            return timed_out
+        item, getter = getter.result(), None
+        return item
+
+    while True:
+        item = await next_item(None)
+        if item is None:
+            return
+        batch = [item]
+        deadline = loop.time() + max_wait
+        while len(batch) < batch_size:
+            item = await next_item(max(0, deadline - loop.time()))
+            if item is timed_out:
+                break
+            if item is None:
+                yield batch
+                return
+            batch.append(item)
+        yield batch
+
+
+async def batcher(queue, batches, batch_size, max_wait, scorers):
+    async for batch in micro_batches(queue, batch_size, max_wait):
+        await batches.put(batch)
+    for _ in range(scorers):
+        await batches.put(None)
+
+
+async def scorer(batches, executor, sink, counters, store=None):
+    """ Score batches off the event loop and write their mismatch events as they complete. """
+    loop = asyncio.get_running_loop()
+    while True:
+        batch = await batches.get()
+        if batch is None:
+            return
+        reviews = [review for _, review in batch]
+        codes, events = await loop.run_in_executor(executor, score_batch, reviews)
+        done = time.perf_counter()
+        for position, event in events:
+            event['latency_ms'] = round((done - batch[position][0]) * 1000, 2)
+            event['run'] = counters.run
+            sink.write(json.dumps(event) + '\n')
+            counters.patterns[event['pattern']] += 1
+        sink.flush()
+        counters.latencies.extend(done - at for at, _ in batch)
+        counters.scored += len(batch)
+        counters.mismatches += len(events)
+        counters.batches += 1
+        if store is not None:
+            store.update([review.get('product_name') for review in reviews], [review['Rate'] for review in reviews],
+                         codes, 'textblob')
+
+
+async def reporter(counters, interval, stats_path, store=None, store_path=STORE_PATH):
+    while True:
+        await asyncio.sleep(interval)
+        print(counters.line(), flush=True)
+        write_stats(counters, stats_path)
+        if store is not None:
+            store.save(store_path)
+
+
+async def detect(source, sink, batch_size=BATCH_SIZE, max_wait=MAX_WAIT, queue_size=QUEUE_SIZE, jobs=1,
+                 interval=STATS_INTERVAL, stats_path=STATS_PATH, store=None, store_path=STORE_PATH):
+    """
+    Run the detector until the source ends (or SIGINT / SIGTERM); source is a coroutine function
+    taking (queue, counters, stop). Scored reviews are added to store (a MismatchStore) if given.
+    Returns the counters.
+    """
+    loop = asyncio.get_running_loop()
+    stop = asyncio.Event()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, stop.set)
+    counters = Counters()
+    queue = asyncio.Queue(maxsize=queue_size)
+    batches = asyncio.Queue(maxsize=jobs)
+    if jobs > 1:
+        executor = concurrent.futures.ProcessPoolExecutor(jobs, mp_context=multiprocessing.get_context('fork'))
+    else:
+        executor = concurrent.futures.ThreadPoolExecutor(1)
+    tasks = [asyncio.ensure_future(batcher(queue, batches, batch_size, max_wait, jobs))]
+    tasks += [asyncio.ensure_future(scorer(batches, executor, sink, counters, store)) for _ in range(jobs)]
+    stats = asyncio.ensure_future(reporter(counters, interval, stats_path, store, store_path))
+    try:
+        await source(queue, counters, stop)
+        # End of input: drain what was received
+        await queue.put(None)
+        await asyncio.gather(*tasks)
+    finally:
+        stats.cancel()
+        for task in tasks:
+            task.cancel()
+        executor.shutdown()
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            loop.remove_signal_handler(sig)
+    write_stats(counters, stats_path)
+    if store is not None:
+        store.save(store_path)
+    return counters
+
+
+async def send_file(path, host=HOST, port=PORT):
+    """ Replay a JSON-lines file or review CSV into a running detector (waits whenever it pushes back). """
+    _, writer = await asyncio.open_connection(host, port)
+    sent = 0
+    for line in _lines(path):
+        writer.write(line.encode() + b'\n')
+        sent += 1
+        if sent % 1000 == 0:
+            await writer.drain()
+    await writer.drain()
+    writer.close()
+    await writer.wait_closed()
+    return sent
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Flag rating-text mismatches of reviews as they arrive")
+    parser.add_argument('--file', default=None,
+                        help="read reviews from a JSON-lines file or review CSV instead of listening on a socket")
+    parser.add_argument('--send', default=None, help="send a JSON-lines file or review CSV to a running detector")
+    parser.add_argument('--host', default=HOST)
+    parser.add_argument('--port', type=int, default=PORT)
+    parser.add_argument('--output', default=OUTPUT_PATH, help="mismatch events (JSON lines); '-' for stdout")
+    parser.add_argument('--batch-size', type=int, default=BATCH_SIZE, help="largest micro-batch")
+    parser.add_argument('--max-wait', type=float, default=MAX_WAIT,
+                        help="seconds a micro-batch waits for more reviews after its first one")
+    parser.add_argument('--queue-size', type=int, default=QUEUE_SIZE, help="reviews buffered before backpressure")
+    parser.add_argument('--jobs', type=int, default=1, help="scoring processes (1: a thread)")
+    parser.add_argument('--interval', type=float, default=STATS_INTERVAL, help="seconds between counter lines")
+    parser.add_argument('--store', nargs='?', const=STORE_PATH, default=None,
+                        help=f"also update the mismatch counters of mismatch_store.py (default {STORE_PATH})")
+    args = parser.parse_args()
+
+    if args.send:
+        start = time.perf_counter()
+        sent = asyncio.run(send_file(args.send, args.host, args.port))
+        print(f"Sent {sent:,} reviews in {time.perf_counter() - start:.1f}s")
+        raise SystemExit(0)
+
+    if args.file:
+        source = lambda queue, counters, stop: file_source(args.file, queue, counters, stop)
+    else:
+        source = lambda queue, counters, stop: socket_source(args.host, args.port, queue, counters, stop)
+    store = MismatchStore.load(args.store) if args.store else None
+    if store is not None:
+        try:
+            # The stream scores with TextBlob; refuse a store of another code before reading anything
+            store.use_codes('textblob')
+        except ValueError as e:
+            parser.error(str(e))
+    if args.output == '-':
+        sink = os.fdopen(os.dup(1), 'w')
+    else:
+        os.makedirs(os.path.dirname(args.output) or '.', exist_ok=True)
+        # Append: a restarted service keeps the events of its earlier runs
+        sink = open(args.output, 'a')
+    with sink:
+        counters = asyncio.run(detect(source, sink, args.batch_size, args.max_wait, args.queue_size, args.jobs,
+                                      args.interval, store=store, store_path=args.store))
+    print(counters.line())
+    print(f"Mismatch events saved to '{args.output}', counters to '{STATS_PATH}'")
+    if store is not None:
+        print(f"Mismatch store: {store.reviews:,} reviews, saved to '{args.store}'")
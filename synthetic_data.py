@@ -0,0 +1,177 @@
+import os
+import time
+import argparse
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+from aspect_taxonomy import TAXONOMY_PATH, load_taxonomy
+
+# Synthetic Flipkart-style reviews with the schema of train.parquet / test.parquet
+# (product_name, product_price, Rate, Review, text, labels), for benchmarks and for running
+# the pipeline without the real data.
+#   - Rate is skewed towards 5 stars like the real corpus (RATE_PROBS).
+#   - labels (text sentiment) follow the rating, except for MISMATCH_RATE of the reviews.
+#   - Review lengths are log-normal (mostly short reviews, a long tail of long ones).
+#   - DUPLICATE_SHARE of the texts are drawn from a pool of template texts with Zipfian
+#     popularity ("good product", "nice" ...), the rest are generated.
+#   - Each aspect of the taxonomy (config/aspect_taxonomy.json) is mentioned with its
+#     ASPECT_RATES probability; within an aspect the keywords are Zipfian in list order.
+#   - Products are Zipfian too; a product's first word is its brand (visuals use it as category).
+# Rows are generated and written chunk by chunk, so any size fits in memory.
+
+RATE_PROBS = [0.08, 0.03, 0.07, 0.17, 0.65]
+MISMATCH_RATE = 0.15
+DUPLICATE_SHARE = 0.35
+TEMPLATES = 2000
+ZIPF_EXPONENT = 1.1
+LENGTH_MEDIAN = 12
+LENGTH_SIGMA = 0.9
+MAX_LENGTH = 400
+ASPECT_RATES = {'quality': 0.30, 'cost': 0.20, 'delivery': 0.15, 'flexibility': 0.05}
+CHUNK_SIZE = 250_000
+SCHEMA = pa.schema([('product_name', pa.string()), ('product_price', pa.string()), ('Rate', pa.int64()),
+                    ('Review', pa.string()), ('text', pa.string()), ('labels', pa.int64())])
+
+BRANDS = ['Samsung', 'Apple', 'Philips', 'Nike', 'Boat', 'HP', 'Lenovo', 'Mi', 'Realme', 'Puma',
+          'Prestige', 'Bajaj', 'Havells', 'Noise', 'JBL', 'Sony', 'Asus', 'Dell', 'Skybags', 'Fastrack']
+PRODUCT_TYPES = ['Smartphone', 'Earphones', 'Trimmer', 'Running Shoes', 'Laptop', 'Smartwatch',
+                 'Mixer Grinder', 'Backpack', 'Speaker', 'Iron', 'Kettle', 'Fan']
+SENTIMENT_WORDS = {
+    0: ['bad', 'worst', 'poor', 'waste', 'disappointed', 'terrible', 'useless', 'horrible', 'fake', 'not good'],
+    1: ['okay', 'average', 'fine', 'decent', 'ok', 'normal', 'not bad', 'fair'],
+    2: ['good', 'nice', 'awesome', 'excellent', 'best', 'great', 'super', 'wonderful', 'perfect', 'love'],
+}
+SUMMARIES = {
+    0: ['Worst experience ever!', 'Utterly Disappointed', 'Terrible product', 'Did not meet expectations',
+        'Useless product', 'Very poor', 'Absolute rubbish!', 'Not recommended at all'],
+    1: ['Fair', 'Nice', 'Decent product', 'Good', 'Just okay', 'Average'],
+    2: ['Wonderful', 'Super!', 'Brilliant', 'Terrific purchase', 'Must buy!', 'Worth every penny',
+        'Highly recommended', 'Awesome', 'Perfect product!', 'Classy product'],
+}
+FILLER_WORDS = ('the product is and it very for this i my with but after using one of month days '
+                'bought working was as expected so also all in use really has to a better than '
+                'phone battery sound camera screen look size colour fit comfortable light heavy').split()
+SENTIMENT_SHARE = 0.15
+
+
+def zipf_weights(n, exponent=ZIPF_EXPONENT):
+    weights = 1 / np.arange(1, n + 1) ** exponent
+    return weights / weights.sum()
+
+
+def review_lengths(rng, n, median=LENGTH_MEDIAN, sigma=LENGTH_SIGMA):
+    """ Log-normal word counts, at least 1 and at most MAX_LENGTH. """
+    return np.clip(np.round(rng.lognormal(np.log(median), sigma, n)), 1, MAX_LENGTH).astype(np.int64)
+
+
+class ReviewGenerator:
+    """ Draws review chunks; the same seed always gives the same rows. """
+
+    def __init__(self, seed=0, taxonomy=None, products=None):
+        self.rng = np.random.default_rng(seed)
+        taxonomy = taxonomy or load_taxonomy(TAXONOMY_PATH)
+        self.aspects = [(np.array(keywords, dtype=object), ASPECT_RATES.get(aspect, 0.1),
+                         zipf_weights(len(keywords)))
+                        for aspect, keywords in taxonomy.items()]
+        self.filler = np.array(FILLER_WORDS, dtype=object)
+        self.filler_weights = zipf_weights(len(FILLER_WORDS), 1.0)
+        self.sentiment_words = {label: np.array(words, dtype=object) for label, words in SENTIMENT_WORDS.items()}
+        self.product_count = products or 2000
+        self.products, self.prices = self._products(self.product_count)
+        self.product_weights = zipf_weights(self.product_count, 0.8)
+        # Template texts per text sentiment, each pool ranked by popularity
+        self.templates = {label: self._texts(np.full(TEMPLATES, label), review_lengths(self.rng, TEMPLATES, 3, 0.6))
+                          for label in SENTIMENT_WORDS}
+        self.template_weights = zipf_weights(TEMPLATES)
+
+    def _products(self, n):
+        brands = self.rng.choice(BRANDS, n, p=zipf_weights(len(BRANDS), 0.8))
+        kinds = self.rng.choice(PRODUCT_TYPES, n)
+        names = [f"{brand} {kind} Model {i}" for i, (brand, kind) in enumerate(zip(brands, kinds))]
+        prices = np.round(self.rng.lognormal(np.log(1500), 1.0, n), -1).clip(99, 150_000).astype(np.int64)
+        return np.array(names, dtype=object), prices.astype(str).astype(object)
+
+    def _texts(self, labels, lengths):
+        """ Generated texts: filler words, sentiment words of their label and aspect keywords. """
+        n = len(labels)
+        offsets = np.concatenate([[0], np.cumsum(lengths)])
+        total = int(offsets[-1])
+        tokens = self.filler[self.rng.choice(len(self.filler), total, p=self.filler_weights)]
+        row_of = np.repeat(np.arange(n), lengths)
+        sentiment = self.rng.random(total) < SENTIMENT_SHARE
+        # Make sure every text carries its sentiment at least once
+        sentiment[offsets[:-1]] = True
+        for label, words in self.sentiment_words.items():
+            positions = np.flatnonzero(sentiment & (labels[row_of] == label))
+            tokens[positions] = words[self.rng.integers(0, len(words), len(positions))]
+        for keywords, rate, weights in self.aspects:
+            mentioned = np.flatnonzero(self.rng.random(n) < rate)
+            positions = offsets[mentioned] + (self.rng.random(len(mentioned)) * lengths[mentioned]).astype(np.int64)
+            tokens[positions] = keywords[self.rng.choice(len(keywords), len(mentioned), p=weights)]
+        exclaim = self.rng.random(n) < 0.2
+        texts = [' '.join(tokens[offsets[i]:offsets[i + 1]]) for i in range(n)]
+        return np.array([text + '!' if e else text for text, e in zip(texts, exclaim)], dtype=object)
+
+    def chunk(self, n):
+        """ One DataFrame of n synthetic reviews. """
+        rng = self.rng
+        rate = rng.choice(np.arange(1, 6), n, p=RATE_PROBS)
+        labels = np.where(rate <= 2, 0, np.where(rate == 3, 1, 2))
+        flipped = rng.random(n) < MISMATCH_RATE
+        labels[flipped] = (labels[flipped] + rng.integers(1, 3, int(flipped.sum()))) % 3
+
+        text = np.empty(n, dtype=object)
+        duplicate = rng.random(n) < DUPLICATE_SHARE
+        for label, pool in self.templates.items():
+            rows = np.flatnonzero(duplicate & (labels == label))
+            text[rows] = pool[rng.choice(TEMPLATES, len(rows), p=self.template_weights)]
+        rows = np.flatnonzero(~duplicate)
+        text[rows] = self._texts(labels[rows], review_lengths(rng, len(rows)))
+
+        summary = np.empty(n, dtype=object)
+        for label, options in SUMMARIES.items():
+            rows = np.flatnonzero(labels == label)
+            summary[rows] = np.array(options, dtype=object)[rng.integers(0, len(options), len(rows))]
+        product = rng.choice(self.product_count, n, p=self.product_weights)
+        return pd.DataFrame({'product_name': self.products[product], 'product_price': self.prices[product],
+                             'Rate': rate.astype(np.int64), 'Review': summary, 'text': text,
+                             'labels': labels.astype(np.int64)})
+
+
+def write_dataset(rows, output_dir='.', seed=0, test_fraction=0.2, chunk_size=CHUNK_SIZE, products=None):
+    """ Write rows synthetic reviews as train.parquet / test.parquet in output_dir; returns the row counts. """
+    generator = ReviewGenerator(seed, products=products or max(rows // 200, 100))
+    os.makedirs(output_dir, exist_ok=True)
+    paths = {split: os.path.join(output_dir, f'{split}.parquet') for split in ('train', 'test')}
+    writers = {split: pq.ParquetWriter(path + '.tmp', SCHEMA) for split, path in paths.items()}
+    counts = {split: 0 for split in paths}
+    try:
+        for start in range(0, rows, chunk_size):
+            chunk = generator.chunk(min(chunk_size, rows - start))
+            test = generator.rng.random(len(chunk)) < test_fraction
+            for split, part in (('train', chunk[~test]), ('test', chunk[test])):
+                writers[split].write_table(pa.Table.from_pandas(part, schema=SCHEMA, preserve_index=False))
+                counts[split] += len(part)
+    finally:
+        for writer in writers.values():
+            writer.close()
+    for path in paths.values():
+        os.replace(path + '.tmp', path)
+    return counts
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Generate synthetic Flipkart-style reviews (train/test.parquet)")
+    parser.add_argument('rows', type=int, help="number of reviews")
+    parser.add_argument('--output-dir', default='.', help="where to write train.parquet and test.parquet")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--test-fraction', type=float, default=0.2)
+    parser.add_argument('--products', type=int, default=None, help="distinct products (default: rows / 200)")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    counts = write_dataset(args.rows, args.output_dir, seed=args.seed, test_fraction=args.test_fraction,
+                           products=args.products)
+    print(f"Wrote {counts['train']:,} train and {counts['test']:,} test reviews to '{args.output_dir}' "
+          f"in {time.perf_counter() - start:.1f}s")
@@ -0,0 +1,13 @@
+import os
+import sys
+import tempfile
+
+# The modules under test are flat scripts: the repository root ones import each other by name and
+# the visuals/ ones expect visuals/ on sys.path (as when run as python visuals/<script>.py).
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+for path in (ROOT, os.path.join(ROOT, 'visuals')):
+    if path not in sys.path:
+        sys.path.insert(0, path)
+
+# Steps timed during the tests write their run report at exit; keep it out of outputs/
+os.environ.setdefault('RUN_REPORT_DIR', tempfile.mkdtemp(prefix='run_reports_'))
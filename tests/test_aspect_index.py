@@ -0,0 +1,49 @@
+import numpy as np
+import pandas as pd
+from aspect_index import AspectIndex, review_keys
+
+ASPECTS = ['quality', 'cost']
+
+
+def _index(reviews, products):
+    postings = pd.DataFrame({'review_id': [0, 1], 'aspect': ['quality', 'cost'], 'keyword': ['build', 'price'],
+                             'offset': [0, 4], 'compound': [0.5, -0.4]})
+    labels = np.array([[1, 0], [0, -1], [0, 0]][:len(reviews)])
+    return AspectIndex.build(ASPECTS, postings, products, labels, keys=review_keys(reviews, products))
+
+
+def test_covers_the_indexed_prefix_only():
+    reviews = pd.Series(['great build', 'bad price', 'ok'])
+    products = pd.Series(['A', 'B', 'A'])
+    index = _index(reviews, products)
+    assert index.covers(review_keys(reviews, products))
+    # Rows appended after the indexed ones keep the index valid
+    assert index.covers(review_keys(pd.concat([reviews, pd.Series(['new'])]), pd.concat([products, pd.Series(['C'])])))
+    # Reordered, edited or shorter sources do not
+    assert not index.covers(review_keys(reviews[::-1], products[::-1]))
+    assert not index.covers(review_keys(pd.Series(['great build', 'bad price', 'OK']), products))
+    assert not index.covers(review_keys(reviews[:2], products[:2]))
+
+
+def test_keys_survive_append_and_save(tmp_path):
+    reviews = pd.Series(['great build', 'bad price', 'ok'])
+    products = pd.Series(['A', 'B', 'A'])
+    index = _index(reviews[:2], products[:2])
+    empty = pd.DataFrame({'review_id': [], 'aspect': [], 'keyword': [], 'offset': [], 'compound': []})
+    index = index.append(empty, products[2:], np.array([[0, 0]]), keys=review_keys(reviews[2:], products[2:]))
+    path = str(tmp_path / 'index.npz')
+    index.save(path)
+    loaded = AspectIndex.load(path)
+    assert loaded.n_reviews == 3
+    assert loaded.covers(review_keys(reviews, products))
+
+
+def test_index_without_keys_never_covers(tmp_path):
+    reviews = pd.Series(['great build', 'bad price'])
+    products = pd.Series(['A', 'B'])
+    index = _index(reviews, products)
+    index.keys = None
+    path = str(tmp_path / 'index.npz')
+    index.save(path)
+    assert AspectIndex.load(path).keys is None
+    assert not AspectIndex.load(path).covers(review_keys(reviews, products))
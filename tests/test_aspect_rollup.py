@@ -0,0 +1,36 @@
+import pandas as pd
+from pandas.testing import assert_frame_equal
+from aspect_rollup import build_rollup, load_rollup, merge_rollups, save_rollup
+
+ASPECTS = ['quality', 'cost']
+
+
+def _reviews():
+    df_final = pd.DataFrame({
+        'Review': ['a', 'b', 'c', 'd'],
+        'Rate': [5, 1, 4, 3],
+        'product_name': ['NA', 'None', 'null', 'NA'],
+        'quality': [1, -1, 0, 1],
+        'cost': [0, -1, 1, 0],
+    })
+    postings = pd.DataFrame({'review_id': [0, 1, 3], 'aspect': ['quality', 'cost', 'quality'],
+                             'compound': [0.6, -0.5, 0.3]})
+    return df_final, postings
+
+
+def test_rollup_round_trip_keeps_na_like_product_names(tmp_path):
+    rollup = build_rollup(*_reviews(), ASPECTS)
+    path = str(tmp_path / 'rollup.csv')
+    save_rollup(rollup, path)
+    loaded = load_rollup(path)
+    assert sorted(loaded['product_name'].unique()) == ['NA', 'None', 'null']
+    assert_frame_equal(merge_rollups(loaded), rollup, check_dtype=False)
+
+
+def test_merged_partitions_equal_one_rollup():
+    df_final, postings = _reviews()
+    first, second = df_final.iloc[:2], df_final.iloc[2:].reset_index(drop=True)
+    second_postings = postings[postings['review_id'] >= 2].assign(review_id=lambda p: p['review_id'] - 2)
+    merged = merge_rollups(build_rollup(first, postings[postings['review_id'] < 2], ASPECTS),
+                           build_rollup(second, second_postings, ASPECTS))
+    assert_frame_equal(merged, build_rollup(df_final, postings, ASPECTS), check_dtype=False)
@@ -0,0 +1,46 @@
+import re
+from aspect_taxonomy import AspectMatcher, diff_taxonomies, keyword_pattern, load_taxonomy
+
+TAXONOMY = {'quality': ['build', 'build quality', 'broken'], 'delivery': ['on time', 'late']}
+
+
+def _scan(taxonomy, review):
+    """ The original per-keyword regex scan the matcher replaces. """
+    review = review.lower()
+    return [(aspect, kw, m.start(), m.group(1)) for aspect, keywords in taxonomy.items()
+            for kw in keywords for m in keyword_pattern(kw).finditer(review)]
+
+
+def test_matcher_gives_the_hits_of_a_full_scan():
+    matcher = AspectMatcher(TAXONOMY)
+    for review in ['Build quality is great. Arrived on time.', 'It came late and broken!', 'rebuild', '',
+                   'Late. Late again. build-quality ok']:
+        assert matcher.match(review) == _scan(TAXONOMY, review)
+
+
+def test_diff_taxonomies():
+    edited = {'quality': ['build', 'sturdy'], 'delivery': ['on time', 'late']}
+    assert diff_taxonomies(TAXONOMY, edited) == {'quality': (['sturdy'], ['build quality', 'broken'])}
+    assert diff_taxonomies(TAXONOMY, TAXONOMY) == {}
+    # Added, removed or reordered aspects need a full rerun
+    assert diff_taxonomies(TAXONOMY, {'delivery': TAXONOMY['delivery'], 'quality': TAXONOMY['quality']}) is None
+    assert diff_taxonomies(TAXONOMY, dict(TAXONOMY, cost=['price'])) is None
+
+
+def test_load_taxonomy_lowercases(tmp_path):
+    path = tmp_path / 'taxonomy.json'
+    path.write_text('{"quality": ["Build", "STURDY"]}', encoding='utf-8')
+    assert load_taxonomy(str(path)) == {'quality': ['build', 'sturdy']}
+
+
+def test_scorer_builds_its_matcher_when_imported(monkeypatch):
+    import aspect_sentiment_analysis as scorer
+    monkeypatch.setattr(scorer, 'matcher', None)
+    monkeypatch.setattr(scorer, 'aspect_keywords', TAXONOMY)
+    labels, postings = scorer.score_review('Build quality is great. It came late.')
+    assert labels == {'quality': 1, 'delivery': 0}
+    assert [(aspect, kw) for aspect, kw, _, _ in postings] == [('quality', 'build'), ('quality', 'build quality'),
+                                                               ('delivery', 'late')]
+    # A replaced taxonomy gets a new matcher
+    monkeypatch.setattr(scorer, 'aspect_keywords', {'delivery': ['late']})
+    assert scorer.score_review('It came late.')[0] == {'delivery': 0}
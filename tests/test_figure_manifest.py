@@ -0,0 +1,83 @@
+import os
+import types
+import pandas as pd
+from figure_manifest import entry, input_hash, source_sha256, stale
+from review_cube import load_cube
+from review_data import load_reviews
+
+COLUMNS = ['product_name', 'product_price', 'Rate', 'text', 'review_length', 'review_type',
+           'rating_sentiment', 'sentiment_code', 'labels']
+
+
+def _write_reviews(path, rates, text='text'):
+    rows = [['Mi Phone', 999, rate, text, 10, 'short', 2 if rate >= 4 else 0, 2, 2] for rate in rates]
+    pd.DataFrame(rows, columns=COLUMNS).to_csv(path, index=False)
+    # Move the mtime even on coarse-clock filesystems
+    stat = os.stat(path)
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+
+
+def _insight(name, source):
+    """ A stand-in insight module reading Rate from the cube or the review rows. """
+    path = os.path.abspath(f'{name}.py')
+    with open(path, 'w') as f:
+        f.write(f"SOURCE = {source!r}\n")
+    module = types.ModuleType(name)
+    module.__file__, module.SOURCE, module.COLUMNS, module.FIGURE_PATH = path, source, ['Rate'], f'{name}.png'
+    return module
+
+
+def _check(modules, figures):
+    source_hash = source_sha256('reviews.csv')
+    return stale(modules, figures, source_hash, cube=load_cube('reviews.csv'),
+                 load_frame=lambda columns: load_reviews(columns, path='reviews.csv'))
+
+
+def _record(modules, figures):
+    source_hash = source_sha256('reviews.csv')
+    cube, frame = load_cube('reviews.csv'), load_reviews(['Rate'], path='reviews.csv')
+    for module in modules:
+        open(module.FIGURE_PATH, 'w').close()
+        figures[module.__name__] = entry(module, source_hash, input_hash(module, cube=cube, frame=frame))
+
+
+def test_stale_follows_inputs_code_and_figures(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    modules = [_insight('cube_insight', 'cube'), _insight('rows_insight', 'rows')]
+    _write_reviews('reviews.csv', [5, 4, 1])
+    figures = {}
+    assert _check(modules, figures) == (modules, [])
+    _record(modules, figures)
+    assert _check(modules, figures) == ([], modules)
+
+    # A new source whose Rate column is unchanged keeps both figures and re-stamps them
+    _write_reviews('reviews.csv', [5, 4, 1], text='edited text')
+    assert _check(modules, figures) == ([], modules)
+    assert all(figures[m.__name__]['source_sha256'] == source_sha256('reviews.csv') for m in modules)
+
+    # A changed rating invalidates both
+    _write_reviews('reviews.csv', [5, 4, 3])
+    assert _check(modules, figures) == (modules, [])
+    _record(modules, figures)
+
+    # Edited code or a deleted image invalidates only that figure
+    with open(modules[0].__file__, 'a') as f:
+        f.write("# edited\n")
+    os.remove(modules[1].FIGURE_PATH)
+    assert _check(modules, figures) == (modules, [])
+    _record(modules[1:], figures)
+    assert _check(modules, figures) == ([modules[0]], [modules[1]])
+
+
+def test_code_version_follows_the_arrow_backend(monkeypatch, tmp_path):
+    import figure_manifest
+    from figure_manifest import HERE, code_version
+    monkeypatch.chdir(tmp_path)
+    modules = [_insight('cube_insight', 'cube'), _insight('rows_insight', 'rows')]
+    versions = [code_version(module) for module in modules]
+    backend = tmp_path / 'arrow_backend.py'
+    backend.write_text(open(os.path.join(HERE, 'arrow_backend.py')).read() + '\n# edited\n')
+    monkeypatch.setattr(figure_manifest, 'HERE', str(tmp_path))
+    for name in ['review_data.py', 'review_cube.py']:
+        (tmp_path / name).write_text(open(os.path.join(HERE, name)).read())
+    assert all(code_version(module) != version for module, version in zip(modules, versions))
@@ -0,0 +1,57 @@
+import pandas as pd
+import pytest
+from mismatch_store import PATTERNS, MismatchStore
+
+
+def _write_scored(path, rows):
+    pd.DataFrame(rows, columns=['product_name', 'Rate', 'sentiment_code']).to_csv(path, index=False)
+
+
+def test_add_save_load_round_trip(tmp_path):
+    csv_path, store_path = str(tmp_path / 'scored.csv'), str(tmp_path / 'store.npz')
+    _write_scored(csv_path, [['Mi Phone', 5, 2], ['Mi Phone', 5, 0], ['NA Speaker', 1, 2], [None, 3, 1],
+                             ['Mi Watch', 4, None]])
+    store = MismatchStore()
+    assert store.add_csv(csv_path) == 5
+    store.save(store_path)
+
+    loaded = MismatchStore.load(store_path)
+    assert (loaded.reviews, loaded.skipped, loaded.code_source) == (4, 1, 'sentiment_code')
+    for dimension in ['product', 'category', 'Rate']:
+        pd.testing.assert_frame_equal(loaded.table(dimension), store.table(dimension))
+    stats = loaded.stats('product', 'Mi Phone')
+    assert (stats['reviews'], stats['mismatches'], stats['mean_rating']) == (2, 1, 5.0)
+    assert loaded.stats('category', 'NA')['patterns'][PATTERNS[2]] == 1
+    assert loaded.mismatch_rate('Rate', 3) == 0.0
+
+    # The same file again is a no-op, also after a reload; later batches keep counting
+    assert loaded.add_csv(csv_path) == 0
+    loaded.update(['Mi Phone'], [1], [0], 'sentiment_code')
+    loaded.save(store_path)
+    assert MismatchStore.load(store_path).stats('product', 'Mi Phone')['reviews'] == 3
+
+
+def test_store_refuses_other_code_sources(tmp_path):
+    csv_path, store_path = str(tmp_path / 'scored.csv'), str(tmp_path / 'store.npz')
+    _write_scored(csv_path, [['Mi Phone', 5, 2]])
+    store = MismatchStore()
+    store.update(['Mi Phone'], [5], [0], 'textblob')
+    store.save(store_path)
+    store = MismatchStore.load(store_path)
+    with pytest.raises(ValueError, match='textblob'):
+        store.add_csv(csv_path)
+    assert store.reviews == 1 and store.sources == []
+    # A textblob_sentiment column holds the stream's code and may be added
+    pd.read_csv(csv_path).rename(columns={'sentiment_code': 'textblob_sentiment'}).to_csv(csv_path, index=False)
+    assert store.add_csv(csv_path, text_column='textblob_sentiment') == 1
+
+
+def test_add_csv_keeps_products_named_like_missing_values(tmp_path):
+    csv_path = str(tmp_path / 'scored.csv')
+    _write_scored(csv_path, [['NA', 5, 0], ['null', 1, 0], ['None', 3, 1], [None, 4, 2]])
+    store = MismatchStore()
+    assert store.add_csv(csv_path) == 4
+    assert store.reviews == 4
+    for name in ['NA', 'null', 'None']:
+        assert store.stats('product', name)['reviews'] == 1
+    assert store.stats('product', 'NA')['mismatches'] == 1
@@ -0,0 +1,45 @@
+import os
+import pandas as pd
+from near_duplicates import THRESHOLD, cluster, cluster_meta, load_clusters, meta_path, save_clusters
+from pipeline import STAGES, dependencies, stage_inputs
+
+TEXTS = ['Very good product 👍', 'very good product!!', 'Terrible, broke in a week', 'VERY GOOD PRODUCT']
+
+
+def _build(tmp_path, texts=TEXTS, threshold=THRESHOLD):
+    source, path = str(tmp_path / 'reviews.csv'), str(tmp_path / 'clusters.csv')
+    pd.DataFrame({'text': texts, 'summary': texts}).to_csv(source, index=False)
+    clusters = cluster(pd.Series(texts), jobs=1, threshold=threshold)
+    save_clusters(clusters, cluster_meta(source, 'text', threshold, len(clusters)), path)
+    return source, path, clusters
+
+
+def test_clusters_round_trip(tmp_path):
+    source, path, clusters = _build(tmp_path)
+    loaded = load_clusters(source, 'text', THRESHOLD, path)
+    pd.testing.assert_frame_equal(loaded, clusters)
+    assert loaded['representative'].tolist() == [0, 0, 2, 0]
+
+
+def test_clusters_of_other_data_or_settings_are_rejected(tmp_path):
+    source, path, _ = _build(tmp_path)
+    assert load_clusters(source, 'summary', THRESHOLD, path) is None
+    assert load_clusters(source, 'text', 0.9, path) is None
+    # Same number of rows, different reviews
+    pd.DataFrame({'text': TEXTS[::-1], 'summary': TEXTS}).to_csv(source, index=False)
+    assert load_clusters(source, 'text', THRESHOLD, path) is None
+
+
+def test_clusters_without_sidecar_are_rejected(tmp_path):
+    source, path, _ = _build(tmp_path)
+    os.remove(meta_path(path))
+    assert load_clusters(source, 'text', THRESHOLD, path) is None
+
+
+def test_near_duplicate_flag_adds_the_clusters_as_sentiment_inputs():
+    stages = [dict(stage) for stage in STAGES]
+    sentiment = next(stage for stage in stages if stage['name'] == 'sentiment')
+    assert 'near_duplicates' not in dependencies(stages)['sentiment']
+    sentiment['args'] = ['--near-duplicates']
+    assert 'processed_data/near_duplicates.csv' in stage_inputs(sentiment)
+    assert dependencies(stages)['sentiment'] == {'convert', 'near_duplicates'}
@@ -0,0 +1,102 @@
+import os
+from pipeline import load_state, run_pipeline
+
+# Stage scripts: copy the input (upper-cased, or its length) to the output
+UPPER = "import sys\nopen(sys.argv[2], 'w').write(open(sys.argv[1]).read().upper())\n"
+LENGTH = "import sys\nopen(sys.argv[2], 'w').write(str(len(open(sys.argv[1]).read())))\n"
+# Edits its own input while it runs
+EDIT = UPPER + "open(sys.argv[1], 'a').write('!')\n"
+
+
+def _stages(scripts):
+    stages = []
+    for i, (name, source) in enumerate(scripts):
+        with open(f'{name}.py', 'w') as f:
+            f.write(source)
+        stages.append({'name': name, 'script': f'{name}.py', 'inputs': [f'{i}.txt'], 'outputs': [f'{i + 1}.txt'],
+                       'code': [f'{name}.py'], 'args': [f'{i}.txt', f'{i + 1}.txt']})
+    return stages
+
+
+def _write(path, text):
+    with open(path, 'w') as f:
+        f.write(text)
+    # Move the mtime even on coarse-clock filesystems
+    stat = os.stat(path)
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+
+
+def _run(stages, **kwargs):
+    return run_pipeline(stages=stages, jobs=1, **kwargs)
+
+
+def test_skips_follow_contents(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    stages = _stages([('upper', UPPER), ('length', LENGTH)])
+    _write('0.txt', 'abc')
+    assert _run(stages) == {'upper': 'done', 'length': 'done'}
+    assert _run(stages) == {'upper': 'skipped', 'length': 'skipped'}
+
+    # Touched with the same content: nothing runs
+    _write('0.txt', 'abc')
+    assert _run(stages) == {'upper': 'skipped', 'length': 'skipped'}
+
+    # New content that upper-cases the same: upper re-runs, its identical output keeps length
+    _write('0.txt', 'ABC')
+    assert _run(stages) == {'upper': 'done', 'length': 'skipped'}
+    _write('0.txt', 'abcd')
+    assert _run(stages) == {'upper': 'done', 'length': 'done'}
+    assert open('2.txt').read() == '4'
+
+    # A missing output or --force re-runs a stage
+    os.remove('2.txt')
+    assert _run(stages) == {'upper': 'skipped', 'length': 'done'}
+    assert _run(stages, force={'upper'}) == {'upper': 'done', 'length': 'skipped'}
+
+
+def test_failed_stage_blocks_downstream(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    stages = _stages([('upper', "raise SystemExit(3)\n"), ('length', LENGTH)])
+    _write('0.txt', 'abc')
+    assert _run(stages) == {'upper': 'failed', 'length': 'blocked'}
+    assert 'upper' not in load_state()['stages']
+
+
+def test_inputs_changed_during_run_are_not_recorded(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    stages = _stages([('edit', EDIT)])
+    _write('0.txt', 'abc')
+    assert _run(stages) == {'edit': 'done'}
+    assert 'edit' not in load_state()['stages']
+    # The output came from 'abc', not from the edited input, so the stage runs again
+    assert _run(stages) == {'edit': 'done'}
+
+
+def _local_imports(path, modules, seen):
+    """ Repository modules path imports, transitively (function-level imports included). """
+    import ast
+    for node in ast.walk(ast.parse(open(path).read())):
+        names = [alias.name for alias in node.names] if isinstance(node, ast.Import) else (
+            [node.module] if isinstance(node, ast.ImportFrom) and node.module else [])
+        for name in names:
+            module = modules.get(name.split('.')[0])
+            if module and module not in seen:
+                seen.add(module)
+                _local_imports(module, modules, seen)
+    return seen
+
+
+def test_stage_code_lists_cover_their_imports(monkeypatch):
+    import glob
+    import pipeline
+    from pipeline import STAGES, code_files
+    monkeypatch.chdir(os.path.dirname(os.path.abspath(pipeline.__file__)))
+    for stage in STAGES:
+        # visuals/ scripts import their siblings first, as when run as python visuals/<script>.py
+        folders = ['visuals', '.'] if stage['script'].startswith('visuals/') else ['.']
+        modules = {}
+        for folder in reversed(folders):
+            modules.update({os.path.splitext(os.path.basename(p))[0]: os.path.normpath(p)
+                            for p in glob.glob(os.path.join(folder, '*.py'))})
+        needed = _local_imports(stage['script'], modules, {stage['script']})
+        assert needed <= set(code_files(stage)), stage['name']
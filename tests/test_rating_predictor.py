@@ -0,0 +1,45 @@
+import numpy as np
+import pytest
+from sklearn.ensemble import RandomForestRegressor
+from sklearn.linear_model import ElasticNet
+from sklearn.preprocessing import PolynomialFeatures, StandardScaler
+from rating_predictor import RatingPredictor, all_patterns, pattern_codes, save_ensemble
+
+FEATURES = ['quality', 'cost', 'delivery', 'flexibility']
+
+
+@pytest.fixture
+def predictor(tmp_path):
+    rng = np.random.default_rng(0)
+    X = rng.choice([-1, 0, 1], size=(500, len(FEATURES))).astype(float)
+    y = np.clip(np.round(4 + 0.5 * X.sum(axis=1) + rng.normal(0, 0.8, len(X))), 1, 5)
+    poly = PolynomialFeatures(degree=2, include_bias=False).fit(X)
+    scaler = StandardScaler().fit(poly.transform(X))
+    models = {'Random Forest': RandomForestRegressor(n_estimators=10, random_state=42),
+              'ElasticNet': ElasticNet(alpha=0.1, l1_ratio=0.5, random_state=42)}
+    for model in models.values():
+        model.fit(scaler.transform(poly.transform(X)), y)
+    path = save_ensemble(poly, scaler, models, [0.6, 0.4], FEATURES, path=str(tmp_path / 'ensemble.joblib'))
+    return RatingPredictor.load(path)
+
+
+def test_lookup_matches_models(predictor):
+    rng = np.random.default_rng(1)
+    X = rng.choice([-1, 0, 1], size=(1000, len(FEATURES))).astype(float)
+    np.testing.assert_allclose(predictor.predict(X), predictor._predict_transformed(X))
+    # Off-level rows take the transform path, whatever batch they fall in
+    X[::7, 2] = 0.5
+    np.testing.assert_allclose(predictor.predict(X, batch_size=16), predictor._predict_transformed(X))
+
+
+def test_missing_values_raise(predictor):
+    X = np.zeros((5, len(FEATURES)))
+    X[3, 1] = np.nan
+    with pytest.raises(ValueError, match='missing or non-finite'):
+        predictor.predict(X)
+
+
+def test_pattern_codes_number_all_patterns():
+    np.testing.assert_array_equal(pattern_codes(all_patterns(len(FEATURES))), np.arange(3 ** len(FEATURES)))
+    with pytest.raises(ValueError):
+        pattern_codes(np.array([[0, 0, 0, 2]]))
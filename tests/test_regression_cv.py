@@ -0,0 +1,71 @@
+import tracemalloc
+import numpy as np
+import pytest
+from sklearn.linear_model import LinearRegression
+from sklearn.preprocessing import PolynomialFeatures
+import regression_analysis_predict_rating_from_aspect_sentiments as regression
+from regression_analysis_predict_rating_from_aspect_sentiments import (
+    FEATURES, collapse, cv_folds, fit_models, full_row_weights, prepare, evaluate, _fit_task, _save_matrices)
+from balancing import balance
+
+
+def _data(n=3000, seed=0):
+    rng = np.random.default_rng(seed)
+    X = rng.choice([-1, 0, 1], size=(n, len(FEATURES))).astype(float)
+    y = np.clip(np.round(4 + 0.5 * X.sum(axis=1) + rng.normal(0, 0.8, n)), 1, 5)
+    return X, y, PolynomialFeatures(degree=2, include_bias=False).fit(X)
+
+
+def test_folds_hold_out_original_rows():
+    X, y, poly = _data()
+    for mode, strategy in (('full', 'smote'), ('collapsed', 'weights')):
+        folds = list(cv_folds(mode, X, y, poly, strategy, cv=5))
+        assert len(folds) == 5
+        # Every original training row is held out exactly once
+        assert sum(len(fold['y_val']) for fold in folds) == len(y)
+        for fold in folds:
+            if mode == 'collapsed':
+                assert len(fold['X_predict']) == 81 and len(fold['codes']) == len(fold['y_val'])
+            else:
+                assert fold['codes'] is None and len(fold['X_predict']) == len(fold['y_val'])
+
+
+def test_collapsed_cv_matches_held_out_score():
+    X, y, poly = _data()
+    X_train, y_train, X_test, y_test = X[:2400], y[:2400], X[2400:], y[2400:]
+    for mode in ('full', 'collapsed'):
+        _, X_fit, y_fit, weights, X_predict, _ = prepare(mode, X_train, y_train, X_test, poly, 'weights')
+        _, outputs, _, cv_scores = fit_models({'Linear': LinearRegression()}, X_fit, y_fit, X_predict,
+                                              sample_weight=weights, jobs=1,
+                                              folds=cv_folds(mode, X_train, y_train, poly, 'weights', cv=4))
+        test_r2 = evaluate(y_test, regression.test_predictions(mode, outputs, X_test)['Linear'])['R2']
+        assert len(cv_scores['Linear']) == 4
+        assert abs(np.mean(cv_scores['Linear']) - test_r2) < 0.1
+
+
+def test_fit_task_leaves_outer_tracing_on(tmp_path):
+    X, y, _ = _data(200)
+    paths = _save_matrices(str(tmp_path), '', {'X': X, 'y': y, 'X_predict': X})
+    tracemalloc.start()
+    try:
+        _fit_task('Linear', LinearRegression(), paths)
+        assert tracemalloc.is_tracing()
+    finally:
+        tracemalloc.stop()
+    _fit_task('Linear', LinearRegression(), paths)
+    assert not tracemalloc.is_tracing()
+
+
+def test_full_row_weights_match_the_collapsed_weights():
+    X, y, _ = _data(500)
+    X_cells, y_cells, counts = collapse(X, y)
+    _, _, cell_weights = balance('weights', X_cells, y_cells, counts)
+    # Row weights summed over each (pattern, Rate) cell give that cell's weight
+    row_weights = full_row_weights('weights', y)
+    cells = {(tuple(row), rate): 0.0 for row, rate in zip(X_cells, y_cells)}
+    for row, rate, weight in zip(X, y, row_weights):
+        cells[(tuple(row), rate)] += weight
+    np.testing.assert_allclose(list(cells.values()), cell_weights)
+    assert full_row_weights('none', y) is None
+    with pytest.raises(ValueError, match='per-row equivalent'):
+        full_row_weights('random_over', y)
@@ -0,0 +1,39 @@
+import os
+import pandas as pd
+from review_cube import load_cube, rollup, share
+
+COLUMNS = ['product_name', 'product_price', 'Rate', 'text', 'review_length', 'review_type',
+           'rating_sentiment', 'sentiment_code', 'labels']
+
+
+def _write_reviews(path, rows):
+    pd.DataFrame(rows, columns=COLUMNS).to_csv(path, index=False)
+
+
+def _row(product, rate, code):
+    return [product, 999, rate, 'text', 10, 'short', 2 if rate >= 4 else 0, code, code]
+
+
+def test_cube_keeps_na_like_categories(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    _write_reviews('reviews.csv', [_row('NA Speaker', 5, 2), _row('None Watch', 1, 2), _row('Mi Phone', 4, 0)])
+    load_cube('reviews.csv')
+    # Second call reads the stored cube back from CSV
+    cube = load_cube('reviews.csv')
+    table = rollup(cube, 'category')
+    assert sorted(table['category']) == ['Mi', 'NA', 'None']
+    assert table['reviews'].sum() == 3
+
+
+def test_cube_follows_source_changes(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    rows = [_row('Mi Phone', 5, 2), _row('Mi Phone', 5, 0)]
+    _write_reviews('reviews.csv', rows)
+    rates, totals = share(load_cube('reviews.csv'), 'category', 'sentiment_match')
+    assert totals['Mi'] == 2 and rates['Mi'] == 50
+    # Rewrite with another row; the mtime must move even on coarse-clock filesystems
+    _write_reviews('reviews.csv', rows + [_row('Mi Phone', 5, 2)])
+    stat = os.stat('reviews.csv')
+    os.utime('reviews.csv', ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+    rates, totals = share(load_cube('reviews.csv'), 'category', 'sentiment_match')
+    assert totals['Mi'] == 3 and round(rates['Mi'], 6) == round(100 / 3, 6)
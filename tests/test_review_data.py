@@ -0,0 +1,55 @@
+import os
+import pandas as pd
+import pytest
+import review_data
+from review_data import cache_is_fresh, load_products, load_reviews
+
+COLUMNS = ['product_name', 'product_price', 'Rate', 'text', 'review_length', 'review_type',
+           'rating_sentiment', 'sentiment_code', 'labels']
+
+
+def _write_reviews(path, rates):
+    rows = [['Mi Phone', 999, rate, 'text', 10, 'short', 2 if rate >= 4 else 0, 2, 2] for rate in rates]
+    pd.DataFrame(rows, columns=COLUMNS).to_csv(path, index=False)
+
+
+def _bump_mtime(path):
+    # Move the mtime even on coarse-clock filesystems
+    stat = os.stat(path)
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+
+
+def test_touched_source_reuses_cache(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    _write_reviews('reviews.csv', [5, 4, 1])
+    load_reviews(['Rate'], path='reviews.csv')
+    _bump_mtime('reviews.csv')
+    # Same content: the sha256 fallback accepts the cache and no rebuild happens
+    monkeypatch.setattr(review_data, 'build_cache', lambda *a, **k: pytest.fail("cache was rebuilt"))
+    assert cache_is_fresh('reviews.csv')
+    assert load_reviews(['Rate'], path='reviews.csv')['Rate'].tolist() == [5, 4, 1]
+
+
+def test_same_size_edit_rebuilds_cache(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    _write_reviews('reviews.csv', [5, 4, 1])
+    assert load_reviews(['Rate', 'rating_label'], path='reviews.csv')['rating_label'].tolist() == \
+        ['positive', 'positive', 'negative']
+    size = os.path.getsize('reviews.csv')
+    _write_reviews('reviews.csv', [5, 4, 3])
+    assert os.path.getsize('reviews.csv') == size
+    _bump_mtime('reviews.csv')
+    assert not cache_is_fresh('reviews.csv')
+    assert load_reviews(['Rate', 'rating_label'], path='reviews.csv')['rating_label'].tolist() == \
+        ['positive', 'positive', 'neutral']
+
+
+def test_new_product_rebuilds_product_table(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    _write_reviews('reviews.csv', [5])
+    assert load_products('reviews.csv')['product_name'].tolist() == ['Mi Phone']
+    frame = pd.read_csv('reviews.csv')
+    frame.loc[1] = frame.loc[0]
+    frame.loc[1, 'product_name'] = 'Boat Speaker'
+    frame.to_csv('reviews.csv', index=False)
+    assert load_reviews(['product_name', 'category'], path='reviews.csv')['category'].tolist() == ['Mi', 'Boat']
@@ -0,0 +1,71 @@
+import io
+import json
+import asyncio
+from stream_detector import detect, file_source
+
+REVIEWS = [
+    {'id': 'a', 'Rate': 5, 'text': 'excellent product, great quality', 'product_name': 'Mi Phone'},
+    {'id': 'b', 'Rate': 5, 'text': 'terrible product, awful quality', 'product_name': 'Mi Phone'},
+    {'id': 'c', 'Rate': 1, 'text': 'worst purchase ever'},
+    {'id': 'd', 'Rate': 1, 'text': 'excellent product, great quality'},
+    {'id': 'e', 'Rate': 3, 'text': 'it is a phone'},
+]
+
+
+def _write_jsonl(path, reviews):
+    with open(path, 'w') as f:
+        for review in reviews:
+            f.write(json.dumps(review) + '\n')
+        f.write('not json\n\n')
+
+
+def _run(source, tmp_path, batch_size, max_wait):
+    """ Run the detector on source; returns its counters, the events and the tasks left over. """
+    sink = io.StringIO()
+
+    async def main():
+        counters = await detect(source, sink, batch_size=batch_size, max_wait=max_wait, interval=60,
+                                stats_path=str(tmp_path / 'stats.json'))
+        await asyncio.sleep(0)
+        return counters, asyncio.all_tasks() - {asyncio.current_task()}
+
+    counters, pending = asyncio.run(main())
+    return counters, [json.loads(line) for line in sink.getvalue().splitlines()], pending
+
+
+def test_file_source_flags_mismatches_and_drains(tmp_path):
+    path = str(tmp_path / 'reviews.jsonl')
+    _write_jsonl(path, REVIEWS)
+    source = lambda queue, counters, stop: file_source(path, queue, counters, stop)
+    # A max_wait no test run reaches: batches close on size, the last one at the end of the input
+    counters, events, pending = _run(source, tmp_path, batch_size=2, max_wait=60)
+
+    assert [(e['id'], e['pattern'], e['hybrid_label']) for e in events] == [
+        ('b', 'positive -> negative', 'positive'), ('d', 'negative -> positive', 'positive')]
+    assert events[0]['product_name'] == 'Mi Phone' and 'product_name' not in events[1]
+    assert all(e['run'] == counters.run and e['latency_ms'] >= 0 for e in events)
+    assert (counters.received, counters.rejected, counters.scored, counters.mismatches) == (5, 1, 5, 2)
+    assert counters.batches == 3
+    # Clean shutdown: nothing left running, final counters written
+    assert not pending
+    stats = json.load(open(tmp_path / 'stats.json'))
+    assert (stats['scored'], stats['batches'], stats['patterns']) == (
+        5, 3, {'positive -> negative': 1, 'negative -> positive': 1})
+
+
+def test_micro_batch_closes_after_max_wait(tmp_path):
+    first, second = str(tmp_path / 'first.jsonl'), str(tmp_path / 'second.jsonl')
+    _write_jsonl(first, REVIEWS)
+    _write_jsonl(second, [dict(review, id=review['id'] * 2) for review in REVIEWS[:2]])
+
+    async def source(queue, counters, stop):
+        # The feed pauses after the fifth review, well past max_wait
+        await file_source(first, queue, counters, stop)
+        await asyncio.sleep(0.5)
+        await file_source(second, queue, counters, stop)
+
+    counters, events, pending = _run(source, tmp_path, batch_size=4, max_wait=0.05)
+    # [a b c d] on size, [e] on timeout (not held back for the second file), [aa bb] at the end
+    assert (counters.scored, counters.batches) == (7, 3)
+    assert [e['id'] for e in events] == ['b', 'd', 'bb']
+    assert not pending
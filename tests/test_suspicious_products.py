@@ -0,0 +1,92 @@
+import numpy as np
+import pandas as pd
+import pytest
+from suspicious_products import SuspiciousIndex, product_counts, wilson_lower_bound
+
+PRODUCTS = ['No Fives', 'Two Fives', 'Ten Fives', 'Twenty Fives', 'Twenty Good Fives']
+
+
+def _reviews():
+    """ (product_id, Rate, sentiment_code) rows: 5-star reviews, `negative` of which read negative. """
+    rows = [(0, 1, 0)] * 3
+    for product_id, fives, negative in [(1, 2, 2), (2, 10, 5), (3, 20, 10), (4, 20, 0)]:
+        rows += [(product_id, 5, 0)] * negative + [(product_id, 5, 2)] * (fives - negative)
+    # Not counted: no product, a half star, no sentiment code
+    rows += [(-1, 5, 0), (2, 4.5, 0), (2, 5, None)]
+    return pd.DataFrame(rows, columns=['product_id', 'Rate', 'sentiment_code'])
+
+
+def _index():
+    reviews = _reviews()
+    counts = product_counts(reviews['product_id'].to_numpy(), reviews['Rate'].to_numpy(), reviews['sentiment_code'],
+                            len(PRODUCTS))
+    return SuspiciousIndex(PRODUCTS, counts)
+
+
+def _names(index, positions):
+    return index.frame('5_star_negative', positions)['product_name'].tolist()
+
+
+def test_wilson_lower_bound_known_values():
+    bounds = wilson_lower_bound([0, 5, 10, 2, 10, 0], [10, 10, 10, 2, 20, 0])
+    np.testing.assert_allclose(bounds[:5], [0, 0.236593, 0.722467, 0.342380, 0.299298], atol=1e-6)
+    assert np.isnan(bounds[5])
+
+
+def test_product_counts_skip_unusable_reviews():
+    counts = _index().counts
+    assert counts.shape == (5, 5, 3) and counts.sum() == 3 + 2 + 10 + 20 + 20
+    assert (counts[2, 4, 0], counts[2, 4, 2], counts[2, 3].sum()) == (5, 5, 0)
+
+
+def test_columns_are_sorted_by_support():
+    columns = _index().columns('5_star_negative')
+    # Products without 5-star reviews first; equal support keeps the product order
+    assert columns['product'].tolist() == [0, 1, 2, 3, 4]
+    assert columns['support'].tolist() == [0, 2, 10, 20, 20]
+    assert columns['events'].tolist() == [0, 2, 5, 10, 0]
+    assert np.isnan(columns['rate'][0]) and columns['rate'][1:].tolist() == [1.0, 0.5, 0.5, 0.0]
+
+
+def test_top_positions():
+    index = _index()
+    # The Wilson bound ranks 2 of 2 above 10 of 20 and 5 of 10; products without support never show up
+    assert _names(index, index.top_positions('5_star_negative', k=10)) == [
+        'Two Fives', 'Twenty Fives', 'Ten Fives', 'Twenty Good Fives']
+    assert _names(index, index.top_positions('5_star_negative', k=2, min_support=5)) == ['Twenty Fives', 'Ten Fives']
+    assert index.top_positions('5_star_negative', k=0).tolist() == []
+    table = index.top('5_star_negative', k=1, min_support=5)
+    assert table.columns.tolist() == ['product_name', 'support', 'events', 'rate', 'wilson']
+    assert table.iloc[0].tolist() == pytest.approx(['Twenty Fives', 20, 10, 0.5, 0.299298], abs=1e-6)
+
+
+def test_ties_rank_the_product_with_more_support_first():
+    index = _index()
+    # 10 of 20 and 5 of 10 share a rate of 0.5, whether k selects (argpartition) or takes them all
+    for k in [2, 10]:
+        names = _names(index, index.top_positions('5_star_negative', k=k, min_support=5, by='rate'))
+        assert names[:2] == ['Twenty Fives', 'Ten Fives']
+    assert _names(index, index.threshold_positions('5_star_negative', 0.4)) == ['Two Fives', 'Twenty Fives',
+                                                                                 'Ten Fives']
+
+
+def test_threshold_positions():
+    index = _index()
+    assert _names(index, index.threshold_positions('5_star_negative', 0.4, min_support=5)) == [
+        'Twenty Fives', 'Ten Fives']
+    # The rate must be above min_rate, not equal to it
+    assert _names(index, index.threshold_positions('5_star_negative', 0.5, min_support=5)) == []
+    assert _names(index, index.threshold_positions('5_star_negative', 0.25, by='wilson')) == [
+        'Two Fives', 'Twenty Fives']
+    assert _names(index, index.threshold_positions('5_star_negative', 0.25, min_support=3, by='wilson')) == [
+        'Twenty Fives']
+
+
+def test_min_support_excludes_small_products():
+    index = _index()
+    for min_support in [3, 10]:
+        names = _names(index, index.top_positions('5_star_negative', k=10, min_support=min_support))
+        assert 'Two Fives' not in names and 'No Fives' not in names
+    assert _names(index, index.top_positions('5_star_negative', k=10, min_support=11)) == [
+        'Twenty Fives', 'Twenty Good Fives']
+    assert index.top_positions('5_star_negative', k=10, min_support=21).tolist() == []
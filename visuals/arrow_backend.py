@@ -0,0 +1,237 @@
+import os
+import functools
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.csv as pacsv
+import pyarrow.dataset as ds
+from review_data import SOURCE_COLUMNS, STORED_COLUMNS, PRICE_EDGES, PRICE_BUCKETS, SENTIMENT_NAMES, parse_prices
+
+# pyarrow implementation of the review ingest and the cube aggregation (review_data.BACKEND = 'arrow').
+# Produces the same cache files and the same cube as the pandas code, but never holds the
+# whole table in pandas:
+#   - ingest streams the CSV block by block (multi-threaded parsing, only SOURCE_COLUMNS are
+#     converted) and computes the derived columns with pyarrow.compute. Product ids are assigned
+#     incrementally; category ids need every product name, so the blocks are first written to a
+#     temporary file and category_id is added in a second streaming pass.
+#   - the cube is aggregated batch by batch from a dataset scan of the memory-mapped cache
+#     (projection of the cube columns only) and the partial cubes are merged, so memory is
+#     bounded by the batch size and the number of cells.
+#   - filtered loads (e.g. only mismatched reviews) push the filter into the scan.
+
+BLOCK_SIZE = 16 << 20
+BATCH_SIZE = 1 << 20
+# pandas' default NA strings, so that both readers see the same missing values
+NA_VALUES = ['', '#N/A', '#N/A N/A', '#NA', '-1.#IND', '-1.#QNAN', '-NaN', '-nan', '1.#IND', '1.#QNAN',
+             '<NA>', 'N/A', 'NA', 'NULL', 'NaN', 'None', 'n/a', 'nan', 'null']
+STRING_COLUMNS = ['product_name', 'product_price', 'text', 'review_type']
+_NAMES = pa.array(SENTIMENT_NAMES.tolist(), type=pa.string())
+
+
+def _open_csv(path):
+    return pacsv.open_csv(
+        path,
+        read_options=pacsv.ReadOptions(block_size=BLOCK_SIZE),
+        parse_options=pacsv.ParseOptions(newlines_in_values=True),
+        convert_options=pacsv.ConvertOptions(
+            include_columns=SOURCE_COLUMNS, include_missing_columns=True,
+            null_values=NA_VALUES, strings_can_be_null=True,
+            column_types={column: pa.string() for column in STRING_COLUMNS}))
+
+
+def _code_names(codes):
+    """ 0/1/2 -> negative/neutral/positive, anything else -> null (like code_to_sentiment). """
+    if not pa.types.is_integer(codes.type) and not pa.types.is_floating(codes.type):
+        return pa.nulls(len(codes), pa.string())
+    codes = pc.cast(codes, pa.float64())
+    valid = pc.fill_null(pc.is_in(codes, pa.array([0.0, 1.0, 2.0])), False)
+    indices = pc.if_else(valid, pc.cast(pc.if_else(valid, codes, 0.0), pa.int64()), None)
+    return pc.take(_NAMES, indices)
+
+
+def _rating_names(rate):
+    """ Same rule as rating_to_sentiment: missing ratings count as positive. """
+    if not pa.types.is_integer(rate.type) and not pa.types.is_floating(rate.type):
+        rate = pa.array(pd.to_numeric(rate.to_pandas(), errors='coerce'), type=pa.float64())
+    negative = pc.fill_null(pc.less_equal(rate, 2), False)
+    neutral = pc.fill_null(pc.equal(rate, 3), False)
+    return pc.if_else(negative, 'negative', pc.if_else(neutral, 'neutral', 'positive')), rate
+
+
+def _same(left, right):
+    return pc.fill_null(pc.equal(left, right), False)
+
+
+class _ProductIds:
+    """ Ids in order of first appearance, assigned block by block (pd.factorize across blocks). """
+
+    def __init__(self):
+        self.names = pa.array([], type=pa.string())
+
+    def __call__(self, names):
+        names = pc.cast(names, pa.string())
+        known = pc.index_in(names, value_set=self.names)
+        new = pc.unique(pc.drop_null(pc.filter(names, pc.is_null(known))))
+        if len(new):
+            # pc.unique keeps the order of first appearance
+            self.names = pa.concat_arrays([self.names, new])
+            known = pc.index_in(names, value_set=self.names)
+        return pc.cast(pc.fill_null(known, -1), pa.int32())
+
+
+def _derive(batch, product_ids, missing=()):
+    """ Review columns of one CSV block (all but category_id) plus the block's product ids. """
+    columns = {name: batch.column(name) for name in batch.schema.names}
+    # Columns missing from the CSV are all-NaN floats in the pandas code
+    columns.update({name: pa.nulls(batch.num_rows, pa.float64()) for name in missing})
+    rating_label, rate = _rating_names(columns['Rate'])
+    label_sentiment = _code_names(columns['sentiment_code'])
+    sentiment = _code_names(columns['labels'])
+    ids = product_ids(columns['product_name'])
+    derived = {
+        'Rate': rate,
+        'rating_label': rating_label,
+        'label_sentiment': label_sentiment,
+        'sentiment': sentiment,
+        'sentiment_match': _same(rating_label, label_sentiment),
+        'hybrid_match': _same(rating_label, sentiment),
+        'product_id': ids,
+    }
+    names = STORED_COLUMNS[:STORED_COLUMNS.index('category_id')]
+    return pa.table({name: derived.get(name, columns.get(name)) for name in names}), ids
+
+
+def _first_words(names):
+    """ First whitespace-separated word of every name (category), null when there is none. """
+    words = pc.list_element(pc.utf8_split_whitespace(pc.utf8_trim_whitespace(names), max_splits=1), 0)
+    return pc.if_else(pc.equal(words, ''), None, words)
+
+
+def _products(names, row_ids, row_prices):
+    """ The product table of build_products() from the product names and every row's id and price. """
+    categories = _first_words(names) if len(names) else pa.array([], type=pa.string())
+    unique = pc.unique(pc.drop_null(categories))
+    # Sorted like pd.factorize(sort=True)
+    category_names = pc.take(unique, pc.sort_indices(unique))
+    category_ids = pc.fill_null(pc.index_in(categories, value_set=category_names), -1).to_numpy(zero_copy_only=False)
+    price = np.full(len(names), np.nan)
+    rows = pd.DataFrame({'product_id': row_ids, 'price': row_prices})
+    medians = rows[rows['product_id'] >= 0].groupby('product_id')['price'].median()
+    price[medians.index.to_numpy()] = medians.to_numpy()
+    bucket = pd.cut(price, PRICE_EDGES, labels=PRICE_BUCKETS, right=False)
+    return pd.DataFrame({
+        'product_id': np.arange(len(names), dtype=np.int32),
+        'product_name': pd.Series(names.to_pylist(), dtype=object),
+        'category_id': category_ids.astype(np.int32),
+        'category': pd.Series(categories.to_pylist(), dtype=object),
+        'price': price,
+        'price_bucket': pd.Series(bucket, dtype=object),
+    })
+
+
+def build_cache(path, table_path):
+    """
+    Stream the CSV into the review cache at table_path; returns (rows, product table, missing columns).
+    """
+    product_ids = _ProductIds()
+    missing = set(SOURCE_COLUMNS) - set(pd.read_csv(path, nrows=0).columns)
+    id_chunks, price_chunks = [], []
+    tmp_path = table_path + '.stage'
+    rows = 0
+    writer = None
+    try:
+        for batch in _open_csv(path):
+            table, ids = _derive(batch, product_ids, missing)
+            if writer is None:
+                writer = pa.ipc.new_file(tmp_path, table.schema)
+            writer.write_table(table)
+            rows += table.num_rows
+            id_chunks.append(ids.to_numpy())
+            # Prices are parsed per distinct value (usually far fewer than rows)
+            price_chunks.append(parse_prices(batch.column('product_price').to_pandas()))
+        if writer is None:
+            raise ValueError(f"'{path}' has no rows")
+        writer.close()
+        writer = None
+
+        row_ids = np.concatenate(id_chunks)
+        products = _products(product_ids.names, row_ids, np.concatenate(price_chunks))
+        category_of = pa.array(products['category_id'].to_numpy())
+
+        # Second pass: add category_id, looked up through product_id
+        final_tmp = table_path + '.tmp'
+        with pa.memory_map(tmp_path) as source:
+            reader = pa.ipc.open_file(source)
+            schema = reader.schema.append(pa.field('category_id', pa.int32()))
+            with pa.ipc.new_file(final_tmp, schema) as sink:
+                for i in range(reader.num_record_batches):
+                    batch = reader.get_batch(i)
+                    ids = batch.column('product_id')
+                    looked_up = pc.take(category_of, pc.if_else(pc.less(ids, 0), 0, ids)) if len(category_of) \
+                        else pa.nulls(len(ids), pa.int32())
+                    category_ids = pc.cast(pc.if_else(pc.less(ids, 0), -1, looked_up), pa.int32())
+                    sink.write_batch(pa.RecordBatch.from_arrays(batch.columns + [category_ids], schema=schema))
+        os.replace(final_tmp, table_path)
+    finally:
+        if writer is not None:
+            writer.close()
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+    return rows, products, sorted(missing)
+
+
+def _expression(where):
+    """ Dataset filter for {column: value} equality conditions. """
+    return functools.reduce(lambda a, b: a & b, [ds.field(column) == value for column, value in where.items()])
+
+
+def scan(table_path, columns, where=None):
+    """ Columns of the cached review table, with the where conditions pushed into the scan. """
+    dataset = ds.dataset(table_path, format='ipc')
+    return dataset.to_table(columns=columns, filter=_expression(where) if where else None)
+
+
+def build_cube(table_path, category_names, dimensions, where=None):
+    """ The cube of review_cube.build_cube, aggregated batch by batch from a scan of the cache. """
+    keys = dimensions[:-1] + ['category_id']
+    dataset = ds.dataset(table_path, format='ipc')
+    scanner = dataset.scanner(columns=keys + ['review_length'], batch_size=BATCH_SIZE,
+                              filter=_expression(where) if where else None)
+    partials = []
+    # pandas reads integer columns with missing values as floats; the cube follows
+    floats = {'Rate': False, 'review_length': False}
+    for batch in scanner.to_batches():
+        if not batch.num_rows:
+            continue
+        table = pa.Table.from_batches([batch])
+        rate, length = table.column('Rate'), table.column('review_length')
+        for name, column in (('Rate', rate), ('review_length', length)):
+            floats[name] |= column.null_count > 0 or pa.types.is_floating(column.type)
+        table = table.append_column('rate_sq', pc.multiply(rate, rate))
+        table = table.append_column('length_sq', pc.multiply(length, length))
+        partials.append(table.group_by(keys, use_threads=False).aggregate([
+            ([], 'count_all'),
+            ('Rate', 'sum', pc.ScalarAggregateOptions(min_count=0)),
+            ('rate_sq', 'sum', pc.ScalarAggregateOptions(min_count=0)),
+            ('Rate', 'min'), ('Rate', 'max'),
+            ('review_length', 'sum', pc.ScalarAggregateOptions(min_count=0)),
+            ('length_sq', 'sum', pc.ScalarAggregateOptions(min_count=0)),
+        ]).rename_columns(keys + ['reviews', 'rate_sum', 'rate_sumsq', 'rate_min', 'rate_max',
+                                  'length_sum', 'length_sumsq']))
+    if not partials:
+        return None
+    merged = pa.concat_tables(partials).group_by(keys, use_threads=False).aggregate([
+        ('reviews', 'sum'), ('rate_sum', 'sum'), ('rate_sumsq', 'sum'), ('rate_min', 'min'),
+        ('rate_max', 'max'), ('length_sum', 'sum'), ('length_sumsq', 'sum'),
+    ]).rename_columns(keys + ['reviews', 'rate_sum', 'rate_sumsq', 'rate_min', 'rate_max',
+                              'length_sum', 'length_sumsq'])
+    cube = merged.to_pandas().sort_values(keys, na_position='last', kind='stable').reset_index(drop=True)
+    for name, measures in (('Rate', ['rate_sum', 'rate_sumsq', 'rate_min', 'rate_max']),
+                           ('review_length', ['length_sum', 'length_sumsq'])):
+        if floats[name]:
+            cube[measures] = cube[measures].astype(float)
+    ids = cube.pop('category_id').to_numpy()
+    names = np.asarray(category_names, dtype=object)
+    cube['category'] = np.where(ids >= 0, names[ids.clip(0)] if len(names) else None, None)
+    return cube
@@ -0,0 +1,106 @@
+import os
+import sys
+import json
+import time
+import hashlib
+import tempfile
+import argparse
+import subprocess
+import pandas as pd
+from pandas.testing import assert_frame_equal
+from review_data import BACKENDS, SOURCE_PATH, build_cache, load_products, load_reviews
+from review_cube import SOURCE_COLUMNS as CUBE_COLUMNS, _cube_paths, load_cube
+
+# Side-by-side timing of the pandas and arrow backends on the same review CSV.
+# Every operation runs once per backend (ingest rebuilds the cache, the cube is rebuilt from the
+# fresh cache, the filtered load reads it) and the results of both backends are checked to be
+# identical, so a faster backend can't be a wrong one. With --parquet-dir the two backends of
+# convert_parquet_to_csv.py are compared as well (pandas row-wise apply vs arrow_convert.py).
+
+RESULTS_PATH = 'outputs/backend_comparison.csv'
+# The rows insight 8 reads (a selective filter)
+WHERE = {'sentiment_match': False}
+
+
+def _timed(function):
+    start = time.perf_counter()
+    result = function()
+    return result, time.perf_counter() - start
+
+
+def compare_reviews(path):
+    """ (operation, backend, seconds, rows) records; raises AssertionError if the backends differ. """
+    records, results = [], {}
+    for backend in BACKENDS:
+        _, seconds = _timed(lambda: build_cache(path, backend=backend))
+        reviews = load_reviews(path=path, backend=backend)
+        records.append(('ingest', backend, seconds, len(reviews)))
+        products = load_products(path)
+        for cube_path in _cube_paths(path):
+            if os.path.exists(cube_path):
+                os.remove(cube_path)
+        cube, seconds = _timed(lambda: load_cube(path, backend=backend))
+        records.append(('cube', backend, seconds, len(cube)))
+        filtered, seconds = _timed(lambda: load_reviews(CUBE_COLUMNS, path=path, where=WHERE, backend=backend))
+        records.append(('filtered load', backend, seconds, len(filtered)))
+        results[backend] = (reviews, products, cube, filtered)
+    for name, left, right in zip(['reviews', 'products', 'cube', 'filtered load'], *results.values()):
+        try:
+            assert_frame_equal(left.reset_index(drop=True), right.reset_index(drop=True))
+        except AssertionError as error:
+            raise AssertionError(f"the backends disagree on {name}: {error}")
+    return records
+
+
+def compare_convert(parquet_dir):
+    """
+    Records for convert_parquet_to_csv.py run with each backend on the train/test.parquet in
+    parquet_dir (summed step times, without the CSV save both share); raises AssertionError if the
+    printed statistics or the written CSV differ.
+    """
+    script = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'convert_parquet_to_csv.py')
+    records, results = [], {}
+    for backend in BACKENDS:
+        with tempfile.TemporaryDirectory() as workdir:
+            for name in ['train.parquet', 'test.parquet']:
+                os.symlink(os.path.abspath(os.path.join(parquet_dir, name)), os.path.join(workdir, name))
+            env = dict(os.environ, RUN_REPORT_DIR=workdir)
+            output = subprocess.run([sys.executable, os.path.abspath(script), '--backend', backend], cwd=workdir,
+                                    env=env, capture_output=True, text=True, check=True).stdout
+            with open(os.path.join(workdir, 'convert_parquet_to_csv.json')) as f:
+                steps = json.load(f)['steps']
+            with open(os.path.join(workdir, 'flipkart_reviews_full.csv'), 'rb') as f:
+                digest = hashlib.sha256(f.read()).hexdigest()
+        seconds = sum(record['wall_s'] for record in steps if record['step'] != 'save')
+        rows = max(record.get('rows') or 0 for record in steps)
+        records.append(('convert', backend, seconds, rows))
+        results[backend] = (output, digest)
+    (output, digest), (other_output, other_digest) = results.values()
+    if output != other_output:
+        raise AssertionError("the backends print different convert_parquet_to_csv.py statistics")
+    if digest != other_digest:
+        raise AssertionError("the backends write different CSV files")
+    return records
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Time the pandas and arrow backends side by side")
+    parser.add_argument('--source', default=SOURCE_PATH, help="review CSV written by sentiment_analysis.py")
+    parser.add_argument('--parquet-dir', default=None,
+                        help="also compare convert_parquet_to_csv.py on the train/test.parquet in this directory")
+    args = parser.parse_args()
+
+    records = compare_reviews(args.source)
+    if args.parquet_dir:
+        records += compare_convert(args.parquet_dir)
+    results = pd.DataFrame(records, columns=['operation', 'backend', 'seconds', 'rows'])
+    table = results.pivot_table(index='operation', columns='backend', values='seconds', sort=False)
+    print(f"\n{'operation':<18} {'pandas s':>10} {'arrow s':>10} {'speedup':>8}")
+    for operation, row in table.iterrows():
+        speedup = f"{row['pandas'] / row['arrow']:7.1f}x" if row['arrow'] > 0 else ''
+        print(f"{operation:<18} {row['pandas']:10.2f} {row['arrow']:10.2f} {speedup:>8}")
+    print("Outputs identical for both backends")
+
+    os.makedirs(os.path.dirname(RESULTS_PATH), exist_ok=True)
+    results.to_csv(RESULTS_PATH, index=False)
+    print(f"Timings saved to '{RESULTS_PATH}'")
@@ -0,0 +1,144 @@
+import os
+import json
+import hashlib
+import argparse
+import importlib
+import matplotlib
+import pandas as pd
+import seaborn as sns
+from review_data import SOURCE_PATH, _cache_paths, _mask, _write_json, cache_is_fresh, build_cache
+from review_cube import rollup
+
+# Build manifest for the figures in visual_images/.
+# For every insight it records the input columns, a code version (hash of the insight module,
+# the shared data helpers it reads through, arrow_backend.py included, and the plotting library
+# versions) and a content hash of exactly the inputs the insight sees:
+#   - cube insights: the cube rolled up to the insight's COLUMNS (keys and review counts),
+#     so e.g. a change in review text does not invalidate a rating-only figure;
+#   - row insights: the insight's columns of the review table.
+# The source CSV's sha256 is stored too; while it is unchanged the input hashes need not be
+# recomputed at all. render_all.py --changed uses stale() to re-render only the figures whose
+# code or inputs changed (or whose image is missing) and records() to update the manifest.
+
+MANIFEST_PATH = 'visual_images/manifest.json'
+MANIFEST_VERSION = 1
+HERE = os.path.dirname(os.path.abspath(__file__))
+SHARED_CODE = {
+    'cube': ['review_data.py', 'review_cube.py', 'arrow_backend.py'],
+    'rows': ['review_data.py', 'arrow_backend.py'],
+}
+
+
+def source_kind(module):
+    return 'cube' if getattr(module, 'SOURCE', None) == 'cube' else 'rows'
+
+
+def code_version(module):
+    """ Hash of the insight's source, its shared helpers and the plotting library versions. """
+    digest = hashlib.sha256()
+    for path in [module.__file__] + [os.path.join(HERE, name) for name in SHARED_CODE[source_kind(module)]]:
+        with open(path, 'rb') as f:
+            digest.update(f.read())
+    digest.update(f"pandas={pd.__version__};matplotlib={matplotlib.__version__};seaborn={sns.__version__}".encode())
+    return digest.hexdigest()[:16]
+
+
+def input_hash(module, cube=None, frame=None):
+    """ Content hash of the data the insight renders from. """
+    if source_kind(module) == 'cube':
+        data = rollup(cube, module.COLUMNS, dropna=False)[list(module.COLUMNS) + ['reviews']]
+    else:
+        data = frame[module.COLUMNS]
+        where = getattr(module, 'WHERE', None)
+        if where:
+            # Only the rows the insight reads, whether or not frame was already filtered
+            data = data[_mask(frame, where)]
+    hashes = pd.util.hash_pandas_object(data, index=False).to_numpy()
+    return hashlib.sha256(hashes.tobytes()).hexdigest()[:16]
+
+
+def source_sha256(path=SOURCE_PATH):
+    """ sha256 of the review CSV, taken from the (refreshed if needed) review cache. """
+    if not cache_is_fresh(path):
+        build_cache(path)
+    _, meta_path = _cache_paths(path)
+    with open(meta_path) as f:
+        return json.load(f)['sha256']
+
+
+def load_manifest(path=MANIFEST_PATH):
+    if not os.path.exists(path):
+        return {}
+    with open(path) as f:
+        manifest = json.load(f)
+    if manifest.get('version') != MANIFEST_VERSION:
+        return {}
+    return manifest.get('figures', {})
+
+
+def save_manifest(figures, path=MANIFEST_PATH):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    _write_json({'version': MANIFEST_VERSION, 'figures': figures}, path)
+
+
+def entry(module, source_hash, inputs):
+    return {'figure': module.FIGURE_PATH, 'source': source_kind(module), 'columns': list(module.COLUMNS),
+            'code_version': code_version(module), 'source_sha256': source_hash, 'input_hash': inputs}
+
+
+def _unchanged(module, recorded):
+    return (recorded is not None and os.path.exists(module.FIGURE_PATH)
+            and recorded.get('figure') == module.FIGURE_PATH
+            and recorded.get('columns') == list(module.COLUMNS)
+            and recorded.get('code_version') == code_version(module))
+
+
+def stale(modules, figures, source_hash, cube=None, load_frame=None):
+    """
+    Split modules into (stale, fresh) against the manifest entries in figures.
+    Input hashes are only computed for figures whose source CSV changed; load_frame(columns)
+    is called (once) when row insights need hashing. Fresh entries are re-stamped in figures.
+    """
+    stale_modules, fresh_modules, to_hash = [], [], []
+    for module in modules:
+        recorded = figures.get(module.__name__)
+        if not _unchanged(module, recorded):
+            stale_modules.append(module)
+        elif recorded.get('source_sha256') == source_hash:
+            fresh_modules.append(module)
+        else:
+            to_hash.append(module)
+
+    frame = None
+    row_columns = [c for m in to_hash if source_kind(m) == 'rows' for c in m.COLUMNS]
+    if row_columns:
+        frame = load_frame(list(dict.fromkeys(row_columns)))
+    for module in to_hash:
+        recorded = figures[module.__name__]
+        if input_hash(module, cube=cube, frame=frame) == recorded.get('input_hash'):
+            recorded['source_sha256'] = source_hash
+            fresh_modules.append(module)
+        else:
+            stale_modules.append(module)
+    return stale_modules, fresh_modules
+
+
+if __name__ == '__main__':
+    from review_cube import load_cube
+    from review_data import load_reviews
+    from render_all import INSIGHTS
+
+    parser = argparse.ArgumentParser(description="Show which insight figures are out of date")
+    parser.add_argument('--source', default=SOURCE_PATH, help="review CSV written by sentiment_analysis.py")
+    args = parser.parse_args()
+
+    modules = [importlib.import_module(name) for name in INSIGHTS]
+    figures = load_manifest()
+    stale_modules, _ = stale(modules, figures, source_sha256(args.source), cube=load_cube(args.source),
+                             load_frame=lambda columns: load_reviews(columns, path=args.source))
+    for module in modules:
+        recorded = figures.get(module.__name__, {})
+        status = 'stale' if module in stale_modules else 'up to date'
+        print(f"  - {module.__name__:<70} {status:<10} inputs {recorded.get('input_hash', '-')}")
+    print(f"\n{len(stale_modules)} of {len(modules)} figures need re-rendering "
+          f"(python visuals/render_all.py --changed)")
@@ -12,28 +12,26 @@
 import pandas as pd
 import matplotlib.pyplot as plt
 import seaborn as sns
+from review_data import SOURCE_PATH
+from review_cube import load_cube, rollup
+from preview import count_interval, error_bars
 
-try:
-    # Load the dataset
-    df_full = pd.read_csv('flipkart_reviews_with_sentiment.csv')
-    print("Data loaded successfully.")
+# label_sentiment: sentiment from the review text
+COLUMNS = ['Rate', 'label_sentiment']
+FIGURE_PATH = 'visual_images/Figure_10_Sentiment_Distribution_by_Rating.png'
+SOURCE = 'cube'
 
-    # Check required columns
-    required_columns = {'Rate', 'sentiment_code'}
-    if not required_columns.issubset(df_full.columns):
-        raise Exception(f"The DataFrame must contain the following columns: {required_columns}")
-    
-    # Map sentiment codes to labels for text sentiment
-    sentiment_map = {1: 'positive', 0: 'neutral', -1: 'negative'}
-    df_full['label_sentiment'] = df_full['sentiment_code'].map(sentiment_map)
 
-# Step 1: Group data by Rate and label_sentiment
-rating_sentiment_group = df_full.groupby(['Rate', 'label_sentiment']).size().reset_index(name='count')
+def render(cube):
+    """ Review counts per star rating and text sentiment. """
+    # Step 1: Group data by Rate and label_sentiment
+    rating_sentiment_group = (rollup(cube, ['Rate', 'label_sentiment'])[['Rate', 'label_sentiment', 'reviews']]
+                              .rename(columns={'reviews': 'count'}))
     
     print("\nDistribution of sentiments across ratings:")
     print(rating_sentiment_group.pivot(index='Rate', columns='label_sentiment', values='count').fillna(0))
 
-# Step 2: Plot
+    # Step 2: Plot
     plt.figure(figsize=(12, 7))
     ax = sns.barplot(data=rating_sentiment_group, 
                      x='Rate', 
@@ -41,13 +39,16 @@ rating_sentiment_group = df_full.groupby(['Rate', 'label_sentiment']).size().res
                      hue='label_sentiment',
                      hue_order=['positive', 'neutral', 'negative'], 
                      palette='Set2')
+    # 95% confidence intervals when rendering a preview (sampled) cube
+    error_bars(ax, count_interval(cube, ['Rate', 'label_sentiment']), sorted(rating_sentiment_group['Rate'].unique()),
+               ['positive', 'neutral', 'negative'])
 
     # Add value labels on the bars
-for p in ax.patches:
-    height = p.get_height()
-    if height > 0:
+    for p in ax.patches:
+        height = p.get_height()
+        if height > 0:
             ax.annotate(f'{int(height):,}', 
-                    (p.get_x() + p.get_width() / 2., height), 
+                        (p.get_x() + p.get_width() / 2., height), 
                         ha='center', va='bottom', 
                         fontsize=8)
 
@@ -61,10 +62,10 @@ for p in ax.patches:
     plt.grid(axis='y', linestyle='--', alpha=0.7)
     
     # Adjust layout to prevent label cutoff
-plt.tight_layout()
+    plt.tight_layout()
     
     # Save the plot
-    plt.savefig('visual_images/Figure_10_Sentiment_Distribution_by_Rating.png', 
+    plt.savefig(FIGURE_PATH, 
                 bbox_inches='tight', dpi=300)
     print("\nPlot saved as 'Figure_10_Sentiment_Distribution_by_Rating.png'")
     
@@ -83,10 +84,15 @@ plt.tight_layout()
             if len(count) > 0:
                 percentage = (count[0] / five_star_total) * 100
                 print(f"- {sentiment.capitalize()}: {percentage:.1f}%")
-    
-plt.show()
 
-except FileNotFoundError:
-    print("Error: The data file could not be found. Please check if 'flipkart_reviews_with_sentiment.csv' exists in the current directory.")
-except Exception as e:
-    print(f"An error occurred: {str(e)}")
+
+if __name__ == '__main__':
+    try:
+        cube = load_cube()
+        print("Data loaded successfully.")
+        render(cube)
+        plt.show()
+    except FileNotFoundError:
+        print(f"Error: The data file could not be found. Please check if '{SOURCE_PATH}' exists in the current directory.")
+    except Exception as e:
+        print(f"An error occurred: {str(e)}")
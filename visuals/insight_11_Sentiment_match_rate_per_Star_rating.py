@@ -13,50 +13,36 @@
 import pandas as pd
 import matplotlib.pyplot as plt
 import seaborn as sns
+from review_data import SOURCE_PATH
+from review_cube import load_cube, share
+from preview import error_bars, share_interval
 
-try:
-    # Load the dataset
-    df_full = pd.read_csv('flipkart_reviews_with_sentiment.csv')
-    print("Data loaded successfully.")
+# sentiment_match: whether rating sentiment and text sentiment agree
+COLUMNS = ['Rate', 'sentiment_match']
+FIGURE_PATH = 'visual_images/Figure_11_Sentiment_Match_Rate_by_Rating.png'
+SOURCE = 'cube'
 
-    # Check required columns
-    required_columns = {'Rate', 'sentiment_code'}
-    if not required_columns.issubset(df_full.columns):
-        raise Exception(f"The DataFrame must contain the following columns: {required_columns}")
-    
-    # Define function to map ratings to sentiment categories
-    def map_rating_to_sentiment(rating):
-        if rating <= 2:
-            return 'negative'
-        elif rating == 3:
-            return 'neutral'
-        else:
-            return 'positive'
-
-    # Map sentiment codes to labels for text sentiment
-    sentiment_map = {1: 'positive', 0: 'neutral', -1: 'negative'}
-    df_full['label_sentiment'] = df_full['sentiment_code'].map(sentiment_map)
-    
-    # Calculate rating sentiment
-    df_full['rating_sentiment'] = df_full['Rate'].apply(map_rating_to_sentiment)
-    
-    # Calculate sentiment match
-    df_full['sentiment_match'] = df_full['rating_sentiment'] == df_full['label_sentiment']
 
-# Step 1: Group by Rate and calculate match percentage
-    match_rate_by_rating = df_full.groupby('Rate')['sentiment_match'].agg(['mean', 'count']).reset_index()
+def render(cube):
+    """ Sentiment match rate per star rating. """
+    # Step 1: Group by Rate and calculate match percentage
+    mismatch_rate, count = share(cube, 'Rate', 'sentiment_match')
+    match_rate_by_rating = pd.DataFrame({'mean': 1 - mismatch_rate / 100, 'count': count}).reset_index()
     match_rate_by_rating['match_percentage'] = match_rate_by_rating['mean'] * 100
     
     print("\nSentiment match rates by star rating:")
     print(match_rate_by_rating[['Rate', 'match_percentage', 'count']].round(6))
 
-# Step 2: Plot
+    # Step 2: Plot
     plt.figure(figsize=(12, 7))
     
     # Create bar plot
     x = range(len(match_rate_by_rating))
     bars = plt.bar(x, match_rate_by_rating['match_percentage'],
                    color=sns.color_palette('Blues', len(match_rate_by_rating)))
+    # 95% confidence intervals when rendering a preview (sampled) cube; the match rate's interval
+    # is as wide as the mismatch rate's
+    error_bars(plt.gca(), share_interval(cube, 'Rate', 'sentiment_match'), list(match_rate_by_rating['Rate']))
 
     # Add value labels on the bars with 6 decimal points
     for i, bar in enumerate(bars):
@@ -82,10 +68,10 @@ try:
     plt.ylim(0, max(match_rate_by_rating['match_percentage']) * 1.2)  # Add 20% padding
     
     # Adjust layout to prevent label cutoff
-plt.tight_layout()
+    plt.tight_layout()
     
     # Save the plot
-    plt.savefig('visual_images/Figure_11_Sentiment_Match_Rate_by_Rating.png', 
+    plt.savefig(FIGURE_PATH, 
                 bbox_inches='tight', dpi=300)
     print("\nPlot saved as 'Figure_11_Sentiment_Match_Rate_by_Rating.png'")
     
@@ -100,10 +86,15 @@ plt.tight_layout()
     print(f"Least emotionally consistent rating: {match_rate_by_rating.iloc[min_idx]['Rate']:.0f}★ "
           f"(Match rate: {match_rate_by_rating.iloc[min_idx]['match_percentage']:.6f}%, "
           f"Count: {int(match_rate_by_rating.iloc[min_idx]['count']):,})")
-    
-plt.show()
 
-except FileNotFoundError:
-    print("Error: The data file could not be found. Please check if 'flipkart_reviews_with_sentiment.csv' exists in the current directory.")
-except Exception as e:
-    print(f"An error occurred: {str(e)}")
+
+if __name__ == '__main__':
+    try:
+        cube = load_cube()
+        print("Data loaded successfully.")
+        render(cube)
+        plt.show()
+    except FileNotFoundError:
+        print(f"Error: The data file could not be found. Please check if '{SOURCE_PATH}' exists in the current directory.")
+    except Exception as e:
+        print(f"An error occurred: {str(e)}")
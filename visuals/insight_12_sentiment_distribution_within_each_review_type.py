@@ -15,46 +15,54 @@ import pandas as pd
 import matplotlib.pyplot as plt
 import seaborn as sns
 import numpy as np
+from review_data import SOURCE_PATH
+from review_cube import load_cube, rollup
+from preview import count_interval, error_bars
 
-try:
-    # Load the data
-    df_full = pd.read_csv('flipkart_reviews_with_sentiment.csv')
-    
-    # Map numeric sentiment labels to text
-    sentiment_map = {0: 'negative', 1: 'neutral', 2: 'positive'}
-    df_full['sentiment'] = df_full['labels'].map(sentiment_map)
-    
+# 'sentiment' is the numeric 'labels' column mapped to positive/neutral/negative
+COLUMNS = ['review_type', 'sentiment']
+FIGURE_PATH = 'visual_images/Figure_12_Sentiment_Distribution_by_Review_Length.png'
+SOURCE = 'cube'
+
+
+def render(cube):
+    """ Text sentiment distribution within each review type. """
     # We already have review_length and review_type columns, so we can skip those calculations
     
     # Print statistics about the categorization
     print("\nReview Length Categories Distribution:")
-    print(df_full['review_type'].value_counts().to_string())
+    type_counts = rollup(cube, 'review_type').set_index('review_type')['reviews']
+    print(type_counts.sort_values(ascending=False).rename('count').to_string())
     
     # Set the style
-sns.set(style="whitegrid")
+    sns.set(style="whitegrid")
     plt.figure(figsize=(12, 7))
 
-# Group and count sentiment within each review type
-    sentiment_by_length = df_full.groupby(['review_type', 'sentiment']).size().reset_index(name='count')
+    # Group and count sentiment within each review type
+    sentiment_by_length = (rollup(cube, ['review_type', 'sentiment'])[['review_type', 'sentiment', 'reviews']]
+                           .rename(columns={'reviews': 'count'}))
     
     # Calculate percentages within each review type
     total_by_type = sentiment_by_length.groupby('review_type')['count'].sum().reset_index()
     sentiment_by_length = sentiment_by_length.merge(total_by_type, on='review_type', suffixes=('', '_total'))
     sentiment_by_length['percentage'] = (sentiment_by_length['count'] / sentiment_by_length['count_total'] * 100).round(6)
 
-# Plot
+    # Plot
     ax = sns.barplot(data=sentiment_by_length, 
                      x='review_type', 
                      y='count', 
                      hue='sentiment',
                      hue_order=['positive', 'neutral', 'negative'], 
                      order=['short', 'medium', 'long'],
-                 palette='Set2')
+                     palette='Set2')
+    # 95% confidence intervals when rendering a preview (sampled) cube
+    error_bars(ax, count_interval(cube, ['review_type', 'sentiment']), ['short', 'medium', 'long'],
+               ['positive', 'neutral', 'negative'])
 
     # Add value annotations with both count and percentage
-for p in ax.patches:
-    height = p.get_height()
-    if height > 0:
+    for p in ax.patches:
+        height = p.get_height()
+        if height > 0:
             review_type = p.get_x() + p.get_width() / 2
             sentiment_idx = int(p.get_x() / p.get_width())
             review_type_name = ['short', 'medium', 'long'][int(review_type)]
@@ -65,20 +73,20 @@ for p in ax.patches:
             ]['percentage'].values[0]
             
             ax.annotate(f'{int(height):,}\n({percentage:.6f}%)', 
-                    (p.get_x() + p.get_width() / 2., height), 
+                        (p.get_x() + p.get_width() / 2., height), 
                         ha='center', va='bottom', fontsize=8)
 
-# Customize
+    # Customize
     plt.title('Sentiment Distribution Across Review Lengths', fontsize=14, pad=20)
     plt.xlabel('Review Type', fontsize=12)
     plt.ylabel('Number of Reviews', fontsize=12)
     plt.legend(title='Sentiment', title_fontsize=10, fontsize=9)
     
     # Adjust layout
-plt.tight_layout()
+    plt.tight_layout()
     
     # Save the plot
-    plt.savefig('visual_images/Figure_12_Sentiment_Distribution_by_Review_Length.png', 
+    plt.savefig(FIGURE_PATH, 
                 bbox_inches='tight', dpi=300)
     print("\nPlot saved as 'Figure_12_Sentiment_Distribution_by_Review_Length.png'")
     
@@ -92,7 +100,13 @@ plt.tight_layout()
     ).round(6)
     print(pivot_table.to_string())
 
-except FileNotFoundError:
-    print("Error: Could not find the data file. Please ensure 'flipkart_reviews_with_sentiment.csv' exists in the root directory.")
-except Exception as e:
-    print(f"An error occurred: {str(e)}")
+
+if __name__ == '__main__':
+    try:
+        cube = load_cube()
+        render(cube)
+        plt.show()
+    except FileNotFoundError:
+        print(f"Error: Could not find the data file. Please ensure '{SOURCE_PATH}' exists in the root directory.")
+    except Exception as e:
+        print(f"An error occurred: {str(e)}")
@@ -12,46 +12,36 @@ import pandas as pd
 import matplotlib.pyplot as plt
 import seaborn as sns
 import numpy as np
+from review_data import SOURCE_PATH
+from review_cube import load_cube, rollup
+
+# hybrid_match: whether the text sentiment label agrees with the rating sentiment
+COLUMNS = ['review_type', 'hybrid_match']
+FIGURE_PATH = 'visual_images/Figure_13_Sentiment_Mismatch_Proportion.png'
+SOURCE = 'cube'
 
-try:
-    # Load the data
-    df_full = pd.read_csv('flipkart_reviews_with_sentiment.csv')
-    
-    # Map numeric sentiment labels to text
-    sentiment_map = {0: 'negative', 1: 'neutral', 2: 'positive'}
-    df_full['sentiment'] = df_full['labels'].map(sentiment_map)
-    
-    # Calculate rating sentiment
-    def get_rating_sentiment(rating):
-        if rating <= 2:
-            return 'negative'
-        elif rating == 3:
-            return 'neutral'
-        else:
-            return 'positive'
-    
-    df_full['rating_sentiment'] = df_full['Rate'].apply(get_rating_sentiment)
-    
-    # Calculate sentiment match
-    df_full['sentiment_match'] = df_full['sentiment'] == df_full['rating_sentiment']
 
-# Filter mismatched reviews
-    mismatched_df = df_full[~df_full['sentiment_match']]
+def render(cube):
+    """ Share of all mismatches per review type. """
+    # Filter mismatched reviews
+    by_type = rollup(cube, ['hybrid_match', 'review_type'], dropna=False)
+    mismatched = by_type[~by_type['hybrid_match']]
 
-# Count mismatches by review type
-    mismatch_by_type = mismatched_df['review_type'].value_counts().reindex(['short', 'medium', 'long'])
+    # Count mismatches by review type
+    mismatch_by_type = (mismatched.dropna(subset=['review_type']).set_index('review_type')['reviews']
+                        .rename('count').reindex(['short', 'medium', 'long']))
     mismatch_percentages = (mismatch_by_type / mismatch_by_type.sum() * 100).round(6)
     
     # Print statistics
-    print("\nTotal number of mismatched reviews:", len(mismatched_df))
+    print("\nTotal number of mismatched reviews:", mismatched['reviews'].sum())
     print("\nMismatch distribution by review type:")
     for review_type, count in mismatch_by_type.items():
         percentage = mismatch_percentages[review_type]
         print(f"{review_type}: {count:,} reviews ({percentage:.6f}%)")
 
-# Plot as pie chart
+    # Plot as pie chart
     plt.figure(figsize=(10, 8))
-colors = sns.color_palette('pastel')
+    colors = sns.color_palette('pastel')
     
     # Create pie chart with exact percentages (6 decimal places)
     patches, texts, autotexts = plt.pie(mismatch_percentages, 
@@ -78,15 +68,21 @@ colors = sns.color_palette('pastel')
               bbox_to_anchor=(1, 0, 0.5, 1))
     
     # Adjust layout to prevent label cutoff
-plt.tight_layout()
+    plt.tight_layout()
     
     # Save the plot
-    plt.savefig('visual_images/Figure_13_Sentiment_Mismatch_Proportion.png', 
+    plt.savefig(FIGURE_PATH, 
                 bbox_inches='tight', 
                 dpi=300)
     print("\nPlot saved as 'Figure_13_Sentiment_Mismatch_Proportion.png'")
 
-except FileNotFoundError:
-    print("Error: Could not find the data file. Please ensure 'flipkart_reviews_with_sentiment.csv' exists in the root directory.")
-except Exception as e:
-    print(f"An error occurred: {str(e)}")
+
+if __name__ == '__main__':
+    try:
+        cube = load_cube()
+        render(cube)
+        plt.show()
+    except FileNotFoundError:
+        print(f"Error: Could not find the data file. Please ensure '{SOURCE_PATH}' exists in the root directory.")
+    except Exception as e:
+        print(f"An error occurred: {str(e)}")
@@ -14,23 +14,28 @@ import pandas as pd
 import matplotlib.pyplot as plt
 import seaborn as sns
 import numpy as np
+from review_data import SOURCE_PATH
+from review_cube import load_cube, rollup
+from preview import error_bars, mean_interval
 
-try:
-    # Load the data
-    df_full = pd.read_csv('flipkart_reviews_with_sentiment.csv')
-    
-    # Map numeric sentiment labels to text
-    sentiment_map = {0: 'negative', 1: 'neutral', 2: 'positive'}
-    df_full['sentiment'] = df_full['labels'].map(sentiment_map)
-    
-    # Compute statistics for each sentiment category
-    sentiment_stats = df_full.groupby('sentiment').agg({
-        'Rate': ['count', 'mean', 'std', 'min', 'max']
+# 'sentiment' is the numeric 'labels' column mapped to positive/neutral/negative
+COLUMNS = ['Rate', 'sentiment']
+FIGURE_PATH = 'visual_images/Figure_14_Average_Rating_by_Sentiment.png'
+SOURCE = 'cube'
+
+
+def render(cube):
+    """ Average star rating per text sentiment. """
+    # Compute statistics for each sentiment category from the cube's Rate sums / sums of squares
+    stats = rollup(cube, 'sentiment').set_index('sentiment')
+    sentiment_stats = pd.DataFrame({
+        'count': stats['rated'],
+        'mean': stats['mean_rate'],
+        'std': stats['std_rate'],
+        'min': stats['rate_min'],
+        'max': stats['rate_max'],
     }).round(6)
     
-    # Flatten column names
-    sentiment_stats.columns = ['count', 'mean', 'std', 'min', 'max']
-    
     # Print detailed statistics
     print("\nDetailed Statistics by Sentiment Category:")
     print("\nNumber of reviews in each category:")
@@ -51,13 +56,13 @@ try:
     # Create the plot
     plt.figure(figsize=(12, 7))
     
-    # Create bar plot
-    ax = sns.barplot(data=df_full, 
-                    x='sentiment', 
-                    y='Rate',
-                    order=['positive', 'neutral', 'negative'],
-                    palette='Set2',
-                    ci='sd')  # Show standard deviation instead of confidence interval
+    # Create bar plot of the means with the standard deviation as error bars
+    order = ['positive', 'neutral', 'negative']
+    ax = sns.barplot(x=order, y=sentiment_stats.loc[order, 'mean'].values, palette='Set2')
+    ax.errorbar(range(len(order)), sentiment_stats.loc[order, 'mean'].values,
+                yerr=sentiment_stats.loc[order, 'std'].values, fmt='none', ecolor='#424242', linewidth=2.5)
+    # Preview (sampled) cube: 95% confidence intervals of the means on top of the spread
+    error_bars(ax, mean_interval(cube, 'sentiment'), order)
     
     # Add value labels with mean and std dev
     for i, sentiment in enumerate(['positive', 'neutral', 'negative']):
@@ -84,12 +89,18 @@ try:
     plt.tight_layout()
     
     # Save the plot
-    plt.savefig('visual_images/Figure_14_Average_Rating_by_Sentiment.png', 
+    plt.savefig(FIGURE_PATH, 
                 bbox_inches='tight', 
                 dpi=300)
     print("\nPlot saved as 'Figure_14_Average_Rating_by_Sentiment.png'")
 
-except FileNotFoundError:
-    print("Error: Could not find the data file. Please ensure 'flipkart_reviews_with_sentiment.csv' exists in the root directory.")
-except Exception as e:
-    print(f"An error occurred: {str(e)}")
+
+if __name__ == '__main__':
+    try:
+        cube = load_cube()
+        render(cube)
+        plt.show()
+    except FileNotFoundError:
+        print(f"Error: Could not find the data file. Please ensure '{SOURCE_PATH}' exists in the root directory.")
+    except Exception as e:
+        print(f"An error occurred: {str(e)}")
@@ -10,45 +10,59 @@
 import pandas as pd                  # Import pandas for data manipulation
 import matplotlib.pyplot as plt      # Imports matplotlib for plotting charts
 import seaborn as sns               # Imports seaborn, a high-level plotting library built on top of matplotlib
+from review_cube import load_cube, rollup  # Aggregate cube shared by all insight scripts
+from preview import count_interval, error_bars  # Error bars in preview mode (render_all.py --preview)
 
-# Load the dataset
-df_full = pd.read_csv('flipkart_reviews_with_sentiment.csv')
+# 'sentiment' is the hybrid 'labels' code as positive/neutral/negative
+COLUMNS = ['sentiment']
+SOURCE = 'cube'
+FIGURE_PATH = 'visual_images/Figure_1 Sentiment Distribution based on Review Text .png'
 
-# Convert sentiment codes to labels for better visualization
-sentiment_map = {2: 'positive', 1: 'neutral', 0: 'negative'}
-df_full['label_sentiment'] = df_full['labels'].map(sentiment_map)
 
-sns.set(style="whitegrid")          # Sets a clean background grid for the plot (optional aesthetic choice)
+def render(cube):
+    """ Bar chart of the text sentiment distribution. """
+    # Number of reviews per sentiment, read from the cube
+    order = ['positive', 'neutral', 'negative']
+    counts = rollup(cube, 'sentiment').set_index('sentiment')['reviews'].reindex(order, fill_value=0)
+    sns.set(style="whitegrid")          # Sets a clean background grid for the plot (optional aesthetic choice)
 
-# Create a new figure of size 8 inches wide and 6 inches tall
-plt.figure(figsize=(8, 6))
+    # Create a new figure of size 8 inches wide and 6 inches tall
+    plt.figure(figsize=(8, 6))
 
-# Plot a bar chart (countplot) using seaborn
-# - data: DataFrame to use
-# - x: the column to count values of 'label_sentiment'
-# - palette: color scheme (Set2 is a pastel color palette)
-# - order: sets the order of bars so it's always ['positive', 'neutral', 'negative']
-ax = sns.countplot(data=df_full, x='label_sentiment', palette='Set2',
-                   order=['positive', 'neutral', 'negative'])
+    # Plot a bar chart of the counts using seaborn
+    # - x / y: sentiment categories and their review counts
+    # - palette: color scheme (Set2 is a pastel color palette)
+    # - order: sets the order of bars so it's always ['positive', 'neutral', 'negative']
+    ax = sns.barplot(x=counts.index, y=counts.values.astype(float), palette='Set2', order=order)
+    error_bars(ax, count_interval(cube, 'sentiment'), order)  # Only drawn for a preview cube
 
-# Add value labels above each bar
-for p in ax.patches:                               # Loop through each bar in the chart
-    height = p.get_height()                        # Get the height of the current bar (i.e., its count)
-    ax.annotate(f'{height:,}',                     # Annotate with the count, comma-formatted
-                (p.get_x() + p.get_width() / 2., height),  # Position the label at center-top of the bar
-                ha='center', va='bottom', fontsize=11)     # Center align horizontally; place just above the bar
+    # Add value labels above each bar
+    for p in ax.patches:                               # Loop through each bar in the chart
+        height = p.get_height()                        # Get the height of the current bar (i.e., its count)
+        ax.annotate(f'{height:,}',                     # Annotate with the count, comma-formatted
+                    (p.get_x() + p.get_width() / 2., height),  # Position the label at center-top of the bar
+                    ha='center', va='bottom', fontsize=11)     # Center align horizontally; place just above the bar
 
-# Add a title to the plot
-plt.title('Sentiment Distribution Based on Review Text', fontsize=14)
+    # Add a title to the plot
+    plt.title('Sentiment Distribution Based on Review Text', fontsize=14)
 
-# Label the x-axis
-plt.xlabel('Label Sentiment')
+    # Label the x-axis
+    plt.xlabel('Label Sentiment')
 
-# Label the y-axis
-plt.ylabel('Number of Reviews')
+    # Label the y-axis
+    plt.ylabel('Number of Reviews')
 
-# Adjust layout to prevent overlap and auto-scale spacing
-plt.tight_layout()
+    # Adjust layout to prevent overlap and auto-scale spacing
+    plt.tight_layout()
 
-# Display the plot
-plt.show()
+    # Save the plot
+    plt.savefig(FIGURE_PATH, bbox_inches='tight', dpi=300)
+
+
+if __name__ == '__main__':
+    # Load the aggregate cube (built from the review dataset on first use)
+    cube = load_cube()
+    render(cube)
+
+    # Display the plot
+    plt.show()
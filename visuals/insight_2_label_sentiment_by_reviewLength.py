@@ -12,24 +12,26 @@
 import pandas as pd
 import matplotlib.pyplot as plt
 import seaborn as sns
+from review_data import SOURCE_PATH
+from review_cube import load_cube, rollup
 
-# Set the style
-sns.set(style="whitegrid")
-
-try:
-    # Load the dataset
-    df = pd.read_csv('/Users/shreeakojwar/Downloads/IIMN_Final /flipkart_reviews_with_sentiment.csv')
-    
-    # Create sentiment labels based on rating_sentiment
-    df['sentiment'] = df['rating_sentiment'].map({
-        0: 'negative',
-        1: 'neutral',
-        2: 'positive'
-    })
-    
-    # Create a grouped countplot
+# rating_label: star-rating sentiment (rating_sentiment as positive/neutral/negative)
+COLUMNS = ['review_type', 'rating_label']
+FIGURE_PATH = 'visual_images/Figure_2 Sentiment Distribution by Review length.png'
+SOURCE = 'cube'
+
+
+def render(cube):
+    """ Rating-based sentiment counts per review length. """
+    # Set the style
+    sns.set(style="whitegrid")
+
+    # Review counts per (review type, rating sentiment) from the cube
+    counts = rollup(cube, ['review_type', 'rating_label'])
+
+    # Create a grouped bar plot of the counts
     plt.figure(figsize=(10, 6))
-    ax = sns.countplot(data=df, x='review_type', hue='sentiment',
+    ax = sns.barplot(data=counts, x='review_type', y='reviews', hue='rating_label',
                     order=['short', 'medium', 'long'], 
                     hue_order=['positive', 'neutral', 'negative'],
                     palette='Set2')
@@ -48,12 +50,19 @@ try:
     plt.ylabel('Number of Reviews')
     plt.legend(title='Sentiment')
     plt.tight_layout()
-    plt.show()
 
-except FileNotFoundError:
-    print("Error: Could not find the CSV file at '/Users/shreeakojwar/Downloads/IIMN_Final /flipkart_reviews_with_sentiment.csv'")
-    print("Please check if the file exists and the path is correct.")
-except Exception as e:
-    print(f"An error occurred: {str(e)}")
-    print("Please check if the CSV file contains the required columns: 'review_type' and 'rating_sentiment'")
+    # Save the plot
+    plt.savefig(FIGURE_PATH, bbox_inches='tight', dpi=300)
+
 
+if __name__ == '__main__':
+    try:
+        cube = load_cube()
+        render(cube)
+        plt.show()
+    except FileNotFoundError:
+        print(f"Error: Could not find the CSV file at '{SOURCE_PATH}'")
+        print("Please check if the file exists and the path is correct.")
+    except Exception as e:
+        print(f"An error occurred: {str(e)}")
+        print("Please check if the CSV file contains the required columns: 'review_type' and 'rating_sentiment'")
@@ -15,79 +15,72 @@
 import matplotlib.pyplot as plt
 import seaborn as sns
 import pandas as pd
+from review_data import SOURCE_PATH
+from review_cube import load_cube, rollup
+from preview import count_interval, error_bars
 
-try:
-    # Load the dataset
-    df_full = pd.read_csv('flipkart_reviews_with_sentiment.csv')
-    print("Data loaded successfully.")
+# rating_label: sentiment from the star rating, label_sentiment: sentiment from the text,
+# sentiment_match: whether they agree
+COLUMNS = ['rating_label', 'label_sentiment', 'sentiment_match']
+FIGURE_PATH = 'visual_images/Figure_6_Sentiment_Mismatch_Patterns.png'
+SOURCE = 'cube'
 
-    # Check required columns
-    required_columns = {'Rate', 'sentiment_code'}
-    if not required_columns.issubset(df_full.columns):
-        raise Exception(f"The DataFrame must contain the following columns: {required_columns}")
-    
-    # Define function to map ratings to sentiment categories
-    def map_rating_to_sentiment(rating):
-        if rating <= 2:
-            return 'negative'
-        elif rating == 3:
-            return 'neutral'
-        else:
-            return 'positive'
-
-    # Map sentiment codes to labels for text sentiment
-    sentiment_map = {1: 'positive', 0: 'neutral', -1: 'negative'}
-    df_full['label_sentiment'] = df_full['sentiment_code'].map(sentiment_map)
-    
-    # Calculate rating sentiment
-    df_full['rating_sentiment'] = df_full['Rate'].apply(map_rating_to_sentiment)
-    
-    # Calculate sentiment match
-    df_full['sentiment_match'] = df_full['rating_sentiment'] == df_full['label_sentiment']
 
-# Filter only mismatched reviews
-    mismatch_df = df_full[~df_full['sentiment_match']]
-    print(f"\nFound {len(mismatch_df)} mismatched reviews.")
+def render(cube):
+    """ Rating -> text sentiment transitions among mismatched reviews. """
+    # Count combinations of rating_label → label_sentiment, then keep only the mismatched ones
+    patterns = rollup(cube, ['sentiment_match', 'rating_label', 'label_sentiment'], dropna=False)
+    mismatched = patterns[~patterns['sentiment_match']]
+    print(f"\nFound {mismatched['reviews'].sum()} mismatched reviews.")
 
-# Count combinations of rating_sentiment → label_sentiment
-pattern_counts = mismatch_df.groupby(['rating_sentiment', 'label_sentiment']).size().reset_index(name='count')
+    pattern_counts = (mismatched.dropna(subset=['rating_label', 'label_sentiment'])
+                      [['rating_label', 'label_sentiment', 'reviews']]
+                      .rename(columns={'reviews': 'count'}).reset_index(drop=True))
     print("\nMismatch patterns:")
     print(pattern_counts)
 
-# Plot grouped bar chart
+    # Plot grouped bar chart
     plt.figure(figsize=(12, 7))
-ax = sns.barplot(data=pattern_counts, x='rating_sentiment', y='count', hue='label_sentiment',
-                 order=['positive', 'neutral', 'negative'],
-                 hue_order=['positive', 'neutral', 'negative'],
-                 palette='Set2')
+    ax = sns.barplot(data=pattern_counts, x='rating_label', y='count', hue='label_sentiment',
+                     order=['positive', 'neutral', 'negative'],
+                     hue_order=['positive', 'neutral', 'negative'],
+                     palette='Set2')
+    # 95% confidence intervals when rendering a preview (sampled) cube
+    error_bars(ax, count_interval(cube, ['rating_label', 'label_sentiment']),
+               ['positive', 'neutral', 'negative'], ['positive', 'neutral', 'negative'])
 
-# Annotate bars
-for p in ax.patches:
-    height = p.get_height()
-    if height > 0:
+    # Annotate bars
+    for p in ax.patches:
+        height = p.get_height()
+        if height > 0:
             ax.annotate(f'{int(height):,}', 
-                    (p.get_x() + p.get_width() / 2., height), 
-                    ha='center', va='bottom', fontsize=10)
+                        (p.get_x() + p.get_width() / 2., height), 
+                        ha='center', va='bottom', fontsize=10)
 
-# Labels and legend
+    # Labels and legend
     plt.title('Sentiment Mismatch Patterns: Rating vs. Text Analysis', fontsize=14, pad=20)
     plt.xlabel('Rating-Based Sentiment')
-plt.ylabel('Number of Mismatched Reviews')
+    plt.ylabel('Number of Mismatched Reviews')
     plt.legend(title='Text-Based Sentiment', bbox_to_anchor=(1.05, 1))
     
     # Add grid for better readability
     plt.grid(axis='y', linestyle='--', alpha=0.7)
     
     # Adjust layout to prevent label cutoff
-plt.tight_layout()
+    plt.tight_layout()
     
     # Save the plot
-    plt.savefig('visual_images/Figure_6_Sentiment_Mismatch_Patterns.png', bbox_inches='tight', dpi=300)
+    plt.savefig(FIGURE_PATH, bbox_inches='tight', dpi=300)
     print("\nPlot saved as 'Figure_6_Sentiment_Mismatch_Patterns.png'")
-    
-plt.show()
 
-except FileNotFoundError:
-    print("Error: The data file could not be found. Please check if 'flipkart_reviews_with_sentiment.csv' exists in the current directory.")
-except Exception as e:
-    print(f"An error occurred: {str(e)}")
+
+if __name__ == '__main__':
+    try:
+        cube = load_cube()
+        print("Data loaded successfully.")
+        render(cube)
+        plt.show()
+    except FileNotFoundError:
+        print(f"Error: The data file could not be found. Please check if '{SOURCE_PATH}' exists in the current directory.")
+    except Exception as e:
+        print(f"An error occurred: {str(e)}")
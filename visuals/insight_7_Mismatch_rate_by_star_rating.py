@@ -14,69 +14,58 @@
 import pandas as pd
 import matplotlib.pyplot as plt
 import seaborn as sns
+from review_data import SOURCE_PATH
+from review_cube import load_cube, share
+from preview import error_bars, share_interval
 
-try:
-    # Load the dataset
-    df_full = pd.read_csv('flipkart_reviews_with_sentiment.csv')
-    print("Data loaded successfully.")
+# sentiment_match: whether rating sentiment and text sentiment agree
+COLUMNS = ['Rate', 'sentiment_match']
+FIGURE_PATH = 'visual_images/Figure_7_Mismatch_Rate_by_Star_Rating.png'
+SOURCE = 'cube'
 
-    # Check required columns
-    required_columns = {'Rate', 'sentiment_code'}
-    if not required_columns.issubset(df_full.columns):
-        raise Exception(f"The DataFrame must contain the following columns: {required_columns}")
-    
-    # Define function to map ratings to sentiment categories
-    def map_rating_to_sentiment(rating):
-        if rating <= 2:
-            return 'negative'
-        elif rating == 3:
-            return 'neutral'
-        else:
-            return 'positive'
 
-    # Map sentiment codes to labels for text sentiment
-    sentiment_map = {1: 'positive', 0: 'neutral', -1: 'negative'}
-    df_full['label_sentiment'] = df_full['sentiment_code'].map(sentiment_map)
-    
-    # Calculate rating sentiment
-    df_full['rating_sentiment'] = df_full['Rate'].apply(map_rating_to_sentiment)
-    
-    # Calculate sentiment match
-    df_full['sentiment_match'] = df_full['rating_sentiment'] == df_full['label_sentiment']
-
-# Step 1: Group by numeric star rating (Rate), calculate mismatch %
-mismatch_by_rating = df_full.groupby('Rate')['sentiment_match'].apply(lambda x: 100 * (~x).mean())
+def render(cube):
+    """ Mismatch rate per star rating. """
+    # Step 1: Group by numeric star rating (Rate), calculate mismatch %
+    mismatch_by_rating, _ = share(cube, 'Rate', 'sentiment_match')
+    mismatch_by_rating = mismatch_by_rating.rename('sentiment_match')
     print("\nMismatch rates by star rating:")
     print(mismatch_by_rating)
 
-# Step 2: Plot
+    # Step 2: Plot
     plt.figure(figsize=(10, 6))
-ax = sns.barplot(x=mismatch_by_rating.index, y=mismatch_by_rating.values, palette='coolwarm')
+    ax = sns.barplot(x=mismatch_by_rating.index, y=mismatch_by_rating.values, palette='coolwarm')
+    # 95% confidence intervals when rendering a preview (sampled) cube
+    error_bars(ax, share_interval(cube, 'Rate', 'sentiment_match'), list(mismatch_by_rating.index))
 
-# Annotate bars
-for i, val in enumerate(mismatch_by_rating.values):
-    ax.text(i, val + 0.5, f'{val:.1f}%', ha='center', fontsize=11)
+    # Annotate bars
+    for i, val in enumerate(mismatch_by_rating.values):
+        ax.text(i, val + 0.5, f'{val:.1f}%', ha='center', fontsize=11)
 
     # Labels and styling
     plt.title('Sentiment Mismatch Rate by Star Rating', fontsize=14, pad=20)
-plt.xlabel('Star Rating')
-plt.ylabel('Mismatch Rate (%)')
-plt.ylim(0, mismatch_by_rating.max() + 5)
+    plt.xlabel('Star Rating')
+    plt.ylabel('Mismatch Rate (%)')
+    plt.ylim(0, mismatch_by_rating.max() + 5)
     
     # Add grid for better readability
     plt.grid(axis='y', linestyle='--', alpha=0.7)
     
     # Adjust layout
-plt.tight_layout()
+    plt.tight_layout()
     
     # Save the plot
-    plt.savefig('visual_images/Figure_7_Mismatch_Rate_by_Star_Rating.png', bbox_inches='tight', dpi=300)
+    plt.savefig(FIGURE_PATH, bbox_inches='tight', dpi=300)
     print("\nPlot saved as 'Figure_7_Mismatch_Rate_by_Star_Rating.png'")
-    
-plt.show()
 
-except FileNotFoundError:
-    print("Error: The data file could not be found. Please check if 'flipkart_reviews_with_sentiment.csv' exists in the current directory.")
-except Exception as e:
-    print(f"An error occurred: {str(e)}")
 
+if __name__ == '__main__':
+    try:
+        cube = load_cube()
+        print("Data loaded successfully.")
+        render(cube)
+        plt.show()
+    except FileNotFoundError:
+        print(f"Error: The data file could not be found. Please check if '{SOURCE_PATH}' exists in the current directory.")
+    except Exception as e:
+        print(f"An error occurred: {str(e)}")
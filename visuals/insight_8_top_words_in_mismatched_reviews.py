@@ -12,70 +12,38 @@
 import pandas as pd
 import matplotlib.pyplot as plt
 import seaborn as sns
-from collections import Counter
-import re
+from review_data import SOURCE_PATH, load_reviews
+from term_counts import COLUMNS as TERM_COLUMNS, count_terms
 
-try:
-    # Load the dataset
-    df_full = pd.read_csv('flipkart_reviews_with_sentiment.csv')
-    print("Data loaded successfully.")
+# sentiment_match: whether rating sentiment and text sentiment agree;
+# Rate / rating_label / label_sentiment give the per-rating and per-pattern breakdowns
+COLUMNS = ['text', 'sentiment_match', 'Rate', 'rating_label', 'label_sentiment']
+FIGURE_PATH = 'visual_images/Figure_8_Top_Words_in_Mismatched_Reviews.png'
+# Only mismatched reviews are counted; render_all.py loads just those rows
+WHERE = {'sentiment_match': False}
 
-    # Check required columns
-    required_columns = {'Rate', 'sentiment_code', 'text'}
-    if not required_columns.issubset(df_full.columns):
-        raise Exception(f"The DataFrame must contain the following columns: {required_columns}")
-    
-    # Define function to map ratings to sentiment categories
-    def map_rating_to_sentiment(rating):
-        if rating <= 2:
-            return 'negative'
-        elif rating == 3:
-            return 'neutral'
-        else:
-            return 'positive'
-
-    # Map sentiment codes to labels for text sentiment
-    sentiment_map = {1: 'positive', 0: 'neutral', -1: 'negative'}
-    df_full['label_sentiment'] = df_full['sentiment_code'].map(sentiment_map)
-    
-    # Calculate rating sentiment
-    df_full['rating_sentiment'] = df_full['Rate'].apply(map_rating_to_sentiment)
-    
-    # Calculate sentiment match
-    df_full['sentiment_match'] = df_full['rating_sentiment'] == df_full['label_sentiment']
 
-# Step 1: Filter mismatched reviews
-    mismatched_texts = df_full[~df_full['sentiment_match']]['text'].dropna().astype(str)
-    print(f"\nAnalyzing {len(mismatched_texts)} mismatched reviews.")
+def render(df_full):
+    """ Most frequent words in mismatched reviews. """
+    # Step 1: Filter mismatched reviews
+    print(f"\nAnalyzing {int((~df_full['sentiment_match']).sum())} mismatched reviews.")
 
-# Step 2: Tokenize and clean text
-words = []
-for review in mismatched_texts:
-        # Remove punctuation, digits, and special characters, lowercase everything
-    review = re.sub(r'[^a-zA-Z\s]', '', review).lower()
-    words.extend(review.split())
-
-    # Enhanced stopwords list
-stopwords = set([
-    'the', 'this', 'and', 'was', 'with', 'for', 'not', 'that', 'have', 'you',
-        'but', 'its', 'are', 'very', 'too', 'had', 'been', 'from', 'they', 'all', 'my',
-        'can', 'will', 'just', 'any', 'has', 'more', 'now', 'than', 'then', 'who',
-        'what', 'when', 'why', 'how', 'all', 'any', 'both', 'each', 'few', 'more',
-        'most', 'other', 'some', 'such', 'get', 'got', 'getting', 'use', 'using'
-])
-
-    # Filter words and get counts
-filtered_words = [w for w in words if w not in stopwords and len(w) > 2]
-    word_counts = Counter(filtered_words)
+    # Step 2: Tokenize and count in chunks (per star rating and mismatch pattern in the same pass)
+    term_counts = count_terms(df_full.loc[~df_full['sentiment_match'], TERM_COLUMNS])
 
     # Get top 15 words
-    top_words = word_counts.most_common(15)
-words, counts = zip(*top_words)
+    top_words = term_counts.top(15)
+    words, counts = zip(*top_words)
 
     print("\nTop 15 most frequent words in mismatched reviews:")
     for word, count in zip(words, counts):
         print(f"{word}: {count}")
 
+    for dimension in ['Rate', 'pattern']:
+        print(f"\nTop 5 words per {dimension}:")
+        for key in term_counts.groups(dimension):
+            print(f"{key}: {', '.join(word for word, _ in term_counts.top(5, (dimension, key)))}")
+
     # Create the plot
     plt.figure(figsize=(12, 6))
     bars = plt.bar(range(len(words)), counts, color=sns.color_palette('viridis', len(words)))
@@ -99,17 +67,21 @@ words, counts = zip(*top_words)
     plt.grid(axis='y', linestyle='--', alpha=0.7)
     
     # Adjust layout to prevent label cutoff
-plt.tight_layout()
+    plt.tight_layout()
     
     # Save the plot
-    plt.savefig('visual_images/Figure_8_Top_Words_in_Mismatched_Reviews.png', 
+    plt.savefig(FIGURE_PATH, 
                 bbox_inches='tight', dpi=300)
     print("\nPlot saved as 'Figure_8_Top_Words_in_Mismatched_Reviews.png'")
-    
-plt.show()
 
-except FileNotFoundError:
-    print("Error: The data file could not be found. Please check if 'flipkart_reviews_with_sentiment.csv' exists in the current directory.")
-except Exception as e:
-    print(f"An error occurred: {str(e)}")
 
+if __name__ == '__main__':
+    try:
+        df_full = load_reviews(COLUMNS)
+        print("Data loaded successfully.")
+        render(df_full)
+        plt.show()
+    except FileNotFoundError:
+        print(f"Error: The data file could not be found. Please check if '{SOURCE_PATH}' exists in the current directory.")
+    except Exception as e:
+        print(f"An error occurred: {str(e)}")
@@ -15,24 +15,33 @@ import pandas as pd
 import matplotlib.pyplot as plt
 import seaborn as sns
 import numpy as np
+from review_cube import load_cube, rollup, weighted_median
 
-# Set the style
-sns.set(style="whitegrid")
+COLUMNS = ['review_type', 'Rate']
+FIGURE_PATH = 'visual_images/Figure_3 Rating Distribution by Review Length.png'
+SOURCE = 'cube'
+
+
+def render(cube):
+    """ Star rating counts per review length. """
+    # Set the style
+    sns.set(style="whitegrid")
+
+    # Review counts per (review type, Rate); missing Rates are kept as their own group
+    counts = rollup(cube, ['review_type', 'Rate'], dropna=False)
+    counts = counts[counts['review_type'].notna()]
 
-try:
-    # Load the dataset
-    df = pd.read_csv('flipkart_reviews_with_sentiment.csv')
-    
     # Clean the Rate column: fill NA with median and ensure values are between 1-5
-    df['Rate'] = pd.to_numeric(df['Rate'], errors='coerce')  # Convert to numeric, invalid values become NA
-    median_rate = df['Rate'].median()  # Get median for filling NA values
-    df['Rate'] = df['Rate'].fillna(median_rate)  # Fill NA with median
-    df['Rate'] = df['Rate'].clip(1, 5)  # Ensure values are between 1-5
-    df['Rate'] = df['Rate'].round().astype(int)  # Round and convert to integer
+    rated = counts['Rate'].notna()
+    median_rate = weighted_median(counts.loc[rated, 'Rate'], counts.loc[rated, 'reviews'])  # Median over all rated reviews
+    counts['Rate'] = counts['Rate'].fillna(median_rate)  # Fill NA with median
+    counts['Rate'] = counts['Rate'].clip(1, 5)  # Ensure values are between 1-5
+    counts['Rate'] = counts['Rate'].round().astype(int)  # Round and convert to integer
+    counts = counts.groupby(['review_type', 'Rate'], as_index=False)['reviews'].sum()
     
     # Plot: Count of ratings grouped by review type
     plt.figure(figsize=(12, 7))
-    ax = sns.countplot(data=df, x='review_type', hue='Rate',
+    ax = sns.barplot(data=counts, x='review_type', y='reviews', hue='Rate',
                       order=['short', 'medium', 'long'], 
                       hue_order=[1, 2, 3, 4, 5],
                       palette='RdYlGn')
@@ -51,11 +60,19 @@ try:
     plt.ylabel('Number of Reviews', labelpad=10)
     plt.legend(title='Star Rating', bbox_to_anchor=(1.05, 1), loc='upper left')
     plt.tight_layout()
-    plt.show()
-
-except FileNotFoundError:
-    print("Error: Could not find the CSV file. Please check if the file exists in the current directory:")
-    print("flipkart_reviews_with_sentiment.csv")
-except Exception as e:
-    print(f"An error occurred: {str(e)}")
-    print("Please check if the CSV file contains the required columns: 'review_type' and 'Rate'")
+
+    # Save the plot
+    plt.savefig(FIGURE_PATH, bbox_inches='tight', dpi=300)
+
+
+if __name__ == '__main__':
+    try:
+        cube = load_cube()
+        render(cube)
+        plt.show()
+    except FileNotFoundError:
+        print("Error: Could not find the CSV file. Please check if the file exists in the current directory:")
+        print("flipkart_reviews_with_sentiment.csv")
+    except Exception as e:
+        print(f"An error occurred: {str(e)}")
+        print("Please check if the CSV file contains the required columns: 'review_type' and 'Rate'")
@@ -14,42 +14,30 @@
 
 import pandas as pd
 import matplotlib.pyplot as plt
+from review_data import SOURCE_PATH
+from review_cube import load_cube, rollup
 
-try:
-    # Load the dataset
-    df_full = pd.read_csv('flipkart_reviews_with_sentiment.csv')
-    print("Data loaded successfully.")
+# rating_label: sentiment from the star rating; label_sentiment: sentiment from the text
+COLUMNS = ['rating_label', 'label_sentiment']
+FIGURE_PATH = 'visual_images/Figure_5_Sentiment_Comparison.png'
+SOURCE = 'cube'
 
-    # Check required columns
-    required_columns = {'Rate', 'sentiment_code'}
-    if not required_columns.issubset(df_full.columns):
-        raise Exception(f"The DataFrame must contain the following columns: {required_columns}")
-    
-    # Define function to map ratings to sentiment categories
-    def map_rating_to_sentiment(rating):
-        if rating <= 2:
-            return 'negative'
-        elif rating == 3:
-            return 'neutral'
-        else:
-            return 'positive'
 
-    # Map sentiment codes to labels for text sentiment
-    sentiment_map = {1: 'positive', 0: 'neutral', -1: 'negative'}
-    df_full['label_sentiment'] = df_full['sentiment_code'].map(sentiment_map)
-    
-    # Calculate rating sentiment
-    df_full['rating_sentiment'] = df_full['Rate'].apply(map_rating_to_sentiment)
+def render(cube):
+    """ Sentiment proportions from the text vs from the rating. """
+    # rating_label: sentiment from the star rating; label_sentiment: sentiment from the text
+    rating_totals = rollup(cube, 'rating_label').set_index('rating_label')['reviews']
+    label_totals = rollup(cube, 'label_sentiment').set_index('label_sentiment')['reviews']
 
     # Print value counts to verify
     print("\nRating Sentiment Distribution:")
-    print(df_full['rating_sentiment'].value_counts())
+    print(rating_totals.sort_values(ascending=False).rename('count'))
     print("\nText Sentiment Distribution:")
-    print(df_full['label_sentiment'].value_counts())
+    print(label_totals.sort_values(ascending=False).rename('count'))
     
     # Step 1: Get value counts with percentages
-    label_counts = df_full['label_sentiment'].value_counts(normalize=True).reindex(['positive', 'neutral', 'negative'])
-    rating_counts = df_full['rating_sentiment'].value_counts(normalize=True).reindex(['positive', 'neutral', 'negative'])
+    label_counts = (label_totals / label_totals.sum()).reindex(['positive', 'neutral', 'negative'])
+    rating_counts = (rating_totals / rating_totals.sum()).reindex(['positive', 'neutral', 'negative'])
 
     # Step 2: Combine into a single DataFrame
     stacked_df = pd.DataFrame({
@@ -71,15 +59,20 @@ try:
     plt.ylabel('Proportion of Reviews (%)')
     plt.legend(title='Sentiment Category', bbox_to_anchor=(1.05, 1), loc='upper left')
     plt.grid(axis='y', linestyle='--', alpha=0.7)
-plt.tight_layout()
+    plt.tight_layout()
     
     # Save the plot
-    plt.savefig('visual_images/Figure_5_Sentiment_Comparison.png', bbox_inches='tight', dpi=300)
+    plt.savefig(FIGURE_PATH, bbox_inches='tight', dpi=300)
     print("\nPlot saved as 'Figure_5_Sentiment_Comparison.png'")
-    
-plt.show()
 
-except FileNotFoundError:
-    print("Error: The data file could not be found. Please check if 'flipkart_reviews_with_sentiment.csv' exists in the current directory.")
-except Exception as e:
-    print(f"An error occurred: {str(e)}")
+
+if __name__ == '__main__':
+    try:
+        cube = load_cube()
+        print("Data loaded successfully.")
+        render(cube)
+        plt.show()
+    except FileNotFoundError:
+        print(f"Error: The data file could not be found. Please check if '{SOURCE_PATH}' exists in the current directory.")
+    except Exception as e:
+        print(f"An error occurred: {str(e)}")
@@ -13,46 +13,25 @@
 import pandas as pd
 import matplotlib.pyplot as plt
 import seaborn as sns
+from review_data import SOURCE_PATH
+from review_cube import load_cube, share
+from preview import error_bars, share_interval
 
-try:
-    # Load the dataset
-    df_full = pd.read_csv('flipkart_reviews_with_sentiment.csv')
-    print("Data loaded successfully.")
+# sentiment_match: whether rating sentiment and text sentiment agree;
+# category: first word of product_name, from the product dimension table (grouped by category_id)
+COLUMNS = ['category', 'sentiment_match']
+FIGURE_PATH = 'visual_images/Figure_9_Mismatch_Rate_by_Category.png'
+SOURCE = 'cube'
 
-    # Check required columns
-    required_columns = {'Rate', 'sentiment_code', 'product_name'}
-    if not required_columns.issubset(df_full.columns):
-        raise Exception(f"The DataFrame must contain the following columns: {required_columns}")
-    
-    # Define function to map ratings to sentiment categories
-    def map_rating_to_sentiment(rating):
-        if rating <= 2:
-            return 'negative'
-        elif rating == 3:
-            return 'neutral'
-        else:
-            return 'positive'
-
-    # Map sentiment codes to labels for text sentiment
-    sentiment_map = {1: 'positive', 0: 'neutral', -1: 'negative'}
-    df_full['label_sentiment'] = df_full['sentiment_code'].map(sentiment_map)
-    
-    # Calculate rating sentiment
-    df_full['rating_sentiment'] = df_full['Rate'].apply(map_rating_to_sentiment)
-    
-    # Calculate sentiment match
-    df_full['sentiment_match'] = df_full['rating_sentiment'] == df_full['label_sentiment']
 
-    # Extract product category from product_name (taking the first word as category)
-    df_full['category'] = df_full['product_name'].str.split().str[0]
-    
+def render(cube):
+    """ Mismatch rate per product category. """
     # Calculate mismatch rate by category
-    category_stats = df_full.groupby('category').agg({
-        'sentiment_match': ['count', lambda x: (~x).mean() * 100]
-    }).reset_index()
+    mismatch_rate, total_reviews = share(cube, 'category', 'sentiment_match')
+    category_stats = pd.DataFrame({'total_reviews': total_reviews, 'mismatch_rate': mismatch_rate})
     
     # Rename columns
-    category_stats.columns = ['category', 'total_reviews', 'mismatch_rate']
+    category_stats = category_stats.rename_axis('category').reset_index()
     
     # Filter categories with at least 100 reviews for meaningful analysis
     category_stats = category_stats[category_stats['total_reviews'] >= 100].sort_values('mismatch_rate', ascending=True)
@@ -65,6 +44,8 @@ try:
     bars = plt.bar(range(len(category_stats)), 
                    category_stats['mismatch_rate'],
                    color=sns.color_palette('viridis', len(category_stats)))
+    # 95% confidence intervals when rendering a preview (sampled) cube
+    error_bars(plt.gca(), share_interval(cube, 'category', 'sentiment_match'), list(category_stats['category']))
     
     # Customize the plot
     plt.title('Sentiment Mismatch Rate by Product Category', fontsize=14, pad=20)
@@ -93,7 +74,7 @@ try:
     plt.tight_layout(rect=[0, 0.05, 1, 1])  # Added more space at the bottom
     
     # Save the plot
-    plt.savefig('visual_images/Figure_9_Mismatch_Rate_by_Category.png', 
+    plt.savefig(FIGURE_PATH, 
                 bbox_inches='tight', dpi=300)
     print("\nPlot saved as 'Figure_9_Mismatch_Rate_by_Category.png'")
     
@@ -102,10 +83,15 @@ try:
     print(f"Average mismatch rate across categories: {category_stats['mismatch_rate'].mean():.1f}%")
     print(f"Category with highest mismatch rate: {category_stats.iloc[-1]['category']} ({category_stats.iloc[-1]['mismatch_rate']:.1f}%)")
     print(f"Category with lowest mismatch rate: {category_stats.iloc[0]['category']} ({category_stats.iloc[0]['mismatch_rate']:.1f}%)")
-    
-plt.show()
 
-except FileNotFoundError:
-    print("Error: The data file could not be found. Please check if 'flipkart_reviews_with_sentiment.csv' exists in the current directory.")
-except Exception as e:
-    print(f"An error occurred: {str(e)}")
+
+if __name__ == '__main__':
+    try:
+        cube = load_cube()
+        print("Data loaded successfully.")
+        render(cube)
+        plt.show()
+    except FileNotFoundError:
+        print(f"Error: The data file could not be found. Please check if '{SOURCE_PATH}' exists in the current directory.")
+    except Exception as e:
+        print(f"An error occurred: {str(e)}")
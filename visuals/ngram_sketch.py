@@ -0,0 +1,258 @@
+import os
+import re
+import math
+import time
+import argparse
+import multiprocessing
+import numpy as np
+import pandas as pd
+from review_data import SOURCE_PATH, load_reviews
+
+# Approximate heavy hitters for bigrams / trigrams of the review text.
+# An exact Counter of every n-gram grows with the corpus; here each (n, class) stream is
+# summarized by a count-min sketch plus a bounded set of candidate n-grams:
+#   - the sketch (depth rows x width int64 counters) over-estimates a count by at most
+#     e / width * N with probability 1 - exp(-depth), N being the n-grams added;
+#   - after every chunk the candidates are re-ranked by their sketch estimate together with
+#     the n-grams seen in that chunk, and only the best `capacity` are kept.
+# Texts are cleaned like the word counts (letters and whitespace, lowercase, no stopword
+# removal - "not worth it" needs its "not"). N-grams never span two reviews. Tokens are hashed
+# with pandas' stable hash, n-grams by combining their token hashes, so sketches built in
+# different chunks or processes with the same shape can be merged by adding them.
+
+NGRAM_SIZES = [2, 3]
+CLASSES = ['mismatched', 'matched']
+CHUNK_SIZE = 50_000
+MEMORY_MB = 16
+DEPTH = 5
+CAPACITY = 200
+_NON_LETTERS = re.compile(r'[^a-zA-Z\s|]')
+# Separates reviews in a batch; survives the cleaning regex and never occurs inside a cleaned review
+_BOUNDARY = '|'
+_PRIME = np.uint64(0x100000001B3)
+# Per-row hash parameters (odd multipliers), fixed so that sketches are mergeable everywhere
+_ROW_PARAMS = np.random.default_rng(20240601).integers(1, 2 ** 63, size=(16, 2), dtype=np.uint64) | np.uint64(1)
+
+# Reviews being sketched; set in the parent before the pool forks
+_ROWS = None
+
+
+def width_for(memory_mb, depth=DEPTH, sketches=len(NGRAM_SIZES) * len(CLASSES)):
+    """ Sketch width that fits `sketches` sketches of `depth` int64 rows into memory_mb. """
+    return max(int(memory_mb * 2 ** 20 / (sketches * depth * 8)), 16)
+
+
+def shape_for(epsilon, delta):
+    """ (width, depth) guaranteeing error <= epsilon * N with probability >= 1 - delta. """
+    return math.ceil(math.e / epsilon), math.ceil(math.log(1 / delta))
+
+
+class CountMinSketch:
+    """ depth x width counters; estimate() never under-counts. """
+
+    def __init__(self, width, depth=DEPTH):
+        if depth > len(_ROW_PARAMS):
+            raise ValueError(f"depth must be <= {len(_ROW_PARAMS)}")
+        self.width = width
+        self.depth = depth
+        self.table = np.zeros((depth, width), dtype=np.int64)
+        self.total = 0
+
+    def _indexes(self, hashes):
+        hashes = np.asarray(hashes, dtype=np.uint64)
+        for row, (a, b) in enumerate(_ROW_PARAMS[:self.depth]):
+            yield row, ((hashes * a + b) >> np.uint64(17)) % np.uint64(self.width)
+
+    def add(self, hashes, counts):
+        for row, idx in self._indexes(hashes):
+            self.table[row] += np.bincount(idx.astype(np.int64), weights=counts,
+                                           minlength=self.width).astype(np.int64)
+        self.total += int(np.sum(counts))
+
+    def estimate(self, hashes):
+        estimates = None
+        for row, idx in self._indexes(hashes):
+            values = self.table[row, idx.astype(np.int64)]
+            estimates = values if estimates is None else np.minimum(estimates, values)
+        return estimates
+
+    def error_bound(self):
+        """ Additive error that holds with probability 1 - exp(-depth). """
+        return math.e / self.width * self.total
+
+    def merge(self, other):
+        if (self.width, self.depth) != (other.width, other.depth):
+            raise ValueError("Only sketches of the same shape can be merged")
+        self.table += other.table
+        self.total += other.total
+        return self
+
+
+class HeavyHitters:
+    """ Count-min sketch plus the `capacity` n-grams with the highest estimates. """
+
+    def __init__(self, width, depth=DEPTH, capacity=CAPACITY):
+        self.sketch = CountMinSketch(width, depth)
+        self.capacity = capacity
+        self.candidates = {}  # n-gram hash -> n-gram text
+
+    def update(self, hashes, counts, texts):
+        """ Add one chunk: unique n-gram hashes, their counts in the chunk and their texts. """
+        self.sketch.add(hashes, counts)
+        pool = dict(zip(hashes.tolist(), texts))
+        pool.update(self.candidates)
+        self._keep_best(pool)
+        return self
+
+    def _keep_best(self, pool):
+        keys = np.fromiter(pool.keys(), dtype=np.uint64, count=len(pool))
+        if not len(keys):
+            return
+        estimates = self.sketch.estimate(keys)
+        best = np.argsort(-estimates, kind='stable')[:self.capacity]
+        self.candidates = {int(keys[i]): pool[int(keys[i])] for i in best}
+
+    def merge(self, other):
+        self.sketch.merge(other.sketch)
+        pool = dict(other.candidates)
+        pool.update(self.candidates)
+        self._keep_best(pool)
+        return self
+
+    def top(self, k=15):
+        """ [(n-gram, estimated count, error bound)] for the k highest estimates. """
+        if not self.candidates:
+            return []
+        keys = np.fromiter(self.candidates.keys(), dtype=np.uint64, count=len(self.candidates))
+        estimates = self.sketch.estimate(keys)
+        order = sorted(range(len(keys)), key=lambda i: (-estimates[i], self.candidates[int(keys[i])]))[:k]
+        bound = math.ceil(self.sketch.error_bound())
+        return [(self.candidates[int(keys[i])], int(estimates[i]), bound) for i in order]
+
+
+def tokenize_batch(texts):
+    """ Tokens of a batch of texts with a boundary token between reviews. """
+    joined = f' {_BOUNDARY} '.join(str(text).replace(_BOUNDARY, ' ') for text in texts)
+    return _NON_LETTERS.sub('', joined).lower().split()
+
+
+def ngram_counts(tokens, n):
+    """ Unique n-gram hashes of a token batch, their counts and their texts. """
+    if len(tokens) < n:
+        return np.zeros(0, dtype=np.uint64), np.zeros(0), []
+    codes, uniques = pd.factorize(np.asarray(tokens, dtype=object))
+    token_hashes = pd.util.hash_array(np.asarray(uniques, dtype=object))[codes]
+    boundary = np.isin(codes, np.flatnonzero(uniques == _BOUNDARY))
+    starts = len(tokens) - n + 1
+    valid = np.ones(starts, dtype=bool)
+    hashes = np.full(starts, n, dtype=np.uint64)
+    for j in range(n):
+        valid &= ~boundary[j:j + starts]
+        hashes = (hashes ^ token_hashes[j:j + starts]) * _PRIME
+    positions = np.flatnonzero(valid)
+    unique, first, counts = np.unique(hashes[positions], return_index=True, return_counts=True)
+    texts = [' '.join(tokens[p:p + n]) for p in positions[first]]
+    return unique, counts.astype(float), texts
+
+
+class NgramSummary:
+    """ Heavy hitters per (n, class), updated chunk by chunk and mergeable. """
+
+    def __init__(self, width, depth=DEPTH, capacity=CAPACITY, sizes=NGRAM_SIZES):
+        self.sizes = list(sizes)
+        self.hitters = {(n, c): HeavyHitters(width, depth, capacity) for n in self.sizes for c in CLASSES}
+        self.reviews = {c: 0 for c in CLASSES}
+
+    def update(self, rows):
+        """ Sketch one chunk (a frame with text and sentiment_match). """
+        matched = rows['sentiment_match'].to_numpy(dtype=bool)
+        texts = rows['text'].fillna('').astype(str).to_numpy()
+        for cls, mask in [('mismatched', ~matched), ('matched', matched)]:
+            self.reviews[cls] += int(mask.sum())
+            tokens = tokenize_batch(texts[mask])
+            for n in self.sizes:
+                self.hitters[(n, cls)].update(*ngram_counts(tokens, n))
+        return self
+
+    def merge(self, other):
+        for key, hitters in other.hitters.items():
+            self.hitters[key].merge(hitters)
+        for cls, count in other.reviews.items():
+            self.reviews[cls] += count
+        return self
+
+    def memory_bytes(self):
+        return sum(h.sketch.table.nbytes for h in self.hitters.values())
+
+    def table(self, k=15):
+        records = []
+        for (n, cls), hitters in self.hitters.items():
+            for rank, (ngram, estimate, bound) in enumerate(hitters.top(k), start=1):
+                records.append({'n': n, 'class': cls, 'rank': rank, 'ngram': ngram, 'estimate': estimate,
+                                'error_bound': bound, 'ngrams_seen': hitters.sketch.total})
+        return pd.DataFrame(records)
+
+
+def _sketch_range(args):
+    (start, stop), shape = args
+    return NgramSummary(*shape).update(_ROWS.iloc[start:stop])
+
+
+def sketch_ngrams(rows, width, depth=DEPTH, capacity=CAPACITY, sizes=NGRAM_SIZES,
+                  chunk_size=CHUNK_SIZE, jobs=None):
+    """ Sketch rows chunk by chunk, in worker processes when possible, and merge the partial summaries. """
+    global _ROWS
+    shape = (width, depth, capacity, sizes)
+    bounds = [(start, min(start + chunk_size, len(rows))) for start in range(0, len(rows), chunk_size)]
+    jobs = min(jobs or os.cpu_count() or 1, max(len(bounds), 1))
+    total = NgramSummary(*shape)
+    if jobs > 1 and not multiprocessing.current_process().daemon \
+            and 'fork' in multiprocessing.get_all_start_methods():
+        _ROWS = rows
+        try:
+            with multiprocessing.get_context('fork').Pool(jobs) as pool:
+                for partial in pool.imap_unordered(_sketch_range, [(b, shape) for b in bounds]):
+                    total.merge(partial)
+        finally:
+            _ROWS = None
+    else:
+        for start, stop in bounds:
+            total.update(rows.iloc[start:stop])
+    return total
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Approximate top bigrams/trigrams of mismatched vs matched reviews")
+    parser.add_argument('--source', default=SOURCE_PATH, help="review CSV written by sentiment_analysis.py")
+    parser.add_argument('--top', type=int, default=15, help="n-grams reported per (n, class)")
+    parser.add_argument('--memory-mb', type=float, default=MEMORY_MB, help="total memory of all sketches")
+    parser.add_argument('--epsilon', type=float, default=None,
+                        help="relative error bound (error <= epsilon * N); overrides --memory-mb")
+    parser.add_argument('--delta', type=float, default=0.01, help="failure probability used with --epsilon")
+    parser.add_argument('--capacity', type=int, default=CAPACITY, help="candidate n-grams kept per (n, class)")
+    parser.add_argument('--chunk-size', type=int, default=CHUNK_SIZE, help="reviews per chunk")
+    parser.add_argument('--jobs', type=int, default=None, help="worker processes (default: all CPUs)")
+    parser.add_argument('--output', default='outputs/mismatch_top_ngrams.csv', help="where to write the top n-grams")
+    args = parser.parse_args()
+
+    if args.epsilon:
+        width, depth = shape_for(args.epsilon, args.delta)
+    else:
+        width, depth = width_for(args.memory_mb), DEPTH
+    rows = load_reviews(['text', 'sentiment_match'], path=args.source)
+    start = time.perf_counter()
+    summary = sketch_ngrams(rows, width, depth, capacity=args.capacity, chunk_size=args.chunk_size, jobs=args.jobs)
+    elapsed = time.perf_counter() - start
+    print(f"Sketched {summary.reviews['mismatched']:,} mismatched and {summary.reviews['matched']:,} matched "
+          f"reviews in {elapsed:.2f}s ({width:,} x {depth} sketches, {summary.memory_bytes() / 2 ** 20:.1f} MB, "
+          f"error <= e/width * N with probability {1 - math.exp(-depth):.3f})")
+
+    table = summary.table(args.top)
+    os.makedirs(os.path.dirname(args.output) or '.', exist_ok=True)
+    table.to_csv(args.output, index=False)
+    for (n, cls), part in table.groupby(['n', 'class'], sort=False):
+        print(f"\nTop {len(part)} {n}-grams in {cls} reviews (N = {part['ngrams_seen'].iloc[0]:,}):")
+        for record in part.itertuples():
+            # The sketch only over-counts: the true count lies in [estimate - error_bound, estimate]
+            print(f"  {record.ngram:<30} ~{record.estimate:>10,}  (-{record.error_bound:,})")
+    print(f"\nTop n-grams saved to '{args.output}'")
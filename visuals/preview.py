@@ -0,0 +1,99 @@
+import os
+import sys
+import numpy as np
+from matplotlib.container import BarContainer
+from review_data import SOURCE_PATH, categories_of, load_products, load_reviews
+from review_cube import ADDITIVE, FLAGS, SOURCE_COLUMNS, build_cube
+# stratified.py lives in the repository root, next to convert_parquet_to_csv.py which also uses it
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from stratified import STRATA, ratio_estimates, stratified_sample, total_estimates
+
+# Preview mode of the insight figures (render_all.py --preview FRACTION).
+# The cube is built from a stratified sample of the reviews (see stratified.py) and its additive
+# measures are weighted up to the whole corpus, so every insight renders unchanged from estimated
+# counts, rates and means. The strata table travels with the cube in cube.attrs. The interval
+# helpers below return None for a full cube; in preview mode the insights pass their result to
+# error_bars(), which draws the 95% confidence intervals on the bars.
+
+PREVIEW_DIR = 'visual_images/preview'
+NOTE = "Preview: estimated from a stratified sample; error bars are 95% confidence intervals"
+
+
+def preview_cube(path=SOURCE_PATH, fraction=0.1, seed=0):
+    """ Cube of a stratified sample (fraction of every Rate x review_type stratum), weighted up. """
+    sample, strata = stratified_sample(load_reviews(SOURCE_COLUMNS, path=path), fraction, seed=seed)
+    cube = build_cube(sample, categories_of(load_products(path)))
+    weight = cube[STRATA].merge(strata, on=STRATA, how='left')['weight'].to_numpy()
+    for measure in ADDITIVE:
+        cube[measure] = cube[measure] * weight
+    cube.attrs['strata'] = strata
+    return cube
+
+
+def sample_rows(frame, fraction, seed=0):
+    """ Stratified sample of a review table (which needs the Rate and review_type columns). """
+    sample, _ = stratified_sample(frame, fraction, seed=seed)
+    return sample
+
+
+def _cells(cube):
+    """ The cube's cells with the FLAGS and their sample count (reviews before weighting). """
+    strata = cube.attrs['strata']
+    cells = cube.assign(**{flag: rule(cube) for flag, rule in FLAGS.items()})
+    weight = cells[STRATA].merge(strata, on=STRATA, how='left')['weight'].to_numpy()
+    cells['weight'] = weight
+    cells['count'] = np.rint(cells['reviews'] / weight)
+    return cells, strata
+
+
+def _by(by):
+    return [by] if isinstance(by, str) else list(by)
+
+
+def share_interval(cube, by, flag):
+    """ Half-widths (percentage points) of the rates of share(cube, by, flag), None for a full cube. """
+    if 'strata' not in cube.attrs:
+        return None
+    cells, strata = _cells(cube)
+    events = cells['count'] * ~cells[flag].astype(bool)
+    parts = cells.assign(sum=events, sumsq=events)
+    return 100 * ratio_estimates(parts, strata, _by(by))['half_width']
+
+
+def count_interval(cube, by):
+    """ Half-widths of the review counts of rollup(cube, by), None for a full cube. """
+    if 'strata' not in cube.attrs:
+        return None
+    cells, strata = _cells(cube)
+    parts = cells.assign(sum=cells['count'], sumsq=cells['count'])
+    return total_estimates(parts, strata, _by(by))['half_width']
+
+
+def mean_interval(cube, by):
+    """ Half-widths of the mean ratings (mean_rate) of rollup(cube, by), None for a full cube. """
+    if 'strata' not in cube.attrs:
+        return None
+    cells, strata = _cells(cube)
+    cells = cells[cells['Rate'].notna()]
+    parts = cells.assign(sum=cells['rate_sum'] / cells['weight'], sumsq=cells['rate_sumsq'] / cells['weight'])
+    return ratio_estimates(parts, strata, _by(by))['half_width']
+
+
+def error_bars(ax, half_widths, order, hue_order=None):
+    """
+    Confidence intervals on the bars of ax (a bar plot with the x categories in order, and with
+    hue_order if the bars are split by hue); half_widths is indexed by x (or by (x, hue)) value.
+    """
+    if half_widths is None:
+        return
+    containers = [c for c in ax.containers if isinstance(c, BarContainer)]
+    for level, container in enumerate(containers if hue_order else containers[:1]):
+        for bar in container:
+            center = bar.get_x() + bar.get_width() / 2
+            key = order[int(round(center))]
+            key = (key, hue_order[level]) if hue_order else key
+            half = half_widths.get(key, np.nan)
+            if np.isfinite(half) and bar.get_height() > 0:
+                ax.errorbar(center, bar.get_height(), yerr=half, fmt='none', ecolor='black', capsize=3,
+                            linewidth=1)
+    ax.figure.text(0.01, 0.005, NOTE, fontsize=8, color='dimgray', ha='left', va='bottom')
@@ -0,0 +1,218 @@
+import io
+import os
+import sys
+import time
+import argparse
+import warnings
+import importlib
+import contextlib
+import multiprocessing
+import matplotlib
+matplotlib.use('Agg')
+import matplotlib.pyplot as plt
+import pandas as pd
+import review_data
+from review_data import BACKENDS, SOURCE_PATH, load_reviews
+from review_cube import load_cube
+from preview import PREVIEW_DIR, preview_cube, sample_rows
+from figure_manifest import entry, input_hash, load_manifest, save_manifest, source_sha256, stale
+# instrumentation.py lives in the repository root, next to the pipeline scripts
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from instrumentation import step, add_steps
+
+# Renders every insight figure in one run.
+# Each insight module exposes COLUMNS, FIGURE_PATH and render(...). Insights with SOURCE = 'cube'
+# render from the aggregate cube (review_cube.py), loaded once; the others get the review table,
+# loaded once with the union of their columns (and not at all when none need rows). A fork-based
+# process pool then renders the figures in parallel; workers inherit both copy-on-write instead
+# of re-reading them. Each render gets
+# its own rcParams context (several insights call sns.set) and its printed output is captured.
+# Per-figure timings go to TIMINGS_PATH, and the next run schedules the slowest figures first.
+# Every clean render is recorded in the build manifest (figure_manifest.py); with --changed only
+# figures whose code or inputs changed since then are re-rendered. Loading and every figure are
+# recorded as steps of the run report (instrumentation.py). When every row-based insight declares
+# the same WHERE conditions (e.g. insight 8 only reads mismatched reviews) only those rows are
+# loaded; with --backend arrow the conditions are pushed into the scan.
+# --preview FRACTION renders from a stratified sample instead (preview.py): a weighted-up cube of
+# the sample and a sampled review table, with 95% confidence intervals as error bars. Preview
+# figures go to visual_images/preview/ and are never recorded in the manifest.
+
+INSIGHTS = [
+    'insight_1_sentiment_distribution',
+    'insight_2_label_sentiment_by_reviewLength',
+    'insights_3_rating_distribution_by_review_type',
+    'insight_4_sentiment_mismatch_across_review_types',
+    'insights_5_comparision_between_rating_sentiment_and_text_sentiment',
+    'insight_6_seniment_mismatch_pattern',
+    'insight_7_Mismatch_rate_by_star_rating',
+    'insight_8_top_words_in_mismatched_reviews',
+    'insights_9_mismatch_rate_by_product_category',
+    'insight_10_volume_of_reviews_by_sentiment_across_star_ratings',
+    'insight_11_Sentiment_match_rate_per_Star_rating',
+    'insight_12_sentiment_distribution_within_each_review_type',
+    'insight_13_sentiment_mismatch_proportion_with_review_types',
+    'insight_14_average_star_rating_within_each_text_sentiment_category',
+]
+TIMINGS_PATH = 'outputs/insight_render_timings.csv'
+
+# Shared review table and cube; set in the parent before the pool forks
+_FRAME = None
+_CUBE = None
+
+
+def _render(name):
+    """ Render one insight from the shared table; returns its timing record. """
+    module = importlib.import_module(name)
+    log = io.StringIO()
+    error = None
+    start = time.perf_counter()
+    cube = getattr(module, 'SOURCE', None) == 'cube'
+    rows = int(_CUBE['reviews'].sum()) if cube else len(_FRAME)
+    with step(f'figure:{name}', rows=rows) as record:
+        try:
+            with plt.rc_context(), contextlib.redirect_stdout(log), warnings.catch_warnings(record=True) as caught:
+                warnings.simplefilter('always')
+                if cube:
+                    module.render(_CUBE)
+                else:
+                    module.render(_FRAME[module.COLUMNS])
+            for w in caught:
+                log.write(f"{w.category.__name__}: {w.message}\n")
+        except Exception as e:
+            error = f"{type(e).__name__}: {e}"
+        finally:
+            plt.close('all')
+    return {'insight': name, 'figure': module.FIGURE_PATH, 'seconds': time.perf_counter() - start,
+            'pid': os.getpid(), 'error': error, 'log': log.getvalue(), 'step': record}
+
+
+def _schedule(names, timings_path=TIMINGS_PATH):
+    """ Slowest figures of the previous run first, so they don't end up as stragglers. """
+    if not os.path.exists(timings_path):
+        return list(names)
+    previous = pd.read_csv(timings_path).set_index('insight')['seconds']
+    return sorted(names, key=lambda name: -previous.get(name, float('inf')))
+
+
+def render_all(names=INSIGHTS, jobs=None, path=SOURCE_PATH, changed=False, preview=None, seed=0):
+    """
+    Load the cube and the union of the row-based insights' columns once and render them all
+    (only the out-of-date ones if changed; from a stratified sample of this fraction if preview).
+    Returns the load time and the timing records.
+    """
+    global _FRAME, _CUBE
+    modules = [importlib.import_module(name) for name in names]
+    start = time.perf_counter()
+    row_filters = [getattr(module, 'WHERE', None) for module in modules
+                   if getattr(module, 'SOURCE', None) != 'cube']
+    where = row_filters[0] if row_filters and all(f == row_filters[0] for f in row_filters) else None
+    with step('load') as load_record:
+        if any(getattr(module, 'SOURCE', None) == 'cube' for module in modules):
+            _CUBE = preview_cube(path, preview, seed=seed) if preview else load_cube(path=path)
+            print(f"Loaded the {'preview ' if preview else ''}review cube ({len(_CUBE):,} cells, {int(_CUBE['reviews'].sum()):,} reviews)")
+        source_hash = source_sha256(path)
+        figures = load_manifest()
+        if preview:
+            for module in modules:
+                module.FIGURE_PATH = os.path.join(PREVIEW_DIR, os.path.basename(module.FIGURE_PATH))
+        if changed:
+            modules, fresh = stale(modules, figures, source_hash, cube=_CUBE,
+                                   load_frame=lambda columns: load_reviews(columns, path=path, where=where))
+            print(f"{len(fresh)} figures up to date, {len(modules)} to re-render")
+            names = [module.__name__ for module in modules]
+        row_modules = [module for module in modules if getattr(module, 'SOURCE', None) != 'cube']
+        if row_modules:
+            columns = list(dict.fromkeys(column for module in row_modules for column in module.COLUMNS))
+            if preview:
+                # The strata columns are needed for sampling even if no insight reads them
+                _FRAME = sample_rows(load_reviews(list(dict.fromkeys(columns + ['Rate', 'review_type'])), path=path,
+                                                  where=where), preview, seed=seed)
+            else:
+                _FRAME = load_reviews(columns, path=path, where=where)
+            print(f"Loaded {len(_FRAME):,} reviews ({len(columns)} columns{f', where {where}' if where else ''})")
+        load_record['rows'] = len(_FRAME) if _FRAME is not None else (
+            int(_CUBE['reviews'].sum()) if _CUBE is not None else None)
+    load_s = time.perf_counter() - start
+    print(f"Loading took {load_s:.2f}s")
+
+    os.makedirs(PREVIEW_DIR if preview else 'visual_images', exist_ok=True)
+    order = _schedule(names)
+    jobs = min(jobs or os.cpu_count() or 1, len(order))
+    if jobs > 1 and 'fork' in multiprocessing.get_all_start_methods():
+        with multiprocessing.get_context('fork').Pool(jobs) as pool:
+            records = list(pool.imap_unordered(_render, order))
+    else:
+        records = [_render(name) for name in order]
+    add_steps([record.pop('step') for record in records])
+    if preview:
+        return load_s, sorted(records, key=lambda record: names.index(record['insight']))
+
+    # Record the inputs of every figure that rendered cleanly
+    for module, record in zip(modules, sorted(records, key=lambda record: names.index(record['insight']))):
+        if record['error'] is None:
+            figures[module.__name__] = entry(module, source_hash, input_hash(module, cube=_CUBE, frame=_FRAME))
+    save_manifest(figures)
+    return load_s, sorted(records, key=lambda record: names.index(record['insight']))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Render all insight figures in parallel from one shared table")
+    parser.add_argument('--only', nargs='+', metavar='INSIGHT',
+                        help="render only insights whose module name starts with one of these prefixes")
+    parser.add_argument('--jobs', type=int, default=None, help="worker processes (default: all CPUs, 1 = in-process)")
+    parser.add_argument('--source', default=SOURCE_PATH, help="review CSV written by sentiment_analysis.py")
+    parser.add_argument('--changed', action='store_true',
+                        help="re-render only figures whose code or inputs changed since the last build")
+    parser.add_argument('--verbose', action='store_true', help="print each insight's captured output")
+    parser.add_argument('--backend', choices=BACKENDS, default=review_data.BACKEND,
+                        help="engine that builds the review cache and the cube (see arrow_backend.py)")
+    parser.add_argument('--preview', type=float, default=None, metavar='FRACTION',
+                        help="render from a stratified sample of this fraction of the reviews, with confidence "
+                             "intervals, into visual_images/preview/")
+    parser.add_argument('--seed', type=int, default=0, help="seed of the --preview sample")
+    args = parser.parse_args()
+    if args.preview is not None and not 0 < args.preview <= 1:
+        parser.error("--preview takes a fraction in (0, 1]")
+    if args.preview and args.changed:
+        parser.error("--changed compares against the full renders; it can't be combined with --preview")
+    review_data.BACKEND = args.backend
+
+    names = INSIGHTS
+    if args.only:
+        names = [name for name in INSIGHTS if any(name.startswith(prefix) for prefix in args.only)]
+
+    start = time.perf_counter()
+    load_s, records = render_all(names, jobs=args.jobs, path=args.source, changed=args.changed,
+                                 preview=args.preview, seed=args.seed)
+    wall = time.perf_counter() - start
+    if not records:
+        print("\nAll figures are up to date.")
+        raise SystemExit(0)
+
+    print("\nPer-figure render times:")
+    for record in records:
+        status = 'ok' if record['error'] is None else f"FAILED ({record['error']})"
+        print(f"  - {record['insight']:<70} {record['seconds']:6.2f}s  {status}")
+        if args.verbose and record['log']:
+            print("    " + record['log'].strip().replace("\n", "\n    "))
+    total = sum(record['seconds'] for record in records)
+    print(f"\nRendered {len(records)} figures in {wall:.2f}s wall ({load_s:.2f}s loading, "
+          f"{total:.2f}s of rendering summed over workers)")
+    failed = [record['insight'] for record in records if record['error'] is not None]
+    if failed:
+        print(f"{len(failed)} figures FAILED: {', '.join(failed)}")
+
+    if args.preview:
+        # Preview timings would mislead the scheduling of full renders
+        raise SystemExit(1 if failed else 0)
+    timings = pd.DataFrame([{k: v for k, v in record.items() if k != 'log'} for record in records])
+    os.makedirs(os.path.dirname(TIMINGS_PATH), exist_ok=True)
+    if (args.only or args.changed) and os.path.exists(TIMINGS_PATH):
+        # Keep the timings of the insights that were not re-rendered
+        previous = pd.read_csv(TIMINGS_PATH)
+        timings = pd.concat([previous[~previous['insight'].isin(timings['insight'])], timings], ignore_index=True)
+    timings.to_csv(TIMINGS_PATH, index=False)
+    print(f"Timings saved to '{TIMINGS_PATH}'")
+    if failed:
+        # A non-zero exit keeps pipeline.py from recording the visuals stage as up to date
+        raise SystemExit(1)
@@ -0,0 +1,176 @@
+import os
+import json
+import time
+import argparse
+import numpy as np
+import pandas as pd
+import arrow_backend
+import review_data
+from review_data import (BACKENDS, SOURCE_PATH, _cache_paths, _write_json, build_cache, cache_is_fresh,
+                         categories_of, load_products, load_reviews)
+
+# Aggregate cube over the low-cardinality review dimensions.
+# One pass over the cached review table groups every row by
+#   Rate, rating_label, label_sentiment, sentiment, review_type, category
+# and stores, per non-empty cell, the review count plus sum / sum of squares / min / max of
+# Rate and the sum / sum of squares of review_length. Every measure is additive (or a min/max),
+# so cells can be rolled up to any subset of dimensions and cubes of separate partitions can be
+# merged. The insight scripts compute their tables from the cube, never from the rows.
+# Missing keys (e.g. an unparseable Rate) are kept as their own cells; rollup() drops them by
+# default, like a pandas groupby would. Categories are grouped by their integer category_id and
+# only the (small) cube is labelled with the category names. With the arrow backend the cube is
+# aggregated batch by batch from a scan of the cache (arrow_backend.build_cube), same result.
+
+DIMENSIONS = ['Rate', 'rating_label', 'label_sentiment', 'sentiment', 'review_type', 'category']
+MEASURES = ['reviews', 'rate_sum', 'rate_sumsq', 'rate_min', 'rate_max', 'length_sum', 'length_sumsq']
+ADDITIVE = ['reviews', 'rate_sum', 'rate_sumsq', 'length_sum', 'length_sumsq']
+SOURCE_COLUMNS = ['Rate', 'rating_label', 'label_sentiment', 'sentiment', 'review_type', 'category_id',
+                  'review_length']
+# Flags derived from the dimensions; rollup() accepts them as group keys
+FLAGS = {
+    'sentiment_match': lambda cube: cube['rating_label'] == cube['label_sentiment'],
+    'hybrid_match': lambda cube: cube['rating_label'] == cube['sentiment'],
+}
+
+
+def build_cube(df, category_names=None):
+    """
+    Cube of one review table: the columns in SOURCE_COLUMNS (category_id decoded with
+    category_names) or the same with a category column instead of category_id.
+    """
+    rate = pd.to_numeric(df['Rate'], errors='coerce')
+    length = pd.to_numeric(df['review_length'], errors='coerce')
+    by_id = 'category' not in df.columns
+    rows = df[DIMENSIONS[1:-1]].copy()
+    rows['category'] = df['category_id'] if by_id else df['category']
+    rows.insert(0, 'Rate', rate)
+    rows['rate_sq'] = rate ** 2
+    rows['length'] = length
+    rows['length_sq'] = length ** 2
+    cube = rows.groupby(DIMENSIONS, dropna=False, sort=True).agg(
+        reviews=('rate_sq', 'size'),
+        rate_sum=('Rate', 'sum'),
+        rate_sumsq=('rate_sq', 'sum'),
+        rate_min=('Rate', 'min'),
+        rate_max=('Rate', 'max'),
+        length_sum=('length', 'sum'),
+        length_sumsq=('length_sq', 'sum'),
+    ).reset_index()
+    if by_id:
+        ids = cube['category'].to_numpy()
+        names = np.asarray(category_names, dtype=object)
+        cube['category'] = np.where(ids >= 0, names[ids.clip(0)] if len(names) else None, None)
+    return cube[DIMENSIONS + MEASURES]
+
+
+def merge_cubes(*cubes):
+    """ Combine cubes of disjoint review partitions. """
+    combined = pd.concat([c for c in cubes if c is not None and len(c)], ignore_index=True)
+    if combined.empty:
+        return pd.DataFrame(columns=DIMENSIONS + MEASURES)
+    grouped = combined.groupby(DIMENSIONS, dropna=False, sort=True)
+    merged = grouped[ADDITIVE].sum()
+    merged['rate_min'] = grouped['rate_min'].min()
+    merged['rate_max'] = grouped['rate_max'].max()
+    return merged.reset_index()[DIMENSIONS + MEASURES]
+
+
+def rollup(cube, by, dropna=True):
+    """
+    Roll the cube up to the dimensions (or FLAGS) in by.
+    Returns one row per group with the summed measures plus rated (reviews with a Rate),
+    mean_rate and std_rate (ddof=1).
+    """
+    by = [by] if isinstance(by, str) else list(by)
+    cube = cube.assign(**{flag: FLAGS[flag](cube) for flag in by if flag in FLAGS})
+    grouped = cube.groupby(by, dropna=dropna, sort=True)
+    table = grouped[ADDITIVE].sum()
+    table['rate_min'] = grouped['rate_min'].min()
+    table['rate_max'] = grouped['rate_max'].max()
+    # Rate statistics only over the rows that have a Rate
+    rated = cube[cube['Rate'].notna()].groupby(by, dropna=dropna, sort=True)['reviews'].sum()
+    rated = rated.reindex(table.index, fill_value=0)
+    table['rated'] = rated
+    table['mean_rate'] = table['rate_sum'] / rated.where(rated > 0)
+    variance = (table['rate_sumsq'] - rated * table['mean_rate'] ** 2) / (rated - 1).where(rated > 1)
+    table['std_rate'] = np.sqrt(variance.clip(lower=0))
+    table = table.reset_index()
+    if 'Rate' in by and table['Rate'].notna().all() and (table['Rate'] % 1 == 0).all():
+        # Whole-star ratings read back as floats; keep them integer like the review table
+        table['Rate'] = table['Rate'].astype(np.int64)
+    return table
+
+
+def share(cube, by, flag):
+    """ Percentage of reviews per group of by where FLAGS[flag] is False (e.g. the mismatch rate). """
+    table = rollup(cube, [by, flag] if isinstance(by, str) else list(by) + [flag])
+    counts = table.pivot_table(index=by, columns=flag, values='reviews', aggfunc='sum', fill_value=0)
+    totals = counts.sum(axis=1)
+    return 100 * counts.get(False, 0) / totals, totals
+
+
+def weighted_median(values, weights):
+    """ Median of values repeated weights times (matches pandas' median on the rows). """
+    order = np.argsort(values)
+    values = np.asarray(values, dtype=float)[order]
+    cumulative = np.cumsum(np.asarray(weights)[order])
+    n = cumulative[-1]
+    lower = values[np.searchsorted(cumulative, (n + 1) // 2)]
+    upper = values[np.searchsorted(cumulative, n // 2 + 1)]
+    return (lower + upper) / 2
+
+
+def _cube_paths(path):
+    table_path, meta_path = _cache_paths(path)
+    stem = table_path[:-len('.arrow')]
+    return stem + '.cube.csv', stem + '.cube.json'
+
+
+def load_cube(path=SOURCE_PATH, refresh=False, backend=None):
+    """ The cube for a review CSV; rebuilt (in one pass over the cached table) when the source changed. """
+    backend = backend or review_data.BACKEND
+    cube_path, cube_meta_path = _cube_paths(path)
+    if not refresh and cache_is_fresh(path) and os.path.exists(cube_path) and os.path.exists(cube_meta_path):
+        _, meta_path = _cache_paths(path)
+        with open(meta_path) as f, open(cube_meta_path) as g:
+            if json.load(f).get('sha256') == json.load(g).get('sha256'):
+                return _read_cube(cube_path)
+
+    if backend == 'arrow':
+        if refresh or not cache_is_fresh(path):
+            build_cache(path, backend=backend)
+        cube = arrow_backend.build_cube(_cache_paths(path)[0], categories_of(load_products(path)), DIMENSIONS)
+        cube = pd.DataFrame(columns=DIMENSIONS + MEASURES) if cube is None else cube[DIMENSIONS + MEASURES]
+    else:
+        reviews = load_reviews(SOURCE_COLUMNS, path=path, refresh=refresh, backend=backend)
+        cube = build_cube(reviews, categories_of(load_products(path)))
+    tmp_path = cube_path + '.tmp'
+    cube.to_csv(tmp_path, index=False)
+    os.replace(tmp_path, cube_path)
+    _, meta_path = _cache_paths(path)
+    with open(meta_path) as f:
+        meta = json.load(f)
+    _write_json({'sha256': meta['sha256'], 'cells': len(cube), 'reviews': int(cube['reviews'].sum())},
+                cube_meta_path)
+    return _read_cube(cube_path)
+
+
+def _read_cube(cube_path):
+    # Only empty fields are missing (missing keys are written as ''): a category such as "NA" or
+    # "None" must stay a string
+    return pd.read_csv(cube_path, keep_default_na=False, na_values=[''],
+                       dtype={'rating_label': object, 'label_sentiment': object, 'sentiment': object,
+                              'review_type': object, 'category': object})
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Build the review aggregate cube used by the insight scripts")
+    parser.add_argument('--source', default=SOURCE_PATH, help="review CSV written by sentiment_analysis.py")
+    parser.add_argument('--refresh', action='store_true', help="rebuild even if the cube is up to date")
+    parser.add_argument('--backend', choices=BACKENDS, default=review_data.BACKEND, help="engine that aggregates the cube")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    cube = load_cube(args.source, refresh=args.refresh, backend=args.backend)
+    print(f"Cube: {len(cube):,} cells covering {int(cube['reviews'].sum()):,} reviews "
+          f"({time.perf_counter() - start:.2f}s); stored in '{_cube_paths(args.source)[0]}'")
@@ -0,0 +1,296 @@
+import os
+import json
+import time
+import hashlib
+import argparse
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.feather as feather
+
+# Shared data access for the insight scripts in visuals/.
+# The review CSV is parsed once (only the columns the insights use), the derived sentiment
+# columns are computed vectorized, and the result is cached as an uncompressed Arrow/Feather
+# file under .cache/visuals/. Insight scripts then memory-map only the columns they need.
+# The cache is keyed on the source file's size and mtime; if those change but the content
+# hash is the same (e.g. the file was copied or touched) the cache is reused.
+#
+# Derived columns:
+#   rating_label    - Rate as negative (<= 2), neutral (3) or positive (>= 4)
+#   label_sentiment - sentiment_code (text model prediction) as negative/neutral/positive
+#   sentiment       - labels (hybrid rating + TextBlob label) as negative/neutral/positive
+#   sentiment_match - rating_label == label_sentiment
+#   hybrid_match    - rating_label == sentiment
+# sentiment_code, labels and rating_sentiment all use the encoding written by
+# sentiment_analysis.py: 0 = negative, 1 = neutral, 2 = positive.
+#
+# Products are normalized at ingest: every distinct product_name gets an int32 product_id in a
+# small product dimension table (also cached) together with its category (first word of the
+# name) as an int32 category_id and a price bucket. The review table only carries product_id
+# and category_id (-1 = missing); product_name, category and price_bucket requested from
+# load_reviews() are decoded from the dimension table by integer indexing.
+#
+# BACKEND (env REVIEW_BACKEND, or --backend) picks the engine that builds the cache and the
+# cube: 'pandas' or 'arrow' (streaming pyarrow, see arrow_backend.py). Both write the same
+# files. load_reviews(where={...}) only returns the rows matching the conditions; the arrow
+# backend pushes them into the scan instead of loading every row first.
+
+SOURCE_PATH = 'flipkart_reviews_with_sentiment.csv'
+CACHE_DIR = '.cache/visuals'
+CACHE_VERSION = 2
+SOURCE_COLUMNS = ['product_name', 'product_price', 'Rate', 'text', 'review_length', 'review_type',
+                  'rating_sentiment', 'sentiment_code', 'labels']
+DERIVED_COLUMNS = ['rating_label', 'label_sentiment', 'sentiment', 'sentiment_match',
+                   'hybrid_match', 'product_id', 'category_id']
+# Columns of the review table itself; product attributes live in the product table
+STORED_COLUMNS = ['Rate', 'text', 'review_length', 'review_type', 'rating_sentiment', 'sentiment_code',
+                  'labels'] + DERIVED_COLUMNS
+PRODUCT_ATTRIBUTES = ['product_name', 'category', 'price_bucket']
+PRICE_EDGES = [0, 500, 1000, 2000, 5000, 10000, 20000, np.inf]
+PRICE_BUCKETS = ['<500', '500-1k', '1k-2k', '2k-5k', '5k-10k', '10k-20k', '20k+']
+SENTIMENT_NAMES = np.array(['negative', 'neutral', 'positive'], dtype=object)
+BACKENDS = ['pandas', 'arrow']
+BACKEND = os.environ.get('REVIEW_BACKEND', 'pandas')
+
+
+def rating_to_sentiment(rate):
+    """ Vectorized Rate -> negative/neutral/positive (same rule as the insight scripts). """
+    rate = np.asarray(rate, dtype=float)
+    return np.where(rate <= 2, 'negative', np.where(rate == 3, 'neutral', 'positive')).astype(object)
+
+
+def code_to_sentiment(codes):
+    """ Vectorized 0/1/2 sentiment code -> name; anything else becomes None. """
+    codes = pd.to_numeric(pd.Series(codes), errors='coerce').to_numpy(dtype=float)
+    valid = np.isin(codes, [0, 1, 2])
+    names = np.full(len(codes), None, dtype=object)
+    names[valid] = SENTIMENT_NAMES[codes[valid].astype(np.int64)]
+    return names
+
+
+def add_derived_columns(df):
+    """ Add the derived sentiment/category columns to a frame of source columns. """
+    df['Rate'] = pd.to_numeric(df['Rate'], errors='coerce')
+    df['rating_label'] = rating_to_sentiment(df['Rate'])
+    df['label_sentiment'] = code_to_sentiment(df['sentiment_code'])
+    df['sentiment'] = code_to_sentiment(df['labels'])
+    df['sentiment_match'] = df['rating_label'].to_numpy() == df['label_sentiment'].to_numpy()
+    df['hybrid_match'] = df['rating_label'].to_numpy() == df['sentiment'].to_numpy()
+    return df
+
+
+def parse_prices(prices):
+    """ Numeric prices from values like 1299, '1299' or '₹1,299' (NaN when there is no number). """
+    codes, uniques = pd.factorize(pd.Series(prices), use_na_sentinel=True)
+    if not len(uniques):
+        return np.full(len(codes), np.nan)
+    parsed = pd.to_numeric(pd.Series(uniques, dtype=object).astype(str)
+                           .str.replace(r'[^0-9.]', '', regex=True), errors='coerce').to_numpy()
+    return np.where(codes >= 0, parsed[codes.clip(0)], np.nan)
+
+
+def build_products(names, prices=None):
+    """
+    Product dimension for a column of product names.
+    Returns the int32 product_id of every row (-1 if missing) and the product table
+    (product_id, product_name, category_id, category, price, price_bucket).
+    """
+    product_ids, products = pd.factorize(pd.Series(names), use_na_sentinel=True)
+    product_ids = product_ids.astype(np.int32)
+    # Category and price work per distinct product, not per review
+    categories = pd.Series(products, dtype=object).str.split(n=1).str[0]
+    category_ids, _ = pd.factorize(categories, sort=True, use_na_sentinel=True)
+    price = np.full(len(products), np.nan)
+    if prices is not None:
+        rows = pd.DataFrame({'product_id': product_ids, 'price': parse_prices(prices)})
+        medians = rows[rows['product_id'] >= 0].groupby('product_id')['price'].median()
+        price[medians.index.to_numpy()] = medians.to_numpy()
+    bucket = pd.cut(price, PRICE_EDGES, labels=PRICE_BUCKETS, right=False)
+    table = pd.DataFrame({
+        'product_id': np.arange(len(products), dtype=np.int32),
+        'product_name': pd.Series(products, dtype=object),
+        'category_id': category_ids.astype(np.int32),
+        'category': categories,
+        'price': price,
+        'price_bucket': pd.Series(bucket, dtype=object),
+    })
+    return product_ids, table
+
+
+def categories_of(products):
+    """ Category names indexed by category_id. """
+    pairs = products[products['category_id'] >= 0].drop_duplicates('category_id').sort_values('category_id')
+    return pairs['category'].to_numpy(dtype=object)
+
+
+def _cache_paths(path):
+    key = hashlib.sha1(os.path.abspath(path).encode()).hexdigest()[:12]
+    stem = os.path.join(CACHE_DIR, f"{os.path.splitext(os.path.basename(path))[0]}-{key}")
+    return stem + '.arrow', stem + '.json'
+
+
+def _products_path(path):
+    table_path, _ = _cache_paths(path)
+    return table_path[:-len('.arrow')] + '.products.arrow'
+
+
+def _file_hash(path, chunk_size=1 << 20):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _source_stamp(path):
+    stat = os.stat(path)
+    return {'source': os.path.abspath(path), 'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns,
+            'version': CACHE_VERSION}
+
+
+def cache_is_fresh(path=SOURCE_PATH):
+    """ True if the cached table for path matches the current source file. """
+    table_path, meta_path = _cache_paths(path)
+    if not (os.path.exists(table_path) and os.path.exists(meta_path) and os.path.exists(_products_path(path))):
+        return False
+    with open(meta_path) as f:
+        meta = json.load(f)
+    stamp = _source_stamp(path)
+    if meta.get('version') != CACHE_VERSION or meta.get('size') != stamp['size']:
+        return False
+    if meta.get('mtime_ns') == stamp['mtime_ns']:
+        return True
+    # Same size, new mtime: fall back to the content hash
+    if meta.get('sha256') != _file_hash(path):
+        return False
+    meta['mtime_ns'] = stamp['mtime_ns']
+    _write_json(meta, meta_path)
+    return True
+
+
+def _write_json(obj, path):
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump(obj, f, indent=2)
+    os.replace(tmp_path, path)
+
+
+def build_cache(path=SOURCE_PATH, backend=None):
+    """ Parse the CSV once, add derived columns and write the memory-mappable cache. """
+    if (backend or BACKEND) == 'arrow':
+        return _build_cache_arrow(path)
+    df = pd.read_csv(path, usecols=lambda c: c in SOURCE_COLUMNS)
+    missing = set(SOURCE_COLUMNS) - set(df.columns)
+    for column in missing:
+        df[column] = np.nan
+    df = add_derived_columns(df[SOURCE_COLUMNS])
+    product_ids, products = build_products(df['product_name'], df['product_price'])
+    df['product_id'] = product_ids
+    category_ids = products['category_id'].to_numpy()
+    df['category_id'] = np.where(product_ids >= 0, category_ids[product_ids.clip(0)], -1).astype(np.int32)
+
+    table_path, meta_path = _cache_paths(path)
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    # Uncompressed so that reads can memory-map the column buffers directly
+    for frame, target in [(products, _products_path(path)), (df[STORED_COLUMNS], table_path)]:
+        tmp_path = target + '.tmp'
+        feather.write_feather(pa.Table.from_pandas(frame, preserve_index=False), tmp_path,
+                              compression='uncompressed')
+        os.replace(tmp_path, target)
+    meta = _source_stamp(path)
+    meta.update({'sha256': _file_hash(path), 'rows': len(df), 'products': len(products),
+                 'missing_columns': sorted(missing)})
+    _write_json(meta, meta_path)
+    return table_path
+
+
+def _build_cache_arrow(path):
+    import arrow_backend  # imported here: arrow_backend itself imports this module
+    table_path, meta_path = _cache_paths(path)
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    try:
+        rows, products, missing = arrow_backend.build_cache(path, table_path)
+    except pa.ArrowInvalid as e:
+        # e.g. a column whose type changes after the first block; the pandas reader copes
+        print(f"Arrow ingest failed ({e}), building the cache with pandas")
+        return build_cache(path, backend='pandas')
+    tmp_path = _products_path(path) + '.tmp'
+    feather.write_feather(pa.Table.from_pandas(products, preserve_index=False), tmp_path,
+                          compression='uncompressed')
+    os.replace(tmp_path, _products_path(path))
+    meta = _source_stamp(path)
+    meta.update({'sha256': _file_hash(path), 'rows': rows, 'products': len(products),
+                 'missing_columns': missing})
+    _write_json(meta, meta_path)
+    return table_path
+
+
+def _mask(df, where):
+    mask = np.ones(len(df), dtype=bool)
+    for column, value in where.items():
+        mask &= (df[column] == value).to_numpy()
+    return mask
+
+
+def load_reviews(columns=None, path=SOURCE_PATH, refresh=False, where=None, backend=None):
+    """
+    Review table with the requested columns (all of them if columns is None): the stored
+    review columns plus product_name / category / price_bucket decoded from the product table.
+    where ({column: value}) keeps only the matching rows. Builds or refreshes the cache when
+    the source CSV changed.
+    """
+    if not os.path.exists(path):
+        raise FileNotFoundError(f"Review data not found: '{path}'")
+    backend = backend or BACKEND
+    if refresh or not cache_is_fresh(path):
+        build_cache(path, backend=backend)
+    table_path, _ = _cache_paths(path)
+    if columns is None:
+        columns = STORED_COLUMNS + PRODUCT_ATTRIBUTES
+    columns = list(dict.fromkeys(columns))
+    unknown = set(columns) - set(STORED_COLUMNS) - set(PRODUCT_ATTRIBUTES)
+    if unknown:
+        raise KeyError(f"Unknown review columns: {sorted(unknown)}")
+    attributes = [column for column in columns if column in PRODUCT_ATTRIBUTES]
+    stored = [column for column in columns if column in STORED_COLUMNS]
+    read = stored + (['product_id'] if attributes and 'product_id' not in stored else [])
+    if where and set(where) - set(STORED_COLUMNS):
+        raise KeyError(f"Only review columns can be filtered on: {sorted(set(where) - set(STORED_COLUMNS))}")
+    if backend == 'arrow':
+        import arrow_backend  # imported here: arrow_backend itself imports this module
+        df = arrow_backend.scan(table_path, read, where).to_pandas()
+    else:
+        conditions = [column for column in (where or {}) if column not in read]
+        df = feather.read_table(table_path, columns=read + conditions, memory_map=True).to_pandas()
+        if where:
+            df = df[_mask(df, where)].reset_index(drop=True)
+    if attributes:
+        ids = df['product_id'].to_numpy()
+        products = load_products(path)
+        for column in attributes:
+            values = products[column].to_numpy(dtype=object)
+            df[column] = np.where(ids >= 0, values[ids.clip(0)] if len(values) else None, None)
+    return df[columns]
+
+
+def load_products(path=SOURCE_PATH):
+    """ The product dimension table of the review cache for path. """
+    if not cache_is_fresh(path):
+        build_cache(path)
+    return feather.read_table(_products_path(path), memory_map=True).to_pandas()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Build or inspect the cached review table used by visuals/")
+    parser.add_argument('--source', default=SOURCE_PATH, help="review CSV written by sentiment_analysis.py")
+    parser.add_argument('--refresh', action='store_true', help="rebuild the cache even if it is fresh")
+    parser.add_argument('--backend', choices=BACKENDS, default=BACKEND, help="engine that builds the cache")
+    args = parser.parse_args()
+    BACKEND = args.backend
+
+    start = time.perf_counter()
+    df = load_reviews(path=args.source, refresh=args.refresh)
+    print(f"Loaded {len(df):,} reviews with {len(df.columns)} columns in {time.perf_counter() - start:.3f}s")
+    start = time.perf_counter()
+    load_reviews(['Rate', 'label_sentiment', 'sentiment_match'], path=args.source)
+    print(f"Cached load of 3 columns: {time.perf_counter() - start:.3f}s")
@@ -0,0 +1,217 @@
+import os
+import json
+import time
+import argparse
+import numpy as np
+import pandas as pd
+from review_data import SOURCE_PATH, _cache_paths, cache_is_fresh, load_products, load_reviews
+
+# Top-k / threshold queries over suspicious products.
+# The review table is aggregated once into a per-product count tensor
+#   counts[product_id, Rate - 1, text sentiment code]   (5 whole-star ratings x 3 sentiment codes)
+# cached next to the review cube (.suspicious.npz, rebuilt when the source changes). A metric
+# picks the reviews it counts (support) and the ones among them it flags (events) from that
+# tensor, e.g.
+#   mismatch          every review; flagged when the text sentiment (sentiment_code) differs
+#                     from the rating sentiment (<= 2 negative, 3 neutral, >= 4 positive)
+#   5_star_negative   5-star reviews; flagged when the text reads negative
+# Per metric the products are stored as columnar arrays (product, support, events, rate and the
+# Wilson lower bound of the rate) sorted by support, so "at least N reviews" is a binary search
+# for the start of a suffix, and the top k of that suffix is an argpartition (heap-style
+# selection) instead of a groupby over the reviews:
+#   index.top('5_star_negative', k=10, min_support=100)
+#   index.threshold('5_star_negative', 0.2, min_support=100)   # > 20% of the 5-star reviews
+# Ranking by the Wilson lower bound keeps products with a handful of reviews (and a rate of
+# 0% or 100%) from topping the list.
+
+RATES = [1, 2, 3, 4, 5]
+NAMES = ['negative', 'neutral', 'positive']
+# Rating sentiment code of each Rate (the rule of sentiment_analysis.rating_sentiment)
+RATING_CODES = np.array([0, 0, 1, 2, 2])
+# Two-sided 95% normal quantile (as in stratified.py)
+Z = 1.959964
+# name: (ratings counted, text sentiment flagged); None flags a text that disagrees with the rating
+METRICS = {
+    'mismatch': (RATES, None),
+    '5_star_negative': ([5], 'negative'),
+    '1_star_positive': ([1], 'positive'),
+    'positive_rating_negative_text': ([4, 5], 'negative'),
+    'negative_rating_positive_text': ([1, 2], 'positive'),
+}
+COLUMNS = ['product', 'support', 'events', 'rate', 'wilson']
+
+
+def wilson_lower_bound(events, support, z=Z):
+    """ Lower bound of the Wilson score interval of events / support (NaN without support). """
+    events = np.asarray(events, dtype=float)
+    n = np.asarray(support, dtype=float)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        p = events / n
+        center = p + z ** 2 / (2 * n)
+        margin = z * np.sqrt(p * (1 - p) / n + z ** 2 / (4 * n ** 2))
+        return np.where(n > 0, (center - margin) / (1 + z ** 2 / n), np.nan)
+
+
+def product_counts(product_ids, rates, codes, n_products):
+    """ counts[product, Rate - 1, code] of the reviews with a product, a whole-star Rate and a 0/1/2 code. """
+    rates = np.asarray(rates, dtype=float)
+    codes = pd.to_numeric(pd.Series(codes), errors='coerce').to_numpy(dtype=float)
+    valid = (np.asarray(product_ids) >= 0) & np.isin(rates, RATES) & np.isin(codes, [0, 1, 2])
+    cells = (np.asarray(product_ids)[valid].astype(np.int64) * len(RATES) + rates[valid].astype(np.int64) - 1) \
+        * len(NAMES) + codes[valid].astype(np.int64)
+    counts = np.bincount(cells, minlength=n_products * len(RATES) * len(NAMES))
+    return counts.reshape(n_products, len(RATES), len(NAMES))
+
+
+class SuspiciousIndex:
+    """ Per-product counts with a support-sorted columnar view per metric. """
+
+    def __init__(self, products, counts):
+        self.products = np.asarray(products, dtype=object)
+        self.counts = np.asarray(counts, dtype=np.int64)
+        self._columns = {}
+
+    def columns(self, metric):
+        """ The metric's columns (COLUMNS), sorted by support; metric is a METRICS name or a (rates, text) pair. """
+        key = metric if isinstance(metric, str) else (tuple(metric[0]), metric[1])
+        if key not in self._columns:
+            if isinstance(metric, str) and metric not in METRICS:
+                raise KeyError(f"Unknown metric {metric!r}, expected one of {list(METRICS)}")
+            rates, text = METRICS[metric] if isinstance(metric, str) else metric
+            rows = np.asarray(rates) - 1
+            selected = self.counts[:, rows, :]
+            support = selected.sum(axis=(1, 2))
+            if text is None:
+                flagged = np.arange(len(NAMES))[None, :] != RATING_CODES[rows][:, None]
+                events = (selected * flagged[None]).sum(axis=(1, 2))
+            else:
+                events = selected[:, :, NAMES.index(text)].sum(axis=1)
+            order = np.argsort(support, kind='stable')
+            support, events = support[order], events[order]
+            with np.errstate(invalid='ignore', divide='ignore'):
+                rate = np.where(support > 0, events / support, np.nan)
+            self._columns[key] = {'product': order.astype(np.int32), 'support': support, 'events': events,
+                                  'rate': rate, 'wilson': wilson_lower_bound(events, support)}
+        return self._columns[key]
+
+    def _start(self, columns, min_support):
+        # First position with at least min_support reviews (and at least one)
+        return int(np.searchsorted(columns['support'], max(min_support, 1), side='left'))
+
+    def top_positions(self, metric, k=10, min_support=1, by='wilson'):
+        """ Positions (in columns(metric)) of the k products with the highest `by` among those with min_support reviews. """
+        columns = self.columns(metric)
+        start = self._start(columns, min_support)
+        score = columns[by][start:]
+        if k <= 0:
+            return np.arange(0)
+        if k < len(score):
+            candidates = np.argpartition(-score, k - 1)[:k]
+        else:
+            candidates = np.arange(len(score))
+        # Highest score first, then more support
+        candidates = candidates[np.lexsort((-columns['support'][start:][candidates], -score[candidates]))]
+        return start + candidates
+
+    def threshold_positions(self, metric, min_rate, min_support=1, by='rate'):
+        """ Positions of the products with `by` above min_rate among those with min_support reviews, highest first. """
+        columns = self.columns(metric)
+        start = self._start(columns, min_support)
+        score = columns[by][start:]
+        hits = np.flatnonzero(score > min_rate)
+        hits = hits[np.lexsort((-columns['support'][start:][hits], -score[hits]))]
+        return start + hits
+
+    def frame(self, metric, positions):
+        """ Rows of columns(metric) at positions, with product names. """
+        columns = self.columns(metric)
+        table = pd.DataFrame({column: columns[column][positions] for column in COLUMNS[1:]})
+        table.insert(0, 'product_name', self.products[columns['product'][positions]])
+        return table
+
+    def top(self, metric, k=10, min_support=1, by='wilson'):
+        """ The k products with the highest Wilson lower bound (or rate) of metric with at least min_support reviews. """
+        return self.frame(metric, self.top_positions(metric, k, min_support, by))
+
+    def threshold(self, metric, min_rate, min_support=1, by='rate'):
+        """ Products whose rate (or Wilson lower bound) of metric is above min_rate, with at least min_support reviews. """
+        return self.frame(metric, self.threshold_positions(metric, min_rate, min_support, by))
+
+    # ---- persistence ------------------------------------------------------
+
+    def save(self, path, sha256):
+        tmp_path = path + '.tmp.npz'
+        np.savez(tmp_path, products=np.array(self.products.tolist(), dtype=str), counts=self.counts,
+                 sha256=np.array(sha256))
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path, allow_pickle=False) as data:
+            return cls(data['products'].tolist(), data['counts']), str(data['sha256'])
+
+
+def _index_path(path):
+    table_path, _ = _cache_paths(path)
+    return table_path[:-len('.arrow')] + '.suspicious.npz'
+
+
+def load_index(path=SOURCE_PATH, refresh=False):
+    """ The SuspiciousIndex of a review CSV; rebuilt (one pass over the cached table) when the source changed. """
+    index_path = _index_path(path)
+    if not refresh and cache_is_fresh(path) and os.path.exists(index_path):
+        with open(_cache_paths(path)[1]) as f:
+            sha256 = json.load(f).get('sha256')
+        index, built_from = SuspiciousIndex.load(index_path)
+        if built_from == sha256:
+            return index
+    reviews = load_reviews(['product_id', 'Rate', 'sentiment_code'], path=path, refresh=refresh)
+    products = load_products(path)
+    counts = product_counts(reviews['product_id'].to_numpy(), reviews['Rate'].to_numpy(),
+                            reviews['sentiment_code'], len(products))
+    index = SuspiciousIndex(products['product_name'].to_numpy(dtype=object), counts)
+    with open(_cache_paths(path)[1]) as f:
+        index.save(index_path, json.load(f)['sha256'])
+    return index
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Top-k and threshold queries over suspicious products")
+    parser.add_argument('--source', default=SOURCE_PATH, help="review CSV written by sentiment_analysis.py")
+    parser.add_argument('--metric', choices=list(METRICS), default='5_star_negative')
+    parser.add_argument('-k', type=int, default=10, help="number of products to list")
+    parser.add_argument('--min-support', type=int, default=100, help="least reviews counted by the metric")
+    parser.add_argument('--above', type=float, default=None,
+                        help="list every product whose rate is above this (0-1) instead of the top k")
+    parser.add_argument('--by', choices=['wilson', 'rate'], default=None,
+                        help="rank / threshold by the Wilson lower bound or the raw rate")
+    parser.add_argument('--refresh', action='store_true', help="rebuild the index even if it is up to date")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    index = load_index(args.source, refresh=args.refresh)
+    index.columns(args.metric)
+    print(f"Index of {len(index.products):,} products ready in {time.perf_counter() - start:.2f}s")
+    rates, text = METRICS[args.metric]
+    flagged = 'read unlike their rating' if text is None else f"read {text}"
+    reviews = 'reviews' if list(rates) == RATES else '/'.join(str(r) for r in rates) + '-star reviews'
+    if args.above is None:
+        by = args.by or 'wilson'
+        start = time.perf_counter()
+        positions = index.top_positions(args.metric, args.k, args.min_support, by)
+        elapsed = time.perf_counter() - start
+        label = 'the Wilson lower bound' if by == 'wilson' else 'the share'
+        print(f"\nTop {args.k} products by {label} of {reviews} that {flagged} "
+              f"(at least {args.min_support} {reviews}):")
+    else:
+        by = args.by or 'rate'
+        start = time.perf_counter()
+        positions = index.threshold_positions(args.metric, args.above, args.min_support, by)
+        elapsed = time.perf_counter() - start
+        bound = ' (Wilson lower bound)' if by == 'wilson' else ''
+        print(f"\nProducts with at least {args.min_support} {reviews}, more than "
+              f"{100 * args.above:.0f}%{bound} of which {flagged}: {len(positions):,}")
+    for _, row in index.frame(args.metric, positions).iterrows():
+        print(f"  - {row['product_name']}: {row['events']:,} of {row['support']:,} ({100 * row['rate']:.1f}%, "
+              f"Wilson lower bound {100 * row['wilson']:.1f}%)")
+    print(f"\nQuery time: {1e6 * elapsed:.0f} µs")
@@ -0,0 +1,164 @@
+import os
+import re
+import time
+import heapq
+import argparse
+import multiprocessing
+from collections import Counter
+import pandas as pd
+from review_data import SOURCE_PATH, load_reviews
+
+# Streaming term-frequency engine for the mismatched-review word analysis (insight 8).
+# Reviews are processed in fixed-size chunks. Within a chunk the reviews are split into cells
+# by (star rating, mismatch pattern) and each cell is tokenized as one batch: the texts are
+# joined, cleaned with a single regex pass (same cleaning as the original loop: keep letters and
+# whitespace, lowercase, split) and counted with a Counter; stopwords and words of <= 2 letters
+# are dropped from the counter, i.e. once per distinct word instead of once per token. The
+# group counters are sums of the cell counters, so every group is counted in the same pass.
+# Only the counters survive a chunk, so memory is bounded by the vocabulary, not by the
+# number of tokens. Chunks are counted in a fork-based process pool and the partial
+# counters are merged; top-k per group comes from a heap.
+#
+# Groups are counted in the same pass:
+#   ('all', None)                          - every review passed in
+#   ('Rate', 5)                            - per star rating
+#   ('pattern', 'positive -> negative')    - per rating -> text sentiment pattern
+
+STOPWORDS = frozenset([
+    'the', 'this', 'and', 'was', 'with', 'for', 'not', 'that', 'have', 'you',
+    'but', 'its', 'are', 'very', 'too', 'had', 'been', 'from', 'they', 'all', 'my',
+    'can', 'will', 'just', 'any', 'has', 'more', 'now', 'than', 'then', 'who',
+    'what', 'when', 'why', 'how', 'both', 'each', 'few', 'most', 'other', 'some',
+    'such', 'get', 'got', 'getting', 'use', 'using'
+])
+MIN_LENGTH = 3
+CHUNK_SIZE = 50_000
+_NON_LETTERS = re.compile(r'[^a-zA-Z\s]')
+COLUMNS = ['text', 'Rate', 'rating_label', 'label_sentiment']
+
+# Reviews being counted; set in the parent before the pool forks
+_ROWS = None
+
+
+def count_words(texts, stopwords=STOPWORDS):
+    """ Counter of the kept words in a batch of review texts. """
+    # The joining space is whitespace, so words never run across two reviews
+    words = Counter(_NON_LETTERS.sub('', ' '.join(texts)).lower().split())
+    return Counter({word: count for word, count in words.items()
+                    if len(word) >= MIN_LENGTH and word not in stopwords})
+
+
+def mismatch_patterns(rows):
+    """ 'rating_label -> label_sentiment' for every row (None where either is missing). """
+    pattern = rows['rating_label'].astype(object) + ' -> ' + rows['label_sentiment'].astype(object)
+    return pattern.where(rows['rating_label'].notna() & rows['label_sentiment'].notna(), None)
+
+
+class TermCounts:
+    """ Mergeable per-group word counters. """
+
+    def __init__(self):
+        self.counters = {}
+        self.reviews = 0
+        self.tokens = 0
+
+    def update(self, rows):
+        """ Count one chunk of reviews (a frame with the columns in COLUMNS). """
+        texts = rows['text'].fillna('').astype(str).to_numpy()
+        cells = pd.DataFrame({'Rate': pd.to_numeric(rows['Rate'], errors='coerce').to_numpy(),
+                              'pattern': mismatch_patterns(rows).to_numpy()})
+        self.reviews += len(rows)
+        for (rate, pattern), positions in cells.groupby(['Rate', 'pattern'], dropna=False).indices.items():
+            counts = count_words(texts[positions])
+            self.tokens += sum(counts.values())
+            self._add(('all', None), counts)
+            if not pd.isna(rate):
+                self._add(('Rate', int(rate) if float(rate).is_integer() else float(rate)), counts)
+            if not pd.isna(pattern):
+                self._add(('pattern', pattern), counts)
+        return self
+
+    def _add(self, group, counts):
+        self.counters.setdefault(group, Counter()).update(counts)
+
+    def merge(self, other):
+        for group, counter in other.counters.items():
+            self.counters.setdefault(group, Counter()).update(counter)
+        self.reviews += other.reviews
+        self.tokens += other.tokens
+        return self
+
+    def groups(self, dimension):
+        return sorted(key for dim, key in self.counters if dim == dimension)
+
+    def top(self, k=15, group=('all', None)):
+        """ The k most frequent words of a group as (word, count), ties broken alphabetically. """
+        counter = self.counters.get(group, Counter())
+        return heapq.nsmallest(k, counter.items(), key=lambda item: (-item[1], item[0]))
+
+    def vocabulary(self):
+        return len(self.counters.get(('all', None), ()))
+
+
+def _count_range(bounds):
+    start, stop = bounds
+    return TermCounts().update(_ROWS.iloc[start:stop])
+
+
+def count_terms(rows, chunk_size=CHUNK_SIZE, jobs=None):
+    """ Count the reviews in rows chunk by chunk, in worker processes when possible. """
+    global _ROWS
+    bounds = [(start, min(start + chunk_size, len(rows))) for start in range(0, len(rows), chunk_size)]
+    jobs = min(jobs or os.cpu_count() or 1, max(len(bounds), 1))
+    total = TermCounts()
+    # Pool workers (e.g. under render_all.py) are daemonic and cannot start their own pool
+    if jobs > 1 and not multiprocessing.current_process().daemon \
+            and 'fork' in multiprocessing.get_all_start_methods():
+        _ROWS = rows
+        try:
+            with multiprocessing.get_context('fork').Pool(jobs) as pool:
+                for partial in pool.imap_unordered(_count_range, bounds):
+                    total.merge(partial)
+        finally:
+            _ROWS = None
+    else:
+        for start, stop in bounds:
+            total.update(rows.iloc[start:stop])
+    return total
+
+
+def top_words_table(counts, k=15):
+    """ Long table of the top-k words of every group. """
+    records = []
+    for dimension, key in sorted(counts.counters, key=lambda group: (group[0], str(group[1]))):
+        for rank, (word, count) in enumerate(counts.top(k, (dimension, key)), start=1):
+            records.append({'group': dimension, 'key': key, 'rank': rank, 'word': word, 'count': count})
+    return pd.DataFrame(records)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Top words of mismatched reviews, per star rating and mismatch pattern")
+    parser.add_argument('--source', default=SOURCE_PATH, help="review CSV written by sentiment_analysis.py")
+    parser.add_argument('--top', type=int, default=15, help="words per group")
+    parser.add_argument('--chunk-size', type=int, default=CHUNK_SIZE, help="reviews tokenized per chunk")
+    parser.add_argument('--jobs', type=int, default=None, help="worker processes (default: all CPUs)")
+    parser.add_argument('--all-reviews', action='store_true', help="count every review, not only mismatched ones")
+    parser.add_argument('--output', default='outputs/mismatch_top_words.csv', help="where to write the top-k table")
+    args = parser.parse_args()
+
+    reviews = load_reviews(COLUMNS, path=args.source, where=None if args.all_reviews else {'sentiment_match': False})
+    start = time.perf_counter()
+    counts = count_terms(reviews[COLUMNS], chunk_size=args.chunk_size, jobs=args.jobs)
+    elapsed = time.perf_counter() - start
+    print(f"Counted {counts.tokens:,} tokens from {counts.reviews:,} reviews in {elapsed:.2f}s "
+          f"({counts.vocabulary():,} distinct words)")
+
+    table = top_words_table(counts, k=args.top)
+    os.makedirs(os.path.dirname(args.output) or '.', exist_ok=True)
+    table.to_csv(args.output, index=False)
+    for dimension in ['Rate', 'pattern']:
+        print(f"\nTop words per {dimension}:")
+        for key in counts.groups(dimension):
+            words = ', '.join(word for word, _ in counts.top(5, (dimension, key)))
+            print(f"  {str(key):<22} {words}")
+    print(f"\nTop-{args.top} table saved to '{args.output}'")